@@ -0,0 +1,308 @@
+"""Server-side AI opponent: iterative-deepening alpha-beta over Board bitboards.
+
+Positions are hashed with Zobrist keys into a transposition table that is
+reused between deepening iterations, candidate moves are limited to cells
+next to existing stones and ordered by how much they change the static
+evaluation, and every search stops at a wall-clock deadline so a move
+never takes longer than its time budget however loaded the server is.
+"""
+import random
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import tablebase
+from board import Board
+from game_logic import get_win_len
+from lines import MAX_INDEXES, line_index
+
+WIN_SCORE = 1_000_000
+DEFAULT_TIME_BUDGET = 0.5
+TT_MAX_ENTRIES = 200_000
+
+# transposition table bound flags
+EXACT, LOWER, UPPER = 0, 1, 2
+# xor-ed into the hash when O is to move; a blocked turn can repeat a side
+SIDE_KEY = 0x9E3779B97F4A7C15
+# boards this small are searched with a two-cell neighbourhood
+SMALL_BOARD = 5
+
+SearchResult = namedtuple('SearchResult', 'move score depth nodes')
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the move's time budget runs out"""
+
+# per-size tables keep as many sizes as the shared line index (lines.MAX_INDEXES)
+@lru_cache(maxsize=MAX_INDEXES)
+def zobrist_keys(size):
+    """Per-cell (X key, O key) pairs, indexed like Board bits (stride size + 1).
+
+    Seeded by size so every process hashes positions identically.
+    """
+    rng = random.Random(size)
+    return tuple((rng.getrandbits(64), rng.getrandbits(64)) for _ in range(size * (size + 1)))
+
+@lru_cache(maxsize=MAX_INDEXES)
+def window_index(size, win_len):
+    """For every Board bit index, the masks of all win_len windows through it (from the shared line index)"""
+    index = line_index(size, win_len)
+    stride = size + 1
+    through = [()] * (size * stride)
+    for cell, lines in enumerate(index.through):
+        r, c = divmod(cell, size)
+        through[r * stride + c] = tuple(index.masks[line] for line in lines)
+    return tuple(through)
+
+@lru_cache(maxsize=MAX_INDEXES)
+def all_windows(size, win_len):
+    """Every distinct win_len window mask on the board"""
+    return tuple({mask for masks in window_index(size, win_len) for mask in masks})
+
+@lru_cache(maxsize=MAX_INDEXES)
+def board_mask(size):
+    """All playable bits of a Board (the spare column of each row left clear)"""
+    row = (1 << size) - 1
+    mask = 0
+    for r in range(size):
+        mask |= row << (r * (size + 1))
+    return mask
+
+def _weights(win_len):
+    # value of an open window holding k stones of a single colour
+    return tuple(0 if k == 0 else 10 ** (k - 1) for k in range(win_len))
+
+class _Search:
+    def __init__(self, board, win_len, deadline, tt):
+        self.size = board.size
+        self.stride = board.stride
+        self.win_len = win_len
+        self.bits = [board.x_bits, board.o_bits]
+        self.windows = window_index(board.size, win_len)
+        self.all_windows = all_windows(board.size, win_len)
+        self.keys = zobrist_keys(board.size)
+        self.mask = board_mask(board.size)
+        self.weights = _weights(win_len)
+        self.deadline = deadline
+        self.tt = tt
+        self.nodes = 0
+
+    # -- evaluation ---------------------------------------------------------
+    def _window_value(self, window, me, opp):
+        mine = (me & window).bit_count()
+        theirs = (opp & window).bit_count()
+        if theirs == 0:
+            return self.weights[mine] if mine < self.win_len else WIN_SCORE
+        if mine == 0:
+            return -self.weights[theirs]
+        return 0
+
+    def evaluate(self, side):
+        """Static score of the whole position from side's point of view"""
+        me, opp = self.bits[side], self.bits[1 - side]
+        return sum(self._window_value(window, me, opp) for window in self.all_windows)
+
+    def move_gain(self, idx, side):
+        """Change in side's evaluation from placing a stone at idx"""
+        me, opp = self.bits[side], self.bits[1 - side]
+        placed = me | (1 << idx)
+        gain = 0
+        for window in self.windows[idx]:
+            gain += self._window_value(window, placed, opp) - self._window_value(window, me, opp)
+        return gain
+
+    def is_win(self, idx, side):
+        bits = self.bits[side]
+        for window in self.windows[idx]:
+            if bits & window == window:
+                return True
+        return False
+
+    # -- move generation ----------------------------------------------------
+    def candidates(self):
+        occupied = self.bits[0] | self.bits[1]
+        if not occupied:
+            centre = (self.size // 2) * self.stride + self.size // 2
+            return [centre]
+        # empty cells within reach of a stone in any of the eight directions
+        near = occupied
+        for _ in range(2 if self.size <= SMALL_BOARD else 1):
+            near |= (near << 1) | (near >> 1)
+            near |= (near << self.stride) | (near >> self.stride)
+        near &= self.mask & ~occupied
+        moves = []
+        while near:
+            low = near & -near
+            moves.append(low.bit_length() - 1)
+            near ^= low
+        return moves
+
+    def ordered_moves(self, side, tt_move):
+        """(gain, idx) pairs, best static gain first with the TT move ahead of all"""
+        scored = [(self.move_gain(idx, side), idx) for idx in self.candidates()]
+        scored.sort(reverse=True)
+        if tt_move is not None:
+            for i, (gain, idx) in enumerate(scored):
+                if idx == tt_move:
+                    scored.insert(0, scored.pop(i))
+                    break
+        return scored
+
+    # -- search -------------------------------------------------------------
+    def _tick(self):
+        # checked at every node: a node on a big board costs far more than the
+        # clock read, and under GIL contention a node can take many times longer
+        self.nodes += 1
+        if time.monotonic() >= self.deadline:
+            raise SearchTimeout()
+
+    def negamax(self, depth, alpha, beta, side, key, ply, empty, score):
+        """score is the running static evaluation from side's point of view"""
+        self._tick()
+        alpha_orig = alpha
+
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value > alpha:
+                    alpha = value
+                elif flag == UPPER and value < beta:
+                    beta = value
+                if alpha >= beta:
+                    return value
+
+        if depth == 0:
+            return score
+
+        best_value = -WIN_SCORE * 2
+        best_move = None
+        for gain, idx in self.ordered_moves(side, tt_move):
+            bit = 1 << idx
+            self.bits[side] |= bit
+            try:
+                if self.is_win(idx, side):
+                    value = WIN_SCORE - ply
+                elif empty == 1:
+                    value = 0
+                else:
+                    child_key = key ^ self.keys[idx][side] ^ SIDE_KEY
+                    value = -self.negamax(depth - 1, -beta, -alpha, 1 - side, child_key,
+                                          ply + 1, empty - 1, -(score + gain))
+            finally:
+                self.bits[side] &= ~bit
+
+            if value > best_value:
+                best_value = value
+                best_move = idx
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.tt) >= TT_MAX_ENTRIES:
+            self.tt.clear()
+        self.tt[key] = (depth, best_value, flag, best_move)
+        return best_value
+
+    def root(self, depth, side, key, empty, score, moves):
+        """Search every root move at depth; returns (best score, ordered moves)"""
+        alpha = -WIN_SCORE * 2
+        scored = []
+        for idx in moves:
+            gain = self.move_gain(idx, side)
+            bit = 1 << idx
+            self.bits[side] |= bit
+            try:
+                if self.is_win(idx, side):
+                    value = WIN_SCORE
+                elif empty == 1:
+                    value = 0
+                else:
+                    value = -self.negamax(depth - 1, -WIN_SCORE * 2, -alpha, 1 - side,
+                                          key ^ self.keys[idx][side] ^ SIDE_KEY, 1, empty - 1,
+                                          -(score + gain))
+            finally:
+                self.bits[side] &= ~bit
+            scored.append((value, idx))
+            if value > alpha:
+                alpha = value
+        # best first, so the next iteration searches the principal move first
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[0][0], [idx for _, idx in scored]
+
+def position_key(board, side):
+    keys = zobrist_keys(board.size)
+    key = SIDE_KEY if side else 0
+    for side, bits in enumerate((board.x_bits, board.o_bits)):
+        while bits:
+            low = bits & -bits
+            key ^= keys[low.bit_length() - 1][side]
+            bits ^= low
+    return key
+
+def search_move(board, symbol, time_budget=DEFAULT_TIME_BUDGET, win_len=None, max_depth=None, tt=None):
+    """Pick a move for symbol on board within time_budget seconds.
+
+    Returns a SearchResult whose move is a (row, col) tuple, or None when
+    the board is full. depth is the deepest fully completed iteration.
+    Positions covered by a solved tablebase are answered from it directly.
+    """
+    if win_len is None:
+        win_len = get_win_len(board.size)
+    win_len = min(win_len, board.size)
+    if board.is_full():
+        return SearchResult(None, 0, 0, 0)
+
+    if win_len == get_win_len(board.size):
+        known = tablebase.lookup(board, symbol)
+        if known is not None:
+            move, value, plies = known
+            score = {tablebase.WIN: WIN_SCORE - plies + 1, tablebase.DRAW: 0, tablebase.LOSS: plies - WIN_SCORE}[value]
+            return SearchResult(move, score, plies, 0)
+
+    deadline = time.monotonic() + time_budget
+    search = _Search(board, win_len, deadline, tt if tt is not None else {})
+    side = 0 if symbol == 'X' else 1
+    key = position_key(board, side)
+    empty = board.empty_cells
+    if max_depth is None:
+        max_depth = empty
+
+    score = search.evaluate(side)
+    moves = [idx for _, idx in search.ordered_moves(side, None)]
+    best_move, best_score, completed = moves[0], 0, 0
+    for depth in range(1, max_depth + 1):
+        try:
+            best_score, moves = search.root(depth, side, key, empty, score, moves)
+        except SearchTimeout:
+            break
+        best_move = moves[0]
+        completed = depth
+        # a forced result is already known; searching deeper cannot change it
+        if abs(best_score) >= WIN_SCORE - empty:
+            break
+
+    stride = board.stride
+    return SearchResult((best_move // stride, best_move % stride), best_score, completed, search.nodes)
+
+def choose_move(board, symbol, time_budget=DEFAULT_TIME_BUDGET, win_len=None):
+    """Convenience wrapper returning just the (row, col) to play, or None"""
+    return search_move(board, symbol, time_budget, win_len).move
+
+def search_worker(size, x_bits, o_bits, symbol, deadline, win_len=None):
+    """Process-pool entry point: search until deadline (a time.time() stamp).
+
+    Time spent queued for a worker comes out of the budget; if none is left
+    the best statically ordered move is returned straight away.
+    """
+    board = Board.from_bits(size, x_bits, o_bits)
+    return search_move(board, symbol, max(0.0, deadline - time.time()), win_len)
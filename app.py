@@ -1,20 +1,53 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
+# ASYNC_MODE=eventlet/gevent patches the standard library, so it must come first
+# (a process spawned from here that re-imports it as __mp_main__ stays unpatched; TaskPool's
+# AI workers do not import it at all)
+import concurrency
+if __name__ != '__mp_main__':
+    concurrency.monkey_patch()
+
+from flask import Flask, Response, render_template, request, session, redirect, url_for, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
-import sqlite3
-import random
 import os
 import datetime
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import json
+import copy
+import time
+import csv
+import io
+import atexit
+import secrets
+
+from ai_engine import search_move, search_worker
+from task_pool import TaskPool
+from persistence import Database
+from game_store import create_game_store, claim_new_room, claim_new_rooms
+from matchmaking import Matchmaker, rating_from_results
+from events import EventDispatcher, Str, Choice
+from spectators import SpectatorHub, watch_room
+import replay
+import rules
+import lines
+import assets
+from rules import new_game
+from game_logic import parse_board_size
+from room_reaper import RoomReaper, touch, player_connected, player_disconnected
+from session_cache import SessionCache, SharedSessionCache
+from leaderboard import Leaderboard
+from tournament import Tournament, FORMATS, BRACKET
+import metrics
 
 app = Flask(__name__)
 
-# Use threading mode for better compatibility
-async_mode = 'threading'
+# 'threading' (default), or 'eventlet'/'gevent' to serve every connection from one event loop
+async_mode = concurrency.ASYNC_MODE
 app.config['SECRET_KEY'] = 'i love python'
 
-# Configure error logging
+# Configure error logging: loggers only queue records, and one listener
+# thread writes them to logs/error.log and logs/structured_errors.log
+structured_log = logging.getLogger('structured_errors')
+
 def setup_logging():
     if not os.path.exists('logs'):
         os.makedirs('logs')
@@ -29,61 +62,215 @@ def setup_logging():
         '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
     ))
     file_handler.setLevel(logging.ERROR)
-    
+    file_handler.addFilter(lambda record: record.name != structured_log.name)
+
+    # one JSON object per line
+    structured_handler = logging.FileHandler('logs/structured_errors.log')
+    structured_handler.setFormatter(logging.Formatter('%(message)s'))
+    structured_handler.addFilter(logging.Filter(structured_log.name))
+
+    # the listener is a real OS thread: its queue must not be a green one (see concurrency.py)
+    records = concurrency.original('queue', 'SimpleQueue')()
+    listener = QueueListener(records, file_handler, structured_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
     # Apply to app logger
-    app.logger.addHandler(file_handler)
+    app.logger.addHandler(QueueHandler(records))
     app.logger.setLevel(logging.ERROR)
+    structured_log.addHandler(QueueHandler(records))
+    structured_log.setLevel(logging.ERROR)
+    structured_log.propagate = False
 
 setup_logging()
 
-# Configure SocketIO with threading for maximum compatibility
+# ---- Metrics (Prometheus text format at /metrics) ----
+metrics_registry = metrics.Registry(
+    on_error=lambda name, e: log_error("METRICS_ERROR", f"Failed to collect {name}", str(e)))
+event_seconds = metrics_registry.histogram(
+    'xo_socketio_event_seconds', 'Socket.IO event handler latency', label='event')
+sqlite_seconds = metrics_registry.histogram(
+    'xo_sqlite_seconds', 'SQLite reads, purges and committed write batches', label='op')
+emit_bytes = metrics_registry.histogram(
+    'xo_socketio_emit_bytes', 'Encoded size of emitted events (a broadcast counts once)', label='event',
+    buckets=metrics.SIZE_BUCKETS)
+errors_total = metrics_registry.counter('xo_errors_total', 'Errors logged, by type', label='type')
+connections = metrics_registry.gauge('xo_connections', 'Connected Socket.IO clients')
+
+# Game rooms live in GAME_STORE: 'memory' (one worker) or 'redis' (shared by
+# all workers, which then also relay Socket.IO broadcasts through Redis)
+GAME_STORE = os.environ.get('GAME_STORE', 'memory')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
 socketio = SocketIO(
     app,
     async_mode=async_mode,
+    message_queue=REDIS_URL if GAME_STORE == 'redis' else None,
     cors_allowed_origins="*",
     ping_timeout=60,
     ping_interval=25,
     logger=False,
-    engineio_logger=False  # Disabled for cleaner logs
+    engineio_logger=False,  # Disabled for cleaner logs
+    serializer=metrics.sized_packet_class(emit_bytes)
 )
 
-# In-memory games (replace with Redis in production)
-games = {}
+games = create_game_store(GAME_STORE, REDIS_URL, lock_type=concurrency.rlock)
+
+# Power-up, chat and new-game events are validated and rate limited before
+# their handlers run (see events.py)
+def reject_event(sid, event, reason):
+    socketio.emit('event_rejected', {'event': event, 'reason': reason}, to=sid)
+
+def event_failed(event, data, error):
+    room = data.get('room') if isinstance(data, dict) else None
+    log_error(f"{event.upper()}_ERROR", f"Error handling {event} in room {room}", str(error))
+
+events = EventDispatcher(socketio, lambda: request.sid, on_reject=reject_event, on_error=event_failed)
+
+# Spectators get one coalesced update per room every SPECTATOR_INTERVAL seconds at most;
+# a socket with more than SPECTATOR_MAX_BACKLOG unsent packets is skipped until it catches up
+SPECTATOR_INTERVAL = float(os.environ.get('SPECTATOR_INTERVAL', 0.1))
+SPECTATOR_MAX_BACKLOG = int(os.environ.get('SPECTATOR_MAX_BACKLOG', 32))
+
+def socket_backlog(sid):
+    """Packets queued for a socket but not yet written to it"""
+    try:
+        eio_sid = socketio.server.manager.eio_sid_from_sid(sid, '/')
+        return socketio.server.eio.sockets[eio_sid].queue.qsize()
+    except (KeyError, AttributeError):
+        return 0
+
+def room_snapshot(room):
+    """game_state for room, or None, copied inside a room transaction.
+
+    The memory store's get() hands back the live room dict, which another
+    handler may be changing, so a snapshot sent outside a transaction is
+    built (nested values included) under the room's lock.
+    """
+    def snapshot(txn):
+        return copy.deepcopy(game_state(txn.game)) if txn.game is not None else None
+    return games.update(room, snapshot)
+
+spectator_hub = SpectatorHub(socketio.emit, room_snapshot, socketio.start_background_task, socketio.sleep,
+                             socket_backlog, SPECTATOR_INTERVAL, SPECTATOR_MAX_BACKLOG)
+
+# Server-side AI opponent (solo-vs-server mode)
+AI_PLAYER = 'CPU'
+AI_TIME_BUDGET = float(os.environ.get('AI_TIME_BUDGET', 0.5))
+# budget for the in-process fallback search when the pool is saturated
+AI_FALLBACK_BUDGET = 0.02
+
+# AI searches run in worker processes so they never hold the handlers' GIL
+AI_POOL_WORKERS = int(os.environ.get('AI_POOL_WORKERS', os.cpu_count() or 1))
+AI_POOL_MAX_PENDING = int(os.environ.get('AI_POOL_MAX_PENDING', AI_POOL_WORKERS * 4))
+ai_pool = TaskPool(AI_POOL_WORKERS, AI_POOL_MAX_PENDING)
+atexit.register(ai_pool.shutdown)
+
+# Socket.IO sid -> (room, username), so a disconnect can cancel pending work
+sid_rooms = {}
 
 DB_PATH = 'database.db'
 
+# Per-thread WAL connections for reads; writes go through a batching background writer.
+# Under an event loop, reads and other waits on SQLite run on worker threads.
+db = Database(DB_PATH, on_error=lambda *args: log_error(*args), run_blocking=concurrency.run_blocking,
+              on_timing=lambda op, seconds: sqlite_seconds.labels(op).observe(seconds))
+atexit.register(db.close)
+
+# finished games' move logs queued since startup (sizes are the encoded blobs)
+replay_stats = {'games': 0, 'events': 0, 'bytes': 0}
+
+# Saved rooms are read and written through a write-behind cache (flushed before db.close).
+# With GAME_STORE=redis the cached copies live in Redis, so a session one worker saves is
+# seen at once by the others; otherwise each process caches in memory (see session_cache.py)
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 50000))
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', 300))
+if GAME_STORE == 'redis':
+    session_cache = SharedSessionCache(db, games.client, SESSION_CACHE_TTL,
+                                       on_error=lambda *args: log_error(*args))
+else:
+    session_cache = SessionCache(db, SESSION_CACHE_SIZE, SESSION_CACHE_TTL,
+                                 on_error=lambda *args: log_error(*args))
+atexit.register(session_cache.close)
+
+# Rankings are served from memory and kept in step with update_leaderboard
+LEADERBOARD_TOP_N = 100
+LEADERBOARD_MAX_PAGE = 100
+leaderboard = Leaderboard(db, LEADERBOARD_TOP_N, lock=concurrency.lock())
+
+# Abandoned rooms are kept for a reconnect grace period, idle ones for
+# ROOM_IDLE_SECONDS; saved sessions older than SESSION_MAX_AGE_HOURS are purged
+ROOM_GRACE_SECONDS = float(os.environ.get('ROOM_GRACE_SECONDS', 120))
+ROOM_IDLE_SECONDS = float(os.environ.get('ROOM_IDLE_SECONDS', 3600))
+REAPER_INTERVAL = float(os.environ.get('REAPER_INTERVAL', 30))
+SESSION_MAX_AGE_HOURS = float(os.environ.get('SESSION_MAX_AGE_HOURS', 24))
+
+def evict_room(txn, room):
+    txn.after(ai_pool.cancel, room)
+    send_after(txn, 'game_message', {'message': 'This room was closed after a period of inactivity.'}, room)
+    if txn.game.get('spectators'):
+        send_after(txn, 'game_message', {'message': 'This room was closed after a period of inactivity.'},
+                   watch_room(room))
+    if txn.game.get('tournament'):
+        # nobody played it out in time: the match is settled as a draw
+        txn.after(socketio.start_background_task, report_tournament_result,
+                  txn.game['tournament'], txn.game['match'], None)
+    print(f"[room {room}] evicted (inactive)")
+
+def purge_stale_sessions(now):
+    session_cache.prune()
+    cutoff = datetime.datetime.utcfromtimestamp(now - SESSION_MAX_AGE_HOURS * 3600).isoformat()
+    return db.purge_sessions(cutoff)
+
+reaper = RoomReaper(games, ROOM_GRACE_SECONDS, ROOM_IDLE_SECONDS, REAPER_INTERVAL,
+                    on_evict=evict_room, purge_sessions=purge_stale_sessions,
+                    on_error=lambda *args: log_error(*args))
+background_started = False
+
+# Matchmaking: rating windows start at MATCH_WINDOW points and widen by
+# MATCH_WINDOW_GROWTH per second of waiting, up to MATCH_MAX_WINDOW
+MATCH_WINDOW = float(os.environ.get('MATCH_WINDOW', 50))
+MATCH_WINDOW_GROWTH = float(os.environ.get('MATCH_WINDOW_GROWTH', 25))
+MATCH_MAX_WINDOW = float(os.environ.get('MATCH_MAX_WINDOW', 800))
+MATCH_TICK = float(os.environ.get('MATCH_TICK', 1))
+matchmaker = Matchmaker(MATCH_WINDOW, MATCH_WINDOW_GROWTH, MATCH_MAX_WINDOW)
+# Socket.IO sid -> username waiting in the matchmaking queue
+queued_sids = {}
+
+# Tournaments in progress, by id. Each is run by the worker that created it
+# (with GAME_STORE=redis, create tournaments and serve their rooms from one
+# worker). A drawn tournament game is replayed up to TOURNAMENT_REPLAYED_DRAWS
+# times before the draw stands.
+TOURNAMENT_REPLAYED_DRAWS = int(os.environ.get('TOURNAMENT_REPLAYED_DRAWS', 2))
+TOURNAMENT_MAX_PLAYERS = 4096
+TOURNAMENT_BOARD_SIZES = (3, 4, 5)
+tournaments = {}
+
+def run_matchmaker():
+    """Pair players whose rating windows have widened enough, every MATCH_TICK seconds"""
+    while True:
+        socketio.sleep(MATCH_TICK)
+        try:
+            for match in matchmaker.tick():
+                start_match(match)
+        except Exception as e:
+            log_error("MATCHMAKING_ERROR", "Matchmaking tick failed", str(e))
+
+def start_background_tasks():
+    """Start the sweep and matchmaking loops (and the event loop's inbox) once, on first connect.
+
+    Never at import, so pool workers skip it.
+    """
+    global background_started
+    if not background_started:
+        background_started = True
+        concurrency.start_loop_inbox(socketio.start_background_task)
+        socketio.start_background_task(reaper.run, socketio.sleep)
+        socketio.start_background_task(run_matchmaker)
+
 # ---- Database init ----
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        # history: store user's games
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            opponent TEXT,
-            mode TEXT,
-            result TEXT,
-            board_size INTEGER,
-            date TEXT
-        )""")
-        # leaderboard
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS leaderboard (
-            username TEXT PRIMARY KEY,
-            score INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0
-        )""")
-        # user_sessions: store room codes for recovery
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS user_sessions (
-            username TEXT PRIMARY KEY,
-            room_code TEXT,
-            board_size INTEGER,
-            mode TEXT,
-            last_activity TEXT
-        )""")
-        conn.commit()
+    db.init_schema()
 
 init_db()
 
@@ -97,43 +284,28 @@ def log_error(error_type, message, details=None):
         'details': details
     }
     
-    # Log to file
+    errors_total.labels(error_type).inc()
+
+    # Log to file (queued; the listener thread does the writing)
     app.logger.error(f"{error_type}: {message} - {details}")
     
     # Also write to a structured error log
     try:
-        with open('logs/structured_errors.log', 'a') as f:
-            f.write(json.dumps(error_data) + '\n')
+        structured_log.error(json.dumps(error_data))
     except Exception as e:
         app.logger.error(f"Failed to write structured error log: {e}")
 
 def save_user_session(username, room_code, board_size, mode):
     """Save user's current room for recovery"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("""
-                INSERT OR REPLACE INTO user_sessions 
-                (username, room_code, board_size, mode, last_activity)
-                VALUES (?, ?, ?, ?, ?)
-            """, (username, room_code, board_size, mode, datetime.datetime.utcnow().isoformat()))
-            conn.commit()
+        session_cache.put(username, room_code, board_size, mode, datetime.datetime.utcnow().isoformat())
     except Exception as e:
         log_error("SESSION_SAVE_ERROR", f"Failed to save session for {username}", str(e))
 
 def get_user_session(username):
     """Get user's saved room session"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("SELECT room_code, board_size, mode FROM user_sessions WHERE username = ?", (username,))
-            result = c.fetchone()
-            if result:
-                return {
-                    'room_code': result[0],
-                    'board_size': result[1],
-                    'mode': result[2]
-                }
+        return session_cache.get(username)
     except Exception as e:
         log_error("SESSION_LOAD_ERROR", f"Failed to load session for {username}", str(e))
     return None
@@ -141,135 +313,362 @@ def get_user_session(username):
 def clear_user_session(username):
     """Clear user's saved session"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("DELETE FROM user_sessions WHERE username = ?", (username,))
-            conn.commit()
+        session_cache.delete(username)
     except Exception as e:
         log_error("SESSION_CLEAR_ERROR", f"Failed to clear session for {username}", str(e))
 
 def add_history_entry(entry):
     # entry: dict with username, opponent, mode, result, board_size, date
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO history (username, opponent, mode, result, board_size, date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (entry.get('username'), entry.get('opponent'), entry.get('mode'),
-                  entry.get('result'), entry.get('board_size'), entry.get('date')))
-            conn.commit()
+        db.add_history((entry.get('username'), entry.get('opponent'), entry.get('mode'),
+                        entry.get('result'), entry.get('board_size'), entry.get('date')))
     except Exception as e:
         log_error("HISTORY_SAVE_ERROR", "Failed to save history entry", str(e))
 
-def get_history_for_user(username, limit=100):
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("SELECT username, opponent, mode, result, board_size, date FROM history WHERE username = ? ORDER BY id DESC LIMIT ?", (username, limit))
-            rows = c.fetchall()
-            return [
-                {
-                    'username': r[0],
-                    'opponent': r[1],
-                    'mode': r[2],
-                    'result': r[3],
-                    'board_size': r[4],
-                    'date': r[5]
-                } for r in rows
-            ]
+HISTORY_MAX_PAGE = 100
+# modes a client may post to /history: games it played on its own (vs the in-page CPU)
+CLIENT_HISTORY_MODES = ('solo',)
+HISTORY_RESULTS = ('win', 'loss', 'draw')
+HISTORY_EXPORT_CHUNK = 1000
+HISTORY_FIELDS = ('id', 'username', 'opponent', 'mode', 'result', 'board_size', 'date')
+
+def get_history_for_user(username, limit=HISTORY_MAX_PAGE, before=None):
+    """Newest-first page of a user's games; pass the last id seen as before for the next page"""
+    try:
+        if before is None:
+            rows = db.query("SELECT id, username, opponent, mode, result, board_size, date FROM history "
+                            "WHERE username = ? ORDER BY id DESC LIMIT ?", (username, limit))
+        else:
+            rows = db.query("SELECT id, username, opponent, mode, result, board_size, date FROM history "
+                            "WHERE username = ? AND id < ? ORDER BY id DESC LIMIT ?", (username, before, limit))
+        return [dict(zip(HISTORY_FIELDS, r)) for r in rows]
     except Exception as e:
         log_error("HISTORY_LOAD_ERROR", f"Failed to load history for {username}", str(e))
         return []
 
+def iter_history_pages(username, chunk_size=HISTORY_EXPORT_CHUNK):
+    """Yield a user's whole history, newest first, as lists of rows (one keyset page each).
+
+    Each page is its own short query, so an export never holds a read
+    transaction (and the WAL) open for the length of the download.
+    """
+    before = None
+    while True:
+        if before is None:
+            rows = db.query("SELECT id, username, opponent, mode, result, board_size, date FROM history "
+                            "WHERE username = ? ORDER BY id DESC LIMIT ?", (username, chunk_size))
+        else:
+            rows = db.query("SELECT id, username, opponent, mode, result, board_size, date FROM history "
+                            "WHERE username = ? AND id < ? ORDER BY id DESC LIMIT ?", (username, before, chunk_size))
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        before = rows[-1][0]
+
+def get_stats_for_user(username):
+    """Wins/losses/draws per board size from the incrementally maintained user_stats"""
+    try:
+        rows = db.query("SELECT board_size, wins, losses, draws FROM user_stats "
+                        "WHERE username = ? ORDER BY board_size", (username,))
+    except Exception as e:
+        log_error("HISTORY_LOAD_ERROR", f"Failed to load stats for {username}", str(e))
+        return None
+    by_size = {}
+    total = {'wins': 0, 'losses': 0, 'draws': 0}
+    for board_size, wins, losses, draws in rows:
+        by_size[str(board_size)] = {'wins': wins, 'losses': losses, 'draws': draws, 'games': wins + losses + draws}
+        total['wins'] += wins
+        total['losses'] += losses
+        total['draws'] += draws
+    total['games'] = total['wins'] + total['losses'] + total['draws']
+    return {'username': username, 'total': total, 'by_board_size': by_size}
+
+def get_rating(username, size):
+    """Matchmaking rating from the user's games against other people on this board size.
+
+    rated_stats counts only results the server recorded itself (multiplayer
+    and tournament games), so solo results posted to /history and wins
+    against the server AI cannot move a player into a higher rating band.
+    """
+    try:
+        row = db.query_one("SELECT wins, losses, draws FROM rated_stats WHERE username = ? AND board_size = ?",
+                           (username, size))
+    except Exception as e:
+        log_error("RATING_LOAD_ERROR", f"Failed to load results for {username}", str(e))
+        row = None
+    return rating_from_results(*(row or (0, 0, 0)))
+
+RATING_QUERY_CHUNK = 500
+
+def get_ratings(usernames, size):
+    """get_rating for many users at once: one query per RATING_QUERY_CHUNK names"""
+    results = {}
+    try:
+        for start in range(0, len(usernames), RATING_QUERY_CHUNK):
+            chunk = usernames[start:start + RATING_QUERY_CHUNK]
+            rows = db.query("SELECT username, wins, losses, draws FROM rated_stats "
+                            f"WHERE board_size = ? AND username IN ({','.join('?' * len(chunk))})",
+                            (size, *chunk))
+            for username, wins, losses, draws in rows:
+                results[username] = (wins, losses, draws)
+    except Exception as e:
+        log_error("RATING_LOAD_ERROR", f"Failed to load results for {len(usernames)} players", str(e))
+    return {username: rating_from_results(*results.get(username, (0, 0, 0))) for username in usernames}
+
 def update_leaderboard(username, points=10):
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO leaderboard (username, score, wins)
-                VALUES (?, ?, ?)
-                ON CONFLICT(username) DO UPDATE SET
-                    score = score + excluded.score,
-                    wins = wins + 1
-            """, (username, points,1))
-            conn.commit()
+        # in-memory first: its first use loads the table, which must not include this win yet
+        leaderboard.record_win(username, points)
+        db.add_score(username, points)
     except Exception as e:
         log_error("LEADERBOARD_UPDATE_ERROR", f"Failed to update leaderboard for {username}", str(e))
 
-# ---- Game utilities ----
-def new_empty_board(n):
-    return [[None for _ in range(n)] for _ in range(n)]
-
-def get_win_len(size):
-    if size <= 4:
-        return 3
-    if size == 5:
-        return 4
-    return 5
-
-def is_board_full(board):
-    return all(cell is not None for row in board for cell in row)
-
-def check_winner(board, symbol, win_len=None):
-    n = len(board)
-    if win_len is None:
-        win_len = get_win_len(n)
-    if win_len > n:
-        win_len = n
-
-    # horizontal
-    for r in range(n):
-        for c in range(0, n - win_len + 1):
-            ok = True
-            for k in range(win_len):
-                if board[r][c + k] != symbol:
-                    ok = False
-                    break
-            if ok:
-                return True
-
-    # vertical
-    for c in range(n):
-        for r in range(0, n - win_len + 1):
-            ok = True
-            for k in range(win_len):
-                if board[r + k][c] != symbol:
-                    ok = False
-                    break
-            if ok:
-                return True
-
-    # diagonal down-right
-    for r in range(0, n - win_len + 1):
-        for c in range(0, n - win_len + 1):
-            ok = True
-            for k in range(win_len):
-                if board[r + k][c + k] != symbol:
-                    ok = False
-                    break
-            if ok:
-                return True
-
-    # diagonal up-right
-    for r in range(win_len - 1, n):
-        for c in range(0, n - win_len + 1):
-            ok = True
-            for k in range(win_len):
-                if board[r - k][c + k] != symbol:
-                    ok = False
-                    break
-            if ok:
-                return True
+# ---- Game state ----
+# server-side bookkeeping that is never sent to clients
+PRIVATE_FIELDS = ('seqs', 'turn_symbol', 'turn_version', 'last_active', 'connected', 'abandoned_at',
+                  'spectators', 'log')
 
-    return False
+def game_state(game):
+    """JSON-ready copy of a game dict with the board in list-of-lists form"""
+    state = {key: value for key, value in game.items() if key not in PRIVATE_FIELDS}
+    state['board'] = game['board'].to_rows()
+    return state
+
+def send_after(txn, event, data, to, skip_sid=None):
+    """Emit once the room transaction commits (uses socketio.emit, so it works off-request)"""
+    txn.after(socketio.emit, event, data, to=to, skip_sid=skip_sid)
+
+def emit_game_delta(txn, room, cells=(), skip_sid=None, **changes):
+    """Bump the room version and broadcast only what changed.
+
+    cells is a list of [x, y, value] triples; any other changed fields of
+    the game dict (players, powerups, reset, ...) are passed as keywords.
+    Clients that see a version gap ask for a snapshot with request_sync.
+    """
+    game = txn.game
+    game['version'] += 1
+    # remember where the current turn (or a fresh board) began, for stale-move checks
+    if changes.get('reset') or game['turn'] != game.get('turn_symbol'):
+        game['turn_symbol'] = game['turn']
+        game['turn_version'] = game['version']
+    delta = {'version': game['version'], 'turn': game['turn'], 'cells': list(cells)}
+    delta.update(changes)
+    send_after(txn, 'game_delta', delta, room, skip_sid)
+    # game['spectators'] counts watchers on every worker; the hub coalesces for all of them
+    if game.get('spectators'):
+        txn.after(spectator_hub.publish, room, delta)
+
+def replay_row(game, winner, ts):
+    """The finished game's move log as a replays row (a varint blob), or None if nothing was played"""
+    events = game.get('log')
+    if not events:
+        return None
+    size = game['size']
+    players = game['players']
+    blob = replay.encode(events)
+    replay_stats['games'] += 1
+    replay_stats['events'] += len(events)
+    replay_stats['bytes'] += len(blob)
+    return (size, players[0], players[1] if len(players) > 1 else None, winner,
+            replay.move_count(size, events), ts, blob)
+
+def record_replay(game, winner, ts):
+    """Queue the finished game's move log"""
+    try:
+        row = replay_row(game, winner, ts)
+        if row is not None:
+            db.add_replay(row)
+    except Exception as e:
+        log_error("REPLAY_SAVE_ERROR", "Failed to save replay", str(e))
+
+def record_result(game, winner):
+    """Write history/leaderboard rows and the replay for a finished game (winner is None on a draw)"""
+    size = game['size']
+    ts = datetime.datetime.utcnow().isoformat()
+    players = game['players']
+    record_replay(game, winner, ts)
+
+    if game.get('ai'):
+        # only the human side of a server-AI game is recorded, like solo games
+        human = players[0]
+        result = 'draw' if winner is None else ('win' if winner == human else 'loss')
+        add_history_entry({'username': human, 'opponent': AI_PLAYER, 'mode': 'server_ai', 'result': result, 'board_size': size, 'date': ts})
+        return
+
+    if winner is None:
+        # save draw history for all players
+        add_history_entry({'username': players[0], 'opponent': players[1], 'mode': 'multiplayer', 'result': 'draw', 'board_size': size, 'date': ts})
+        return
+
+    # loser is the other player if present
+    loser = None
+    if len(players) >= 2:
+        loser = players[1] if players[0] == winner else players[0]
+    update_leaderboard(winner, 10)
+
+    # save history for both players (if they exist)
+    add_history_entry({'username': winner, 'opponent': loser or 'opponent', 'mode': 'multiplayer', 'result': 'win', 'board_size': size, 'date': ts})
+    if loser:
+        add_history_entry({'username': loser, 'opponent': winner, 'mode': 'multiplayer', 'result': 'loss', 'board_size': size, 'date': ts})
+
+def check_move_sequence(game, username, client_id, seq, seen_version):
+    """Why a client's move must be dropped ('duplicate' or 'stale'), or None.
+
+    Clients number their moves per page load (client_id, seq). A seq at or
+    below the last one seen from that client is a resend or double-click
+    and is ignored without touching the game. seen_version is the room
+    version the client had when it sent the move; if the current turn
+    began after that, the move was aimed at a board it had not seen.
+    """
+    if seq is not None:
+        seqs = game.setdefault('seqs', {})
+        last = seqs.get(username)
+        if last is not None and last[0] == client_id and seq <= last[1]:
+            return 'duplicate'
+        seqs[username] = [client_id, seq]
+    if seen_version is not None and seen_version < game.get('turn_version', 0):
+        return 'stale'
+    return None
+
+def apply_move(txn, room, player, x, y):
+    """Place the current turn's symbol at (x, y) and settle a win or draw.
+
+    Returns False (and changes nothing) if the cell is already taken.
+    """
+    game = txn.game
+    move = rules.play(game, x, y)
+    if move is None:
+        return False
+    emit_game_delta(txn, room, [[x, y, move.symbol]])
+
+    if move.line:
+        winner = player
+        loser = next((p for p in game['players'] if p != player), None)
+        result = {'winner': player, 'loser': loser, 'status': 'win', 'line': move.line}
+    elif move.draw:
+        winner = None
+        result = {'winner': None, 'status': 'draw'}
+    else:
+        return True
+    send_after(txn, 'game_over', result, room)
+    if game.get('spectators'):
+        send_after(txn, 'game_over', result, watch_room(room))
+    if game.get('tournament'):
+        # the round writes tournament results; a replayed draw just plays on
+        if finish_tournament_game(txn, room, winner):
+            return True
+    else:
+        txn.after(record_result, dict(game), winner)
+
+    # reset board (record_result keeps the finished game's log)
+    rules.reset_board(game)
+    emit_game_delta(txn, room, reset=True)
+    return True
+
+def start_ai_turn(txn, room):
+    """Hand the AI's reply to the process pool; finish_ai_turn applies it.
+
+    The search gets the board's raw bitboards and a wall-clock deadline,
+    so time spent waiting for a worker counts against AI_TIME_BUDGET.
+    It is submitted only once txn commits. When the pool is saturated, or
+    a worker died and the pool is being restarted, a quick in-process
+    search answers instead.
+    """
+    game = txn.game
+    if rules.skip_blocked_turn(game, AI_PLAYER):
+        send_after(txn, 'game_message', {'message': f'{AI_PLAYER} was blocked this turn.'}, room)
+        emit_game_delta(txn, room, blocked=False, blocked_player=None)
+        return
+
+    board = game['board']
+    txn.after(submit_ai_search, room, game['version'], board.size, board.x_bits, board.o_bits, game['ai'])
+
+def submit_ai_search(room, version, size, x_bits, o_bits, symbol):
+    deadline = time.time() + AI_TIME_BUDGET
+    submitted = ai_pool.submit(
+        room,
+        search_worker,
+        (size, x_bits, o_bits, symbol, deadline),
+        deadline,
+        # callbacks arrive on the pool's result thread; rooms are only touched on the event loop
+        on_result=lambda result: concurrency.to_loop(finish_ai_turn, room, version, result),
+        on_error=lambda error: concurrency.to_loop(ai_fallback_turn, room, version, error)
+    )
+    if not submitted:
+        socketio.start_background_task(ai_fallback_turn, room, version, None)
+
+def finish_ai_turn(room, version, result):
+    """Apply a finished AI search unless the room was left or moved on"""
+    def play(txn):
+        game = txn.game
+        if game is None or game['version'] != version or result.move is None:
+            return
+        apply_move(txn, room, AI_PLAYER, *result.move)
+
+    try:
+        games.update(room, play)
+    except Exception as e:
+        log_error("AI_MOVE_ERROR", f"Error applying AI move in room {room}", str(e))
+
+def ai_fallback_turn(room, version, error):
+    """Shallow in-process search used when the pool is full or a task failed"""
+    if error is not None:
+        log_error("AI_POOL_ERROR", f"AI search failed in room {room}", str(error))
+    def position(txn):
+        game = txn.game
+        if game is None or game['version'] != version:
+            return None
+        return game['board'].copy(), game['ai']
+
+    found = games.update(room, position)
+    if found is None:
+        return
+    board, symbol = found
+    result = concurrency.run_blocking(search_move, board, symbol, AI_FALLBACK_BUDGET)
+    finish_ai_turn(room, version, result)
+
+# ---- Static assets and cached pages ----
+# static/ is read, hashed and compressed once at startup; templates link its
+# files with asset_url() and /assets/ serves them for a year (see assets.py).
+# With DEBUG=true edited files are picked up and pages are not cached.
+ASSET_RELOAD = os.environ.get('DEBUG', 'False').lower() == 'true'
+PAGE_CACHE_SIZE = 0 if ASSET_RELOAD else int(os.environ.get('PAGE_CACHE_SIZE', 1024))
+static_assets = assets.Assets(app.static_folder, reload=ASSET_RELOAD)
+page_cache = assets.PageCache(PAGE_CACHE_SIZE)
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+@app.route('/assets/<path:name>')
+def asset_file(name):
+    asset, cache_control = static_assets.lookup(name)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return assets.serve(asset, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'),
+                        cache_control)
+
+def render_page(template, **context):
+    """render_template through the page cache, compressed, with an ETag so a reload can be a 304"""
+    key = (template,) + tuple(sorted(context.items()))
+    page = page_cache.get(key, lambda: render_template(template, **context))
+    # the page depends on the session: browsers keep it but revalidate, shared caches do not keep it
+    return assets.serve(page, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'),
+                        'private, no-cache', vary=('Accept-Encoding', 'Cookie'))
+
+def render_game_page(username, board_size, mode, room_code):
+    if not username or username == 'Guest':
+        # the login form, the same page for everyone
+        return render_page('game.html', username=None)
+    return render_page('game.html', username=username, board_size=board_size, mode=mode, room_code=room_code)
 
 # ---- Routes ----
 @app.route('/')
 def root():
-    # Clear session and redirect to game page for fresh start
-    session.clear()
-    return redirect(url_for('game_page'))
+    # A fresh start: forget the session and show the login form (what /game would show now)
+    # here rather than redirecting to it
+    if session:
+        session.clear()
+    return render_game_page(None, 3, 'solo', None)
 
 @app.route('/game', methods=['GET', 'POST'])
 def game_page():
@@ -278,14 +677,20 @@ def game_page():
         if not username:
             username = 'Guest'
             
-        board_size = int(request.form.get('board_size', 3))
+        try:
+            board_size = parse_board_size(request.form.get('board_size', 3))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         mode = request.form.get('mode', 'solo')
         room_code = request.form.get('room_code', '').strip()
 
         if mode == 'multiplayer' and not room_code:
-            room_code = str(random.randint(1000, 9999))
+            # the room exists from here on; if nobody joins, the reaper's grace period applies
+            now = time.time()
+            room_code = claim_new_room(games, new_game([username], [username], board_size,
+                                                       last_active=now, abandoned_at=now))
 
-        if mode == 'solo':
+        if mode in ('solo', 'server_ai', 'matchmaking'):
             room_code = None
 
         # Store in session
@@ -298,13 +703,7 @@ def game_page():
         if mode == 'multiplayer' and room_code:
             save_user_session(username, room_code, board_size, mode)
 
-        return render_template(
-            'game.html',
-            username=username,
-            board_size=board_size,
-            mode=mode,
-            room_code=room_code
-        )
+        return render_game_page(username, board_size, mode, room_code)
     
     # GET request - check if user has session
     username = session.get('username')
@@ -324,13 +723,7 @@ def game_page():
             session['mode'] = mode
     
     # If no session exists, show the login form
-    return render_template(
-        'game.html',
-        username=username,
-        board_size=board_size,
-        mode=mode,
-        room_code=room_code
-    )
+    return render_game_page(username, board_size, mode, room_code)
 
 @app.route('/logout')
 def logout():
@@ -360,19 +753,42 @@ def history_endpoint():
         username = request.args.get('username')
         if not username:
             return jsonify([]), 200
-        data = get_history_for_user(username)
-        return jsonify(data), 200
+        try:
+            limit = min(HISTORY_MAX_PAGE, max(1, int(request.args.get('limit', HISTORY_MAX_PAGE))))
+            before = request.args.get('before')
+            before = int(before) if before else None
+        except ValueError:
+            return jsonify({'error': 'limit and before must be integers'}), 400
+        data = get_history_for_user(username, limit, before)
+        response = jsonify(data)
+        # keyset cursor for the next (older) page; absent on the last page
+        if len(data) == limit:
+            cursor = data[-1]['id']
+            response.headers['X-Next-Cursor'] = str(cursor)
+            response.headers['Link'] = '<{}>; rel="next"'.format(
+                url_for('history_endpoint', username=username, limit=limit, before=cursor))
+        return response, 200
 
     # POST: insert history entry
     try:
         payload = request.get_json()
+        if payload.get('mode') not in CLIENT_HISTORY_MODES:
+            # games played on the server are recorded by the server
+            return jsonify({'status': 'error', 'error': 'only solo games can be posted'}), 400
         # validate minimal fields
+        if not all(isinstance(payload.get(field), str) and payload.get(field)
+                   for field in ('username', 'opponent', 'result')):
+            return jsonify({'status': 'error', 'error': 'username, opponent and result must be non-empty strings'}), 400
+        if payload['result'] not in HISTORY_RESULTS:
+            return jsonify({'status': 'error', 'error': 'result must be win, loss or draw'}), 400
+        if not isinstance(payload.get('date') or '', str):
+            return jsonify({'status': 'error', 'error': 'date must be a string'}), 400
         entry = {
             'username': payload.get('username'),
             'opponent': payload.get('opponent'),
             'mode': payload.get('mode'),
             'result': payload.get('result'),
-            'board_size': int(payload.get('board_size', 3)),
+            'board_size': parse_board_size(payload.get('board_size', 3)),
             'date': payload.get('date') or datetime.datetime.utcnow().isoformat()
         }
         add_history_entry(entry)
@@ -381,15 +797,172 @@ def history_endpoint():
         log_error("HISTORY_API_ERROR", "Failed to process history POST", str(e))
         return jsonify({'status':'error'}), 400
 
+def conditional_json(payload, etag):
+    """JSON response with an ETag; answers 304 when the client's copy is current"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/leaderboard')
+def leaderboard_endpoint():
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(LEADERBOARD_MAX_PAGE, max(1, int(request.args.get('limit', 20))))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    try:
+        entries, total, version = leaderboard.page(offset, limit)
+    except Exception as e:
+        log_error("LEADERBOARD_LOAD_ERROR", "Failed to read leaderboard", str(e))
+        return jsonify({'error': 'Leaderboard unavailable'}), 500
+    payload = {'entries': entries, 'offset': offset, 'limit': limit, 'total': total}
+    return conditional_json(payload, f'lb-{version}-{offset}-{limit}')
+
+@app.route('/leaderboard/rank')
+def leaderboard_rank():
+    username = request.args.get('username')
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    try:
+        entry = leaderboard.rank(username)
+    except Exception as e:
+        log_error("LEADERBOARD_LOAD_ERROR", f"Failed to read rank for {username}", str(e))
+        return jsonify({'error': 'Leaderboard unavailable'}), 500
+    if entry is None:
+        return jsonify({'error': 'No leaderboard entry found'}), 404
+    return conditional_json(entry, f'rank-{entry["rank"]}-{entry["score"]}-{entry["wins"]}')
+
+@app.route('/history/stats')
+def history_stats():
+    username = request.args.get('username')
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    stats = get_stats_for_user(username)
+    if stats is None:
+        return jsonify({'error': 'Stats unavailable'}), 500
+    return jsonify(stats), 200
+
+@app.route('/history/export')
+def history_export():
+    """Stream a user's whole history as NDJSON (default) or CSV"""
+    username = request.args.get('username')
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    def generate():
+        try:
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(HISTORY_FIELDS)
+                for rows in iter_history_pages(username):
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                # one chunk per page keeps the number of socket writes down
+                for rows in iter_history_pages(username):
+                    yield ''.join(json.dumps(dict(zip(HISTORY_FIELDS, row))) + '\n' for row in rows)
+        except Exception as e:
+            # headers are already sent; all we can do is log and end the stream
+            log_error("HISTORY_EXPORT_ERROR", f"Failed to export history for {username}", str(e))
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f'history-{username}.{fmt}'
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+REPLAY_MAX_PAGE = 100
+REPLAY_FIELDS = ('id', 'board_size', 'player_x', 'player_o', 'winner', 'moves', 'date', 'bytes')
+
+@app.route('/replays')
+def replays_endpoint():
+    """Newest-first page of the recorded games a user played in (either side)"""
+    username = request.args.get('username')
+    if not username:
+        return jsonify({'error': 'Username required'}), 400
+    try:
+        limit = min(REPLAY_MAX_PAGE, max(1, int(request.args.get('limit', REPLAY_MAX_PAGE))))
+        before = request.args.get('before')
+        before = int(before) if before else 2 ** 63 - 1
+    except ValueError:
+        return jsonify({'error': 'limit and before must be integers'}), 400
+    try:
+        rows = db.query("SELECT id, board_size, player_x, player_o, winner, moves, date, length(log) FROM replays "
+                        "WHERE (player_x = ? OR player_o = ?) AND id < ? ORDER BY id DESC LIMIT ?",
+                        (username, username, before, limit))
+    except Exception as e:
+        log_error("REPLAY_LOAD_ERROR", f"Failed to list replays for {username}", str(e))
+        return jsonify({'error': 'Replays unavailable'}), 500
+    response = jsonify([dict(zip(REPLAY_FIELDS, row)) for row in rows])
+    if len(rows) == limit:
+        response.headers['X-Next-Cursor'] = str(rows[-1][0])
+        response.headers['Link'] = '<{}>; rel="next"'.format(
+            url_for('replays_endpoint', username=username, limit=limit, before=rows[-1][0]))
+    return response, 200
+
+@app.route('/replays/<int:replay_id>')
+def replay_stream(replay_id):
+    """One game move by move as NDJSON: a header line, then one line per event.
+
+    Steps carry cells as [x, y, value] like game_delta, so a client can
+    apply them to an empty board with the same code it uses live.
+    """
+    try:
+        row = db.query_one("SELECT id, board_size, player_x, player_o, winner, moves, date, log FROM replays "
+                           "WHERE id = ?", (replay_id,))
+    except Exception as e:
+        log_error("REPLAY_LOAD_ERROR", f"Failed to load replay {replay_id}", str(e))
+        return jsonify({'error': 'Replays unavailable'}), 500
+    if row is None:
+        return jsonify({'error': 'Replay not found'}), 404
+    header = dict(zip(REPLAY_FIELDS, row[:7] + (len(row[7]),)))
+
+    # a game is at most a few hundred short lines: one body, one socket write
+    lines = [json.dumps(header)]
+    lines.extend(json.dumps(step) for step in replay.steps(row[1], row[7]))
+    return Response('\n'.join(lines) + '\n', mimetype='application/x-ndjson')
+
+# live gauges, read only when /metrics is scraped
+metrics_registry.gauge('xo_rooms', 'Game rooms held in the store', fn=lambda: len(games))
+metrics_registry.gauge('xo_playing_sockets', 'Sockets joined to a room as players', fn=lambda: len(sid_rooms))
+metrics_registry.gauge('xo_spectators', 'Spectator sockets on this worker', fn=lambda: spectator_hub.stats()['spectators'])
+metrics_registry.gauge('xo_matchmaking_waiting', 'Players queued for a match', fn=lambda: len(matchmaker))
+metrics_registry.gauge('xo_db_write_queue', 'Writes queued for the database writer', fn=lambda: db.stats()['queued'])
+metrics_registry.gauge('xo_line_index_bytes', 'Memory of the shared win-line indexes, all board sizes',
+                       fn=lambda: sum(stats['bytes'] for stats in lines.index_stats()))
+metrics_registry.gauge('xo_ai_searches_pending', 'AI searches queued or running', fn=lambda: ai_pool.stats()['pending'])
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health')
 def health_check():
-    return {'status': 'healthy', 'timestamp': datetime.datetime.utcnow().isoformat()}, 200
+    return {'status': 'healthy', 'timestamp': datetime.datetime.utcnow().isoformat(),
+            'rooms': dict(reaper.stats(), total=len(games)),
+            'matchmaking': matchmaker.stats(),
+            'spectators': spectator_hub.stats(),
+            'replays': replay_stats,
+            'tournaments': len(tournaments),
+            'line_index': lines.index_stats(),
+            'assets': dict(static_assets.stats(), pages=page_cache.stats())}, 200
 
 # ---- Socket.IO events ----
 @socketio.on('connect')
 def handle_connect():
     try:
         print(f"Client connected: {request.sid}")
+        connections.inc()
+        start_background_tasks()
     except Exception as e:
         log_error("CONNECT_ERROR", "Error in connect handler", str(e))
 
@@ -397,16 +970,75 @@ def handle_connect():
 def handle_disconnect():
     try:
         print(f"Client disconnected: {request.sid}")
+        connections.dec()
+        events.forget(request.sid)
+        stop_spectating(request.sid)
+        queued = queued_sids.pop(request.sid, None)
+        if queued:
+            matchmaker.cancel(queued, request.sid)
+        joined = sid_rooms.pop(request.sid, None)
+        if joined:
+            # nobody is waiting for this room's AI reply any more
+            ai_pool.cancel(joined[0])
+            release_room(joined[0])
     except Exception as e:
         log_error("DISCONNECT_ERROR", "Error in disconnect handler", str(e))
 
+def release_room(room):
+    """One socket fewer in room; the reaper's grace period starts when none are left"""
+    def release(txn):
+        if txn.game is not None:
+            player_disconnected(txn.game)
+    games.update(room, release)
+
+def switch_room(sid, room):
+    """True if this socket is already counted in room; releases any other room it was in"""
+    previous = sid_rooms.get(sid)
+    if previous is None:
+        return False
+    if previous[0] == room:
+        return True
+    sid_rooms.pop(sid, None)
+    release_room(previous[0])
+    return False
+
 @socketio.on('join')
+@metrics.timed(event_seconds.labels('join'))
 def handle_join(data):
     """Handle player joining a room"""
     try:
         room = data.get('room')
         username = data.get('username') or 'Guest'
-        size = int(data.get('board_size', 3) or 3)
+        sid = request.sid
+        try:
+            size = parse_board_size(data.get('board_size') or 3)
+        except ValueError as e:
+            emit('join_error', {'message': str(e)}, room=sid)
+            return
+
+        # Solo vs the server AI: one private room per user, resumed on reconnect
+        if data.get('vs_ai'):
+            room = f'AI-{username}'
+            join_room(room)
+            counted = switch_room(sid, room)
+
+            def join_ai(txn):
+                if txn.game is None:
+                    txn.create(new_game([username, AI_PLAYER], [username], size, ai='O'))
+                    print(f"[room {room}] created by {username} vs server AI")
+                if counted:
+                    touch(txn.game)
+                else:
+                    player_connected(txn.game)
+                send_after(txn, 'joined_room', {'room': room}, sid)
+                send_after(txn, 'game_update', game_state(txn.game), sid)
+                # resume an AI turn that a disconnect cancelled
+                if txn.game['turn'] == txn.game['ai'] and not ai_pool.is_pending(room):
+                    start_ai_turn(txn, room)
+
+            sid_rooms[sid] = (room, username)
+            games.update(room, join_ai)
+            return
         
         # Handle LOCAL room case
         if room is None or room == 'null' or room == '' or room == 'LOCAL':
@@ -417,44 +1049,50 @@ def handle_join(data):
 
         # Save session for recovery
         save_user_session(username, room, size, 'multiplayer')
+        counted = switch_room(sid, room)
 
-        # create or update game state
-        if room not in games:
-            # initialize new game
-            games[room] = {
-                'board': new_empty_board(size),
-                'players': [username],
-                'turn': 'X',
-                'powerups': { username: {'block': 1, 'clear': 1} },
-                'size': size,
-                'blocked': False,
-                'blocked_player': None,
-                'clear_mode': None,
-                'new_game_requested_by': None
-            }
-            print(f"[room {room}] created by {username}")
-        else:
-            # add player if not present and if less than 2
-            if username not in games[room]['players'] and len(games[room]['players']) < 2:
-                games[room]['players'].append(username)
-                games[room]['powerups'][username] = {'block': 1, 'clear': 1}
-                print(f"[room {room}] {username} joined")
+        def join(txn):
+            # create or update game state
+            if txn.game is None:
+                # initialize new game
+                txn.create(new_game([username], [username], size))
+                print(f"[room {room}] created by {username}")
             else:
-                # If already there or room full, ignore extra joins
-                if username not in games[room]['players']:
+                game = txn.game
+                # add player if not present and if less than 2
+                if username not in game['players'] and len(game['players']) < 2:
+                    game['players'].append(username)
+                    game['powerups'][username] = dict(rules.STARTING_POWERUPS)
+                    print(f"[room {room}] {username} joined")
+                    # players already in the room only need the roster change
+                    emit_game_delta(txn, room, skip_sid=sid, players=game['players'], powerups=game['powerups'])
+                elif username not in game['players']:
+                    # If already there or room full, ignore extra joins
                     print(f"[room {room}] join attempted but room full/occupied")
-                    emit('join_error', {'message': 'Room is full'}, room=request.sid)
-                    return
+                    send_after(txn, 'join_error', {'message': 'Room is full', 'can_spectate': True}, sid)
+                    return False
 
-        emit('joined_room', {'room': room})
-        # push initial game state to the room
-        emit('game_update', games[room], room=room)
+            if counted:
+                touch(txn.game)
+            else:
+                player_connected(txn.game)
+            send_after(txn, 'joined_room', {'room': room}, sid)
+            # full snapshot only for the joining (or reconnecting) client
+            send_after(txn, 'game_update', game_state(txn.game), sid)
+            return True
+
+        if games.update(room, join):
+            sid_rooms[sid] = (room, username)
+        else:
+            # turned away: stop receiving the players' broadcasts
+            leave_room(room)
         
     except Exception as e:
         log_error("JOIN_ERROR", f"Error joining room {data.get('room')}", str(e))
         emit('join_error', {'message': 'Internal server error'}, room=request.sid)
 
 @socketio.on('leave_room')
+@metrics.timed(event_seconds.labels('leave_room'))
 def handle_leave_room(data):
     """Handle player leaving room"""
     try:
@@ -463,22 +1101,40 @@ def handle_leave_room(data):
         
         if room in games and room != 'LOCAL':
             leave_room(room)
-            game = games[room]
-            if username in game['players']:
+            joined = sid_rooms.pop(request.sid, None)
+            counted = joined is not None and joined[0] == room
+            ai_pool.cancel(room)
+
+            def leave(txn):
+                game = txn.game
+                if game is None:
+                    return
+                if counted:
+                    player_disconnected(game)
+                if username not in game['players']:
+                    return
+                if game.get('tournament'):
+                    # leaving a tournament match forfeits it
+                    opponent = next(p for p in game['players'] if p != username)
+                    send_after(txn, 'game_message', {'message': f'{username} left the game'}, room)
+                    finish_tournament_game(txn, room, opponent)
+                    return
                 game['players'].remove(username)
                 if username in game['powerups']:
                     del game['powerups'][username]
                 
                 print(f"[room {room}] {username} left")
                 
-                # If room becomes empty, clean it up
-                if len(game['players']) == 0:
-                    del games[room]
+                # If room becomes empty (or only the AI is left), clean it up
+                if len(game['players']) == 0 or game.get('ai'):
+                    txn.delete()
                     print(f"[room {room}] deleted (empty)")
                 else:
                     # Notify remaining players
-                    emit('game_message', {'message': f'{username} left the game'}, room=room)
-                    emit('game_update', game, room=room)
+                    send_after(txn, 'game_message', {'message': f'{username} left the game'}, room)
+                    emit_game_delta(txn, room, players=game['players'], powerups=game['powerups'])
+
+            games.update(room, leave)
             
             # Clear user session when they intentionally leave
             clear_user_session(username)
@@ -487,6 +1143,7 @@ def handle_leave_room(data):
         log_error("LEAVE_ROOM_ERROR", f"Error leaving room {data.get('room')}", str(e))
 
 @socketio.on('make_move')
+@metrics.timed(event_seconds.labels('make_move'))
 def handle_move(data):
     """Handle player making a move"""
     try:
@@ -497,111 +1154,467 @@ def handle_move(data):
         x = int(data.get('x'))
         y = int(data.get('y'))
         username = data.get('username')
+        sid = request.sid
+        # optional sequencing from the client: (client, seq) and the version it had seen
+        client_id = data.get('client')
+        seq = int(data['seq']) if data.get('seq') is not None else None
+        seen_version = int(data['version']) if data.get('version') is not None else None
 
-        if room not in games:
-            emit('game_message', {'message': 'Game room not found.'}, room=request.sid)
-            return
+        def move(txn):
+            game = txn.game
+            if game is None:
+                send_after(txn, 'game_message', {'message': 'Game room not found.'}, sid)
+                return
+            touch(game)
 
-        game = games[room]
+            # resends and moves made against an outdated board change nothing
+            reason = check_move_sequence(game, username, client_id, seq, seen_version)
+            if reason:
+                send_after(txn, 'move_rejected', {'seq': seq, 'reason': reason}, sid)
+                return
 
-        # require two players to actually play (server enforces)
-        if len(game['players']) < 2:
-            emit('game_update', game, room=room)
-            return
+            # require two players to actually play (server enforces)
+            if len(game['players']) < 2:
+                send_after(txn, 'game_update', game_state(game), sid)
+                return
+
+            # validate bounds
+            size = game['size']
+            if not (0 <= x < size and 0 <= y < size):
+                return
+
+            # clear mode handling
+            if game.get('clear_mode') == username:
+                if rules.clear_cell(game, x, y):
+                    send_after(txn, 'game_message', {'message': f'{username} cleared a cell.'}, room)
+                    emit_game_delta(txn, room, [[x, y, None]], clear_mode=None)
+                else:
+                    send_after(txn, 'game_message', {'message': f'{username} attempted to clear an empty cell.'}, room)
+                return
+
+            # block handling: if this user is blocked, skip their move and flip turn
+            if rules.skip_blocked_turn(game, username):
+                send_after(txn, 'game_message', {'message': f'{username} was blocked this turn.'}, room)
+                emit_game_delta(txn, room, blocked=False, blocked_player=None)
+                if game.get('ai') and game['turn'] == game['ai']:
+                    start_ai_turn(txn, room)
+                return
+
+            # map current turn to expected player
+            expected_player = rules.player_to_move(game)
+            if expected_player is None:
+                # no player assigned for this symbol (shouldn't happen)
+                send_after(txn, 'game_update', game_state(game), sid)
+                return
+            if expected_player != username:
+                return
 
-        # validate bounds
-        size = game['size']
-        if not (0 <= x < size and 0 <= y < size):
+            # place move if empty, then let the server AI answer
+            if apply_move(txn, room, username, x, y) and game.get('ai') and game['turn'] == game['ai']:
+                start_ai_turn(txn, room)
+
+        games.update(room, move)
+                
+    except Exception as e:
+        log_error("MOVE_ERROR", f"Error processing move in room {data.get('room')}", str(e))
+        emit('game_message', {'message': 'Error processing move'}, room=request.sid)
+
+@socketio.on('find_match')
+def handle_find_match(data):
+    """Queue a player for an opponent of similar rating on their board size"""
+    try:
+        username = data.get('username') or 'Guest'
+        sid = request.sid
+        try:
+            size = parse_board_size(data.get('board_size') or 3)
+        except ValueError as e:
+            emit('match_error', {'message': str(e)}, room=sid)
             return
+        rating = get_rating(username, size)
+        queued_sids[sid] = username
+        match = matchmaker.enqueue(username, size, rating, sid)
+        if match is None:
+            emit('match_queued', {'board_size': size, 'rating': round(rating)}, room=sid)
+        else:
+            start_match(match)
+    except Exception as e:
+        log_error("MATCHMAKING_ERROR", f"Error queueing {data.get('username')} for a match", str(e))
+        emit('match_error', {'message': 'Matchmaking is unavailable'}, room=request.sid)
 
-        # clear mode handling
-        if game.get('clear_mode') == username:
-            if game['board'][x][y] is not None:
-                game['board'][x][y] = None
-                game['clear_mode'] = None
-                emit('game_message', {'message': f'{username} cleared a cell.'}, room=room)
-                emit('game_update', game, room=room)
-            else:
-                game['clear_mode'] = None
-                emit('game_message', {'message': f'{username} attempted to clear an empty cell.'}, room=room)
+@socketio.on('cancel_match')
+def handle_cancel_match(data):
+    try:
+        username = queued_sids.pop(request.sid, None)
+        if username:
+            matchmaker.cancel(username, request.sid)
+    except Exception as e:
+        log_error("MATCHMAKING_ERROR", "Error cancelling a match search", str(e))
+
+def start_match(match):
+    """Open a room for a matched pair and send both players to it"""
+    (first, first_sid), (second, second_sid) = match.players
+    for sid in (first_sid, second_sid):
+        queued_sids.pop(sid, None)
+    # the longer-waiting player moves first; the room is abandoned until someone joins
+    now = time.time()
+    room = claim_new_room(games, new_game([first, second], [first, second], match.size,
+                                          last_active=now, abandoned_at=now))
+    print(f"[room {room}] matched {first} vs {second} (waited {match.waited:.1f}s)")
+    for sid, opponent in ((first_sid, second), (second_sid, first)):
+        socketio.emit('match_found', {'room': room, 'board_size': match.size, 'opponent': opponent}, to=sid)
+
+# ---- Power-ups, chat and the new-game handshake ----
+ROOM_FIELD = Str(1, 64)
+NAME_FIELD = Str(1, 64)
+CHAT_MAX_LENGTH = 500
+
+def player_in_room(sid, room, username):
+    """True if this socket joined room as username (payload names are not trusted)"""
+    return sid_rooms.get(sid) == (room, username)
+
+@events.on('use_power_up', {'room': ROOM_FIELD, 'username': NAME_FIELD, 'power_up': Choice(*rules.POWER_UPS)},
+           rate=2, burst=4)
+def handle_use_power_up(sid, data):
+    """Spend a power-up on your own turn: block skips the opponent's next move,
+    clear lets your next click empty an occupied cell"""
+    room, username, power = data['room'], data['username'], data['power_up']
+    if not player_in_room(sid, room, username):
+        emit('power_up_error', {'message': 'You are not playing in this room'}, room=sid)
+        return
+
+    def use(txn):
+        game = txn.game
+        if game is None:
+            send_after(txn, 'power_up_error', {'message': 'Game room not found.'}, sid)
+            return
+        touch(game)
+        error = rules.use_power_up(game, username, power)
+        if error:
+            send_after(txn, 'power_up_error', {'message': error}, sid)
             return
 
-        # block handling: if this user is blocked, skip their move and flip turn
-        if game.get('blocked') and game.get('blocked_player') == username:
-            game['blocked'] = False
-            game['blocked_player'] = None
-            # flip the turn to other player
-            game['turn'] = 'O' if game['turn'] == 'X' else 'X'
-            emit('game_message', {'message': f'{username} was blocked this turn.'}, room=room)
-            emit('game_update', game, room=room)
+        if power == rules.BLOCK:
+            opponent = game['blocked_player']
+            send_after(txn, 'game_message', {'message': f'{username} blocked {opponent}\'s next turn.'}, room)
+            emit_game_delta(txn, room, powerups=game['powerups'], blocked=True, blocked_player=opponent)
+        else:
+            send_after(txn, 'game_message', {'message': f'{username} is clearing a cell.'}, room)
+            emit_game_delta(txn, room, powerups=game['powerups'], clear_mode=username)
+
+    games.update(room, use)
+
+@events.on('chat_message', {'room': ROOM_FIELD, 'username': NAME_FIELD, 'message': Str(1, CHAT_MAX_LENGTH)},
+           rate=1, burst=5)
+def handle_chat_message(sid, data):
+    room, username = data['room'], data['username']
+    message = data['message'].strip()
+    if not message or not player_in_room(sid, room, username):
+        return
+    socketio.emit('chat_update', {'username': username, 'message': message}, to=room)
+
+def restart_game(txn, room):
+    """Fresh board and power-ups for the same players (X starts again)"""
+    game = txn.game
+    rules.restart(game)
+    txn.after(ai_pool.cancel, room)
+    send_after(txn, 'game_message', {'message': 'A new game has started.'}, room)
+    emit_game_delta(txn, room, reset=True, powerups=game['powerups'], blocked=False,
+                    blocked_player=None, clear_mode=None)
+
+@events.on('request_new_game', {'room': ROOM_FIELD, 'username': NAME_FIELD}, rate=1, burst=3)
+def handle_request_new_game(sid, data):
+    """Ask the opponent to start over (the server AI always agrees)"""
+    room, username = data['room'], data['username']
+    if not player_in_room(sid, room, username):
+        return
+
+    def request_restart(txn):
+        game = txn.game
+        # a tournament match cannot be started over
+        if game is None or username not in game['players'] or game.get('tournament'):
             return
+        touch(game)
+        if game.get('ai') or len(game['players']) < 2:
+            restart_game(txn, room)
+            return
+        requested_by = game.get('new_game_requested_by')
+        if requested_by and requested_by != username:
+            # both asked: that is agreement
+            restart_game(txn, room)
+            return
+        game['new_game_requested_by'] = username
+        send_after(txn, 'new_game_requested', {'requested_by': username}, room, skip_sid=sid)
+        send_after(txn, 'game_message', {'message': f'{username} asked for a new game.'}, room)
+
+    games.update(room, request_restart)
+
+@events.on('confirm_new_game', {'room': ROOM_FIELD, 'username': NAME_FIELD}, rate=1, burst=3)
+def handle_confirm_new_game(sid, data):
+    room, username = data['room'], data['username']
+    if not player_in_room(sid, room, username):
+        return
 
-        current_turn = game['turn']
-        # map current turn to expected player
-        player_index = 0 if current_turn == 'X' else 1
-        if player_index >= len(game['players']):
-            # no player assigned for this symbol (shouldn't happen)
-            emit('game_update', game, room=room)
+    def confirm(txn):
+        game = txn.game
+        if game is None or username not in game['players']:
             return
-        expected_player = game['players'][player_index]
-        if expected_player != username:
+        requested_by = game.get('new_game_requested_by')
+        # only the player who was asked can agree
+        if requested_by and requested_by != username:
+            restart_game(txn, room)
+
+    games.update(room, confirm)
+
+@events.on('cancel_new_game', {'room': ROOM_FIELD, 'username': NAME_FIELD}, rate=1, burst=3)
+def handle_cancel_new_game(sid, data):
+    room, username = data['room'], data['username']
+    if not player_in_room(sid, room, username):
+        return
+
+    def decline(txn):
+        game = txn.game
+        if game is None or username not in game['players'] or not game.get('new_game_requested_by'):
             return
+        game['new_game_requested_by'] = None
+        send_after(txn, 'game_message', {'message': f'{username} wants to keep playing this game.'}, room)
 
-        # place move if empty
-        if game['board'][x][y] is None:
-            game['board'][x][y] = current_turn
-            
-            # normal turn swap
-            game['turn'] = 'O' if current_turn == 'X' else 'X'
-            emit('game_update', game, room=room)
-            
+    games.update(room, decline)
 
-            # check win based on win length
-            win_len = get_win_len(size)
-            if check_winner(game['board'], current_turn, win_len):
-                # update leaderboard & history
-                winner = username
-                # loser is the other player if present
-                loser = None
-                if len(game['players']) >= 2:
-                    loser = game['players'][1] if game['players'][0] == username else game['players'][0]
-                update_leaderboard(winner, 10)
-
-                # save history for both players (if they exist)
-                ts = datetime.datetime.utcnow().isoformat()
-                add_history_entry({'username': winner, 'opponent': loser or 'opponent', 'mode': 'multiplayer', 'result': 'win', 'board_size': size, 'date': ts})
-                if loser:
-                    add_history_entry({'username': loser, 'opponent': winner, 'mode': 'multiplayer', 'result': 'loss', 'board_size': size, 'date': ts})
-
-                emit('game_over', {'winner': winner, 'loser': loser, 'status': 'win'}, room=room)
-
-                # reset board
-                game['board'] = new_empty_board(size)
-                game['turn'] = 'X'
-                emit('game_update', game, room=room)
-                return
+# ---- Spectators ----
+@events.on('spectate', {'room': ROOM_FIELD}, rate=1, burst=3)
+def handle_spectate(sid, data):
+    """Watch a room without playing: coalesced updates through its watch room"""
+    room = data['room']
+    if room not in games:
+        emit('spectate_error', {'message': 'Game room not found.'}, room=sid)
+        return
+    stop_spectating(sid)
+    join_room(watch_room(room))
+    spectator_hub.add(sid, room)
 
-            # check draw
-            if is_board_full(game['board']):
-                ts = datetime.datetime.utcnow().isoformat()
-                # save draw history for all players
-               
-                add_history_entry({'username': game['players'][0], 'opponent': game['players'][1], 'mode': 'multiplayer', 'result': 'draw', 'board_size': size, 'date': ts})
-                emit('game_over', {'winner': None, 'status': 'draw'}, room=room)
-                
-                # reset board
-                game['board'] = new_empty_board(size)
-                game['turn'] = 'X'
-                emit('game_update', game, room=room)
-                return
-                
+    def watch(txn):
+        game = txn.game
+        if game is None:
+            return False
+        game['spectators'] = game.get('spectators', 0) + 1
+        send_after(txn, 'spectating', {'room': room, 'audience': game['spectators']}, sid)
+        send_after(txn, 'game_update', game_state(game), sid)
+        return True
+
+    if not games.update(room, watch):
+        spectator_hub.remove(sid)
+        leave_room(watch_room(room))
+        emit('spectate_error', {'message': 'Game room not found.'}, room=sid)
+
+def stop_spectating(sid):
+    room = spectator_hub.remove(sid)
+    if room is None:
+        return
+    leave_room(watch_room(room), sid=sid)
+
+    def unwatch(txn):
+        if txn.game is not None:
+            txn.game['spectators'] = max(0, txn.game.get('spectators', 0) - 1)
+    games.update(room, unwatch)
+
+@socketio.on('request_sync')
+def handle_request_sync(data):
+    """Send a full snapshot to a client that noticed a version gap"""
+    try:
+        room = data.get('room')
+        state = room_snapshot(room)
+        if state is None:
+            emit('game_message', {'message': 'Game room not found.'}, room=request.sid)
+            return
+        emit('game_update', state, room=request.sid)
     except Exception as e:
-        log_error("MOVE_ERROR", f"Error processing move in room {data.get('room')}", str(e))
-        emit('game_message', {'message': 'Error processing move'}, room=request.sid)
+        log_error("SYNC_ERROR", f"Error syncing room {data.get('room')}", str(e))
 
 if not os.path.exists('logs'):
     os.makedirs('logs')
 
+# ---- Tournaments ----
+# A round's rooms are created together, players are sent there by a
+# tournament_update to everyone following the tournament, and each game_over
+# reports to the Tournament. Nothing is written per game: when the last match
+# of a round is in, its history, points, replays and standings are queued as
+# one database operation, and the next round's rooms are opened.
+TOURNAMENT_FIELDS = ('id', 'name', 'format', 'board_size', 'players', 'round', 'champion', 'created', 'updated')
+
+def tournament_room(tid):
+    """Socket.IO room of everyone following a tournament"""
+    return f'tournament:{tid}'
+
+def tournament_state(t, username=None):
+    """The tournament and its matches still being played, with their rooms (only username's if given)"""
+    state = dict(zip(TOURNAMENT_FIELDS, tournament_row(t, None)))
+    del state['updated']
+    state['rounds'] = t.rounds
+    state['finished'] = t.finished
+    state['matches'] = [{'match': p.match, 'room': t.rooms.get(p.match), 'x': p.x, 'o': p.o}
+                        for p in t.pending() if username is None or username in (p.x, p.o)]
+    return state
+
+def tournament_row(t, ts, saved=False):
+    # the live state shows the round being played; a saved row the last one completed
+    return (t.id, t.name, t.format, t.size, len(t.players), t.completed if saved else t.round, t.champion,
+            t.created, ts)
+
+def open_tournament_round(t, pairings):
+    """Create all of a round's rooms at once and tell the followers where to play"""
+    # rooms wait abandoned (the reaper's grace period) until their players join
+    now = time.time()
+    batch = [new_game([p.x, p.o], [p.x, p.o], t.size, last_active=now, abandoned_at=now,
+                      tournament=t.id, match=p.match, draws_left=TOURNAMENT_REPLAYED_DRAWS)
+             for p in pairings]
+    t.rooms = dict(zip((p.match for p in pairings), claim_new_rooms(games, batch)))
+    print(f"[tournament {t.id}] round {t.round}/{t.rounds}: {len(pairings)} matches")
+    socketio.emit('tournament_update', tournament_state(t), to=tournament_room(t.id))
+
+def finish_tournament_game(txn, room, winner):
+    """Close a finished tournament game and report it (winner None for a draw).
+
+    A draw with replays left is not final: returns False and the room
+    plays on with a fresh board. Otherwise the room is deleted and True
+    returned. The report runs as a background task, off this room's lock,
+    because the last report of a round creates the next round's rooms.
+    """
+    game = txn.game
+    if winner is None and game.get('draws_left', 0) > 0:
+        game['draws_left'] -= 1
+        send_after(txn, 'game_message', {'message': 'Draw: the match is replayed.'}, room)
+        return False
+    try:
+        row = replay_row(game, winner, datetime.datetime.utcnow().isoformat())
+    except Exception as e:
+        log_error("REPLAY_SAVE_ERROR", "Failed to save replay", str(e))
+        row = None
+    send_after(txn, 'tournament_match_over',
+               {'tournament': game['tournament'], 'match': game['match'], 'winner': winner}, room)
+    txn.after(socketio.start_background_task, report_tournament_result,
+              game['tournament'], game['match'], winner, row)
+    txn.delete()
+    return True
+
+def report_tournament_result(tid, match, winner, row=None):
+    """Record a match; the round's last result saves the round and opens the next one"""
+    t = tournaments.get(tid)
+    if t is None:
+        return
+    try:
+        results = t.report(match, winner, row)
+        if results is None:
+            return
+        pairings = t.next_round()
+        save_tournament_round(t, results)
+        if t.finished:
+            tournaments.pop(tid, None)
+            print(f"[tournament {tid}] won by {t.champion}")
+            socketio.emit('tournament_update', tournament_state(t), to=tournament_room(tid))
+        else:
+            open_tournament_round(t, pairings)
+    except Exception as e:
+        log_error("TOURNAMENT_ERROR", f"Failed to advance tournament {tid}", str(e))
+
+def save_tournament_round(t, results):
+    """Queue a finished round (or a new tournament, with no results) as one database operation"""
+    ts = datetime.datetime.utcnow().isoformat()
+    history = []
+    scores = []
+    replays = []
+    for r in results:
+        x, o = r.pairing.x, r.pairing.o
+        for username, opponent in ((x, o), (o, x)):
+            result = 'draw' if r.winner is None else ('win' if r.winner == username else 'loss')
+            history.append((username, opponent, 'tournament', result, t.size, ts))
+        if r.winner is not None:
+            scores.append((r.winner, 10, 1))
+        if r.data is not None:
+            replays.append(r.data)
+    standings = [(t.id, s['username'], s['rank'], s['wins'], s['losses'], s['draws'], s['points'])
+                 for s in t.standings()]
+    try:
+        # in-memory first, as in update_leaderboard
+        for username, points, wins in scores:
+            leaderboard.record_win(username, points, wins)
+        db.add_tournament_round(tournament_row(t, ts, saved=True), standings, history, scores, replays)
+    except Exception as e:
+        log_error("TOURNAMENT_SAVE_ERROR", f"Failed to save round {t.completed} of tournament {t.id}", str(e))
+
+@app.route('/tournaments', methods=['POST'])
+def create_tournament():
+    """Start a tournament: JSON {players, format, board_size, name}; players are seeded by rating"""
+    data = request.get_json(silent=True) or {}
+    players = data.get('players')
+    fmt = data.get('format', BRACKET)
+    name = data.get('name')
+    try:
+        size = int(data.get('board_size', 3))
+    except (TypeError, ValueError):
+        size = None
+    if (not isinstance(players, list) or not 2 <= len(players) <= TOURNAMENT_MAX_PLAYERS
+            or not all(isinstance(p, str) and 0 < len(p) <= 64 for p in players)
+            or len(set(players)) != len(players)):
+        return jsonify({'error': f'players must be 2 to {TOURNAMENT_MAX_PLAYERS} distinct usernames'}), 400
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    if size not in TOURNAMENT_BOARD_SIZES:
+        return jsonify({'error': 'board_size must be 3, 4 or 5'}), 400
+    if name is not None and not (isinstance(name, str) and len(name) <= 100):
+        return jsonify({'error': 'name must be at most 100 characters'}), 400
+
+    ratings = get_ratings(players, size)
+    # best rating first; ties keep the order they were listed in
+    seeded = sorted(players, key=lambda username: -ratings[username])
+    tid = secrets.token_urlsafe(6)
+    t = Tournament(tid, seeded, size, fmt, name, created=datetime.datetime.utcnow().isoformat())
+    tournaments[tid] = t
+    try:
+        pairings = t.next_round()
+        save_tournament_round(t, [])
+        open_tournament_round(t, pairings)
+    except Exception as e:
+        tournaments.pop(tid, None)
+        log_error("TOURNAMENT_ERROR", f"Failed to start tournament {tid}", str(e))
+        return jsonify({'error': 'Could not start the tournament'}), 500
+    return jsonify(tournament_state(t)), 201
+
+@app.route('/tournaments/<tid>')
+def tournament_endpoint(tid):
+    """A tournament with its standings: live from memory, or as last saved once it is over"""
+    t = tournaments.get(tid)
+    if t is not None:
+        return jsonify(dict(tournament_state(t), standings=t.standings())), 200
+    try:
+        row = db.query_one(f"SELECT {', '.join(TOURNAMENT_FIELDS)} FROM tournaments WHERE id = ?", (tid,))
+        standings = db.query("SELECT rank, username, wins, losses, draws, points FROM tournament_standings "
+                             "WHERE tournament_id = ? ORDER BY rank", (tid,)) if row else []
+    except Exception as e:
+        log_error("TOURNAMENT_LOAD_ERROR", f"Failed to load tournament {tid}", str(e))
+        return jsonify({'error': 'Tournaments unavailable'}), 500
+    if row is None:
+        return jsonify({'error': 'Tournament not found'}), 404
+    state = dict(zip(TOURNAMENT_FIELDS, row))
+    state['finished'] = state['champion'] is not None
+    state['standings'] = [dict(zip(('rank', 'username', 'wins', 'losses', 'draws', 'points'), s))
+                          for s in standings]
+    return jsonify(state), 200
+
+@events.on('follow_tournament', {'tournament': Str(1, 64), 'username': NAME_FIELD}, rate=1, burst=3)
+def handle_follow_tournament(sid, data):
+    """Receive a tournament's tournament_update broadcasts (each round's rooms).
+
+    The reply lists only username's own match: with hundreds of players
+    following, the full list goes out once per round as one broadcast,
+    not once per follower (it is also at GET /tournaments/<id>).
+    """
+    t = tournaments.get(data['tournament'])
+    if t is None:
+        emit('tournament_error', {'message': 'Tournament not found or already over.'}, room=sid)
+        return
+    join_room(tournament_room(t.id))
+    emit('tournament_update', tournament_state(t, data['username']), room=sid)
+
 # ---- Run ----
 if __name__ == '__main__':
     print("Starting Flask + SocketIO server")
@@ -610,11 +1623,17 @@ if __name__ == '__main__':
         
     print(f"Starting Flask + SocketIO server on port {port}")
     print(f"Debug mode: {debug_mode}")
-    
-    socketio.run(
-        app, 
-        host='0.0.0.0', 
-        port=port, 
-        debug=debug_mode,
-        allow_unsafe_werkzeug=True
-    )
\ No newline at end of file
+    print(f"Async mode: {async_mode}")
+
+    if async_mode != 'threading':
+        # eventlet/gevent WSGI server on a TCP_NODELAY listener (see concurrency.serve)
+        concurrency.serve(app, '0.0.0.0', port, log_output=debug_mode)
+    else:
+        socketio.run(
+            app, 
+            host='0.0.0.0', 
+            port=port, 
+            debug=debug_mode,
+            allow_unsafe_werkzeug=True,
+            request_handler=concurrency.nodelay_request_handler()
+        )
\ No newline at end of file
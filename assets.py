@@ -0,0 +1,208 @@
+"""Static files and rendered pages held in memory, precompressed, with cache headers.
+
+Assets(folder) reads every file under the static folder once at startup.
+Each gets a content hash, and url(path) names it with that hash in the
+file name (css/style.css -> css/style.1a2b3c4d5e.css), so a page always
+points at the exact bytes it was rendered with. Those URLs never change
+meaning, so they are served with a year's immutable Cache-Control and
+browsers stop revalidating them on every visit. A URL with an old hash
+(a page cached from before a deploy) still gets the current file, but
+marked no-cache. Text files also keep gzip and, if the brotli package is
+installed, brotli variants, compressed at the highest level once instead
+of per request; the variant is chosen from Accept-Encoding.
+
+PageCache keeps rendered pages the same way, keyed by whatever the page
+was rendered from, so the login form (the same for everyone) and a
+player reloading their game are a dict lookup instead of a template
+render and a compression.
+
+Nothing here touches Flask: serve() returns the (body, status, headers)
+tuple a view can return as it is.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+HASH_LEN = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# smaller than this, compression saves less than the Content-Encoding header costs
+MIN_COMPRESS = 256
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+class Asset:
+    __slots__ = ('content_type', 'digest', 'variants', 'mtime')
+
+    def __init__(self, data, content_type, mtime=None, fast=False):
+        """fast: cheaper compression levels, for bodies made at request time"""
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+        self.mtime = mtime
+        # (encoding, body), smallest first; identity (None) is always there
+        variants = [(None, data)]
+        if len(data) >= MIN_COMPRESS and content_type.startswith(COMPRESSIBLE):
+            variants.append(('gzip', gzip.compress(data, 6 if fast else 9, mtime=0)))
+            if brotli is not None:
+                variants.append(('br', brotli.compress(data, quality=5 if fast else 11)))
+        self.variants = sorted((v for v in variants if v[0] is None or len(v[1]) < len(data)),
+                               key=lambda v: len(v[1]))
+
+    def etag(self, encoding):
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def pick(self, accept_encoding):
+        """(encoding, body): the smallest variant the client accepts"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, body in self.variants:
+            # identity is always acceptable, so this returns
+            if encoding is None or encoding in accepted:
+                return encoding, body
+
+def parse_accept_encoding(header):
+    """Encodings an Accept-Encoding header allows (q=0 excluded)"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+def serve(asset, accept_encoding, if_none_match, cache_control, vary=('Accept-Encoding',)):
+    """Body, status and headers for asset; a 304 if if_none_match already names the variant"""
+    encoding, body = asset.pick(accept_encoding)
+    etag = asset.etag(encoding)
+    headers = {'Cache-Control': cache_control, 'ETag': etag, 'Vary': ', '.join(vary)}
+    if if_none_match and (if_none_match.strip() == '*' or etag in (t.strip() for t in if_none_match.split(','))):
+        return b'', 304, headers
+    headers['Content-Type'] = asset.content_type
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return body, 200, headers
+
+def content_type(path):
+    kind = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if kind.startswith('text/') or kind in ('application/javascript', 'application/json', 'image/svg+xml'):
+        kind += '; charset=utf-8'
+    return kind
+
+def hashed_name(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{digest}{ext}'
+
+def logical_name(name):
+    """css/style.1a2b3c4d5e.css -> css/style.css (None if name carries no hash)"""
+    stem, ext = os.path.splitext(name)
+    base, dot, digest = stem.rpartition('.')
+    if not dot or len(digest) != HASH_LEN:
+        return None
+    return base + ext
+
+class Assets:
+    def __init__(self, folder, url_prefix='/assets', reload=False):
+        """reload: re-read a file whose mtime changed when its URL is next asked for (for development)"""
+        self.folder = folder
+        self.url_prefix = url_prefix.rstrip('/')
+        self.reload = reload
+        self._lock = threading.Lock()
+        self._files = {}  # path relative to folder, with '/' separators -> Asset
+        for root, _, names in os.walk(folder):
+            for name in names:
+                path = os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+                self._load(path)
+
+    def _load(self, path):
+        full = os.path.join(self.folder, path)
+        with open(full, 'rb') as f:
+            data = f.read()
+        asset = Asset(data, content_type(path), os.stat(full).st_mtime)
+        with self._lock:
+            self._files[path] = asset
+        return asset
+
+    def get(self, path):
+        asset = self._files.get(path)
+        if asset is not None and self.reload:
+            try:
+                if os.stat(os.path.join(self.folder, path)).st_mtime != asset.mtime:
+                    asset = self._load(path)
+            except OSError:
+                pass
+        return asset
+
+    def url(self, path):
+        """Content-hashed URL of a file under the static folder"""
+        asset = self.get(path)
+        if asset is None:
+            raise KeyError(f"no static file {path!r}")
+        return f'{self.url_prefix}/{hashed_name(path, asset.digest)}'
+
+    def lookup(self, name):
+        """(asset, cache_control) for a requested hashed name, or (None, None)"""
+        path = logical_name(name)
+        asset = self.get(path) if path else None
+        if asset is None:
+            return None, None
+        if hashed_name(path, asset.digest) != name:
+            # a page from before the file changed: the current file, but not for keeps
+            return asset, REVALIDATE
+        return asset, IMMUTABLE
+
+    def stats(self):
+        with self._lock:
+            files = list(self._files.values())
+        sizes = {}
+        for asset in files:
+            for encoding, body in asset.variants:
+                key = encoding or 'identity'
+                sizes[key] = sizes.get(key, 0) + len(body)
+        return {'files': len(files), 'bytes': sizes, 'brotli': brotli is not None}
+
+class PageCache:
+    """Rendered pages as Assets, LRU bounded, keyed by what they were rendered from"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render, content_type='text/html; charset=utf-8'):
+        """The cached page for key, or render() (a str) turned into one"""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+        page = Asset(render().encode(), content_type, fast=True)
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'pages': len(self._pages), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,97 @@
+"""Vectorised evaluation of many positions at once (needs numpy).
+
+Positions are stacked into an (N, n, n) int8 array of cell codes (0
+empty, 1 X, 2 O), one board size per batch. For every win_len window
+along the four line directions the stones of each colour are counted
+with sliding-window sums over the whole batch (win_len shifted slices
+added per direction), and everything else is read off the resulting
+(N, windows) count arrays:
+
+- x_win / o_win: some window is full of that colour (what check_winner
+  answers, for every position and both symbols in one call)
+- draw: board full and nobody has a line
+- open_x / open_o: (N, win_len + 1) counts of windows holding no enemy
+  stone, by how many of the colour's own stones they hold; column
+  win_len - 1 is the number of lines one move from completion (threats)
+- score: the AI's static evaluation from X's point of view (open windows
+  weighted 10 ** (stones - 1), a completed line WIN_SCORE)
+
+Nothing here is used while serving games; it is for AI experiments and
+analytics over stored positions (replays, self-play).
+"""
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("batch_eval needs numpy (pip install numpy)")
+
+from ai_engine import WIN_SCORE
+from game_logic import get_win_len
+
+EMPTY, X, O = 0, 1, 2
+CODES = {None: EMPTY, 'X': X, 'O': O}
+# cell code -> its weight in the packed plane evaluate() sums windows over
+PLANE_VALUES = np.array([0, 1, 8], dtype=np.int8)
+
+Evaluation = namedtuple('Evaluation', 'x_win o_win draw open_x open_o score')
+
+def from_rows(boards):
+    """Lists of rows ('X'/'O'/None cells, all one size) -> (N, n, n) int8 codes"""
+    return np.array([[[CODES[cell] for cell in row] for row in rows] for rows in boards], dtype=np.int8)
+
+def _unpack(values, count, size, stride):
+    nbytes = (size * stride + 7) // 8
+    raw = np.frombuffer(b''.join(v.to_bytes(nbytes, 'little') for v in values), dtype=np.uint8)
+    bits = np.unpackbits(raw.reshape(count, nbytes), axis=1, bitorder='little')[:, :size * stride]
+    # drop each row's spare column
+    return bits.reshape(count, size, stride)[:, :, :size]
+
+def from_boards(boards):
+    """Board objects (all one size) -> (N, n, n) int8 codes, unpacked straight from the bitboards"""
+    size, stride, count = boards[0].size, boards[0].stride, len(boards)
+    x = _unpack((b.x_bits for b in boards), count, size, stride)
+    o = _unpack((b.o_bits for b in boards), count, size, stride)
+    return (x * X + o * O).astype(np.int8)
+
+def window_sums(plane, win_len):
+    """Sum of every win_len window of an (N, n, n) plane, as (N, windows).
+
+    Each direction is win_len shifted slices of the plane added together,
+    so the cost is win_len array additions whatever the batch size.
+    Windows come in a fixed order: rows, columns, diagonals, anti-diagonals.
+    """
+    count, n = plane.shape[0], plane.shape[1]
+    span = n - win_len + 1
+    rows = sum(plane[:, :, i:span + i] for i in range(win_len))
+    cols = sum(plane[:, i:span + i, :] for i in range(win_len))
+    diagonals = sum(plane[:, i:span + i, i:span + i] for i in range(win_len))
+    anti = sum(plane[:, i:span + i, win_len - 1 - i:n - i] for i in range(win_len))
+    return np.concatenate([a.reshape(count, -1) for a in (rows, cols, diagonals, anti)], axis=1)
+
+def evaluate(codes, win_len=None):
+    """Evaluate an (N, n, n) batch of cell codes; returns an Evaluation of per-position arrays"""
+    size = codes.shape[1]
+    if win_len is None:
+        win_len = get_win_len(size)
+    win_len = min(win_len, size)
+    # both colours in one pass: an X counts 1 and an O counts 8 (win_len < 8), so a
+    # window's sum is x + 8 * o, at most 8 * win_len, which fits an int8
+    plane = np.take(PLANE_VALUES, codes)
+    sums = window_sums(plane, win_len)
+
+    # a window free of O stones sums to its X count k (< 8), one free of X to 8 * k
+    count = len(codes)
+    open_x = np.empty((count, win_len + 1), dtype=np.int64)
+    open_o = np.empty((count, win_len + 1), dtype=np.int64)
+    for k in range(win_len + 1):
+        open_x[:, k] = np.count_nonzero(sums == k, axis=1)
+        open_o[:, k] = open_x[:, 0] if k == 0 else np.count_nonzero(sums == 8 * k, axis=1)
+    x_win = open_x[:, win_len] > 0
+    o_win = open_o[:, win_len] > 0
+    full = (codes != EMPTY).all(axis=(1, 2))
+    draw = full & ~x_win & ~o_win
+    weights = np.array([0] + [10 ** (k - 1) for k in range(1, win_len)] + [WIN_SCORE], dtype=np.int64)
+    # open windows are what open_* counted, so the score is a dot product with the weights
+    score = open_x @ weights - open_o @ weights
+    return Evaluation(x_win, o_win, draw, open_x, open_o, score)
@@ -0,0 +1,59 @@
+"""AI think time under concurrent load.
+
+Runs many searches at once from a thread pool (as threading-mode Socket.IO
+handlers would) and reports how far wall-clock think time overshoots the
+per-move budget, plus the depth reached.
+
+Run from the repo root:  python benchmarks/bench_ai.py [threads] [budget]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine import search_move
+from board import Board
+
+SIZES = (3, 4, 5, 10, 15)
+SEARCHES_PER_SIZE = 32
+
+def random_position(size, rng):
+    board = Board(size)
+    turn = 'X'
+    for _ in range(rng.randint(1, max(1, size * size // 4))):
+        r, c = rng.randrange(size), rng.randrange(size)
+        if board.is_empty(r, c):
+            board.place(r, c, turn)
+            if board.winning_line(r, c):
+                board.remove(r, c)
+                continue
+            turn = 'O' if turn == 'X' else 'X'
+    return board, turn
+
+def timed_search(args):
+    board, turn, budget = args
+    t0 = time.monotonic()
+    result = search_move(board, turn, budget)
+    return time.monotonic() - t0, result.depth, result.nodes
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    rng = random.Random(5)
+    print(f"{threads} concurrent searches, budget {budget * 1000:.0f} ms")
+    print(f"{'size':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'avg depth':>10} {'avg nodes':>10}")
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for size in SIZES:
+            jobs = [random_position(size, rng) + (budget,) for _ in range(SEARCHES_PER_SIZE)]
+            results = list(pool.map(timed_search, jobs))
+            times = sorted(t * 1000 for t, _, _ in results)
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+            print(f"{size:>4}x{size:<2} {statistics.median(times):>8.1f} {p99:>8.1f} {times[-1]:>8.1f} "
+                  f"{statistics.mean(d for _, d, _ in results):>10.1f} {statistics.mean(n for _, _, n in results):>10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Plain-move latency while AI games are thinking: in-thread search vs TaskPool.
+
+A stream of cheap "plain move" operations (place, win check, serialize) is
+timed on the main thread while AI_GAMES searches run either on threads in
+the same process, as they did before, or in the worker process pool.
+
+Run from the repo root:  python benchmarks/bench_ai_pool.py [ai_games] [seconds]
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine import search_move, search_worker
+from board import Board
+from task_pool import TaskPool
+
+BUDGET = 0.5
+BOARD_SIZE = 15
+
+def plain_move(board, rng):
+    r, c = rng.randrange(board.size), rng.randrange(board.size)
+    if board.is_empty(r, c):
+        board.place(r, c, 'X')
+        board.winning_line(r, c)
+        board.remove(r, c)
+    json.dumps({'board': board.to_rows(), 'turn': 'O'})
+
+def measure(seconds, rng):
+    """Latency (ms) of plain moves scheduled every 2 ms for the given duration.
+
+    Latency runs from the scheduled start, so time spent waiting for the
+    GIL after the sleep counts, as it would for a queued Socket.IO event.
+    """
+    board = Board(BOARD_SIZE)
+    samples = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        scheduled = time.perf_counter() + 0.002
+        time.sleep(0.002)
+        plain_move(board, rng)
+        samples.append((time.perf_counter() - scheduled) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)], samples[-1]
+
+def ai_position():
+    board = Board(BOARD_SIZE)
+    for r, c, s in ((7, 7, 'X'), (7, 8, 'O'), (8, 8, 'X'), (6, 6, 'O')):
+        board.place(r, c, s)
+    return board
+
+def run_threads(ai_games, stop):
+    def loop():
+        while not stop.is_set():
+            search_move(ai_position(), 'X', BUDGET)
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(ai_games)]
+    for t in threads:
+        t.start()
+    return threads
+
+def run_pool(pool, ai_games, stop):
+    def resubmit(key):
+        if stop.is_set():
+            return
+        board = ai_position()
+        deadline = time.time() + BUDGET
+        pool.submit(key, search_worker, (board.size, board.x_bits, board.o_bits, 'X', deadline),
+                    deadline, on_result=lambda _: resubmit(key), on_error=lambda _: resubmit(key))
+    for key in range(ai_games):
+        resubmit(key)
+
+def main():
+    ai_games = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    rng = random.Random(3)
+    print(f"{ai_games} AI games thinking, {BOARD_SIZE}x{BOARD_SIZE}, budget {BUDGET * 1000:.0f} ms")
+    print(f"{'mode':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    p50, p99, worst = measure(seconds, rng)
+    print(f"{'idle':>10} {p50:>8.3f} {p99:>8.3f} {worst:>8.3f}")
+
+    stop = threading.Event()
+    threads = run_threads(ai_games, stop)
+    p50, p99, worst = measure(seconds, rng)
+    stop.set()
+    for t in threads:
+        t.join()
+    print(f"{'threads':>10} {p50:>8.3f} {p99:>8.3f} {worst:>8.3f}")
+
+    pool = TaskPool(max_pending=ai_games)
+    # warm the workers up so process start-up is not measured
+    warm = ai_position()
+    pool._get_executor().submit(search_worker, warm.size, warm.x_bits, warm.o_bits, 'X', time.time()).result()
+    stop = threading.Event()
+    run_pool(pool, ai_games, stop)
+    p50, p99, worst = measure(seconds, rng)
+    stop.set()
+    print(f"{'pool':>10} {p50:>8.3f} {p99:>8.3f} {worst:>8.3f}")
+    print(pool.stats())
+    pool.shutdown(wait=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Page loads of /game: bytes on the wire and requests per second.
+
+A browser loading the game page fetches the page, style.css and game.js
+(the Socket.IO client comes from its CDN and is left out). This compares
+the way the app served them before assets.py with the way it does now:
+
+- before: game.html rendered per request, uncompressed; the files from
+  Flask's /static/, uncompressed and revalidated on every visit (a 304
+  each when unchanged, but still a request)
+- now: the page from the page cache, gzip (or brotli) when accepted, a
+  304 on a reload with its ETag; the files from /assets/ under hashed
+  names, precompressed and cached as immutable, so a repeat visit does
+  not ask for them at all
+
+Bytes are response bodies, headers not included. Requests per second
+are one thread calling the WSGI app in process (Flask's test client, no
+network), so they measure the server's own cost per request.
+
+Run from the repo root:  python benchmarks/bench_assets.py [seconds per case]
+"""
+import contextlib
+import gzip
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+# database.db and logs/ go to a scratch directory
+os.chdir(tempfile.mkdtemp())
+
+from flask import render_template, session
+
+import app as xo
+
+BROWSER = {'Accept-Encoding': 'gzip, deflate, br'}
+PLAYER = {'username': 'alice', 'board_size': '5', 'mode': 'solo'}
+
+@xo.app.route('/_bench/game-before')
+def game_before():
+    """game_page as it was: a template render per request (files linked from /static/)"""
+    html = render_template('game.html', username=session.get('username'), board_size=session.get('board_size', 3),
+                           mode=session.get('mode', 'solo'), room_code=session.get('room_code'))
+    return re.sub(r'/assets/[^"]+', lambda m: static_url(m.group(0)), html)
+
+def static_url(url):
+    # the /static/ name of a hashed /assets/ URL
+    return '/static/' + xo.assets.logical_name(url[len('/assets/'):])
+
+def page_links(response):
+    html = response.get_data()
+    if response.headers.get('Content-Encoding') == 'gzip':
+        html = gzip.decompress(html)
+    return re.findall(r'(?:href|src)="(/(?:assets|static)/[^"]+)"', html.decode())
+
+def visit(client, page_url, etags, cache_assets):
+    """One page load; returns (requests, body bytes). etags: what the browser has cached"""
+    requests = 0
+    total = 0
+    headers = dict(BROWSER)
+    if page_url in etags:
+        headers['If-None-Match'] = etags[page_url]
+    response = client.get(page_url, headers=headers)
+    requests += 1
+    total += len(response.data)
+    if response.status_code == 200:
+        etags[page_url] = response.headers.get('ETag')
+        etags[page_url, 'links'] = page_links(response)
+    for url in etags[page_url, 'links']:
+        if cache_assets and url in etags:
+            # immutable: the browser does not ask again
+            continue
+        headers = dict(BROWSER)
+        if url in etags:
+            headers['If-None-Match'] = etags[url]
+        response = client.get(url, headers=headers)
+        requests += 1
+        total += len(response.data)
+        if response.headers.get('ETag'):
+            etags[url] = response.headers['ETag']
+        response.close()
+    return requests, total
+
+def rate(fn, seconds):
+    count = 0
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            fn()
+        count += 50
+    return count / (time.perf_counter() - t0)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    client = xo.app.test_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post('/game', data=PLAYER)
+
+    print(f"{'page load':>28} {'requests':>9} {'bytes':>8}")
+    for name, page_url, cache_assets in (('before', '/_bench/game-before', False), ('now', '/game', True)):
+        etags = {}
+        first = visit(client, page_url, etags, cache_assets)
+        repeat = visit(client, page_url, etags, cache_assets)
+        print(f"{name + ', first visit':>28} {first[0]:>9} {first[1]:>8,}")
+        print(f"{name + ', repeat visit':>28} {repeat[0]:>9} {repeat[1]:>8,}")
+
+    page = client.get('/game', headers=BROWSER)
+    js = next(url for url in page_links(page) if url.endswith('.js'))
+    js_etag = client.get(js, headers=BROWSER).headers['ETag']
+    old_js_etag = client.get(static_url(js)).headers['ETag']
+
+    def get(url, headers=BROWSER):
+        return lambda: client.get(url, headers=headers).close()
+
+    cases = (
+        ('GET /game, before (render)', get('/_bench/game-before')),
+        ('GET /game, now (cached, gzip)', get('/game')),
+        ('GET /game, now (304)', get('/game', dict(BROWSER, **{'If-None-Match': page.headers['ETag']}))),
+        ('game.js, before (/static/)', get(static_url(js))),
+        ('game.js, before (304)', get(static_url(js), dict(BROWSER, **{'If-None-Match': old_js_etag}))),
+        ('game.js, now (/assets/ gzip)', get(js)),
+        ('game.js, now (304)', get(js, dict(BROWSER, **{'If-None-Match': js_etag}))),
+    )
+    print()
+    print(f"{'request':>32} {'req/s':>8}")
+    for name, fn in cases:
+        print(f"{name:>32} {rate(fn, seconds):>8,.0f}")
+    print(f"(brotli {'on' if xo.assets.brotli else 'not installed, gzip only'}; "
+          f"page cache {xo.page_cache.stats()})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Batch evaluator: agreement with the scalar rules, then positions per second.
+
+Agreement runs first on a randomized corpus (every size from 3 to 10,
+random fill densities, random X/O placement) and stops with an error on
+the first mismatch:
+
+- x_win / o_win against game_logic.check_winner for each symbol
+- draw against is_board_full with no winner
+- score against the AI's own static evaluation for positions nobody
+  has won yet
+- from_boards (bitboard unpack) against from_rows
+
+Throughput then compares, per board size, one batch_eval.evaluate call
+over a whole batch with the per-position loops it replaces: check_winner
+for both symbols on list-of-rows boards, and Board.has_win on bitboards.
+
+Run from the repo root:  python benchmarks/bench_batch_eval.py [batch size]
+"""
+import os
+import random
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import batch_eval
+from ai_engine import _Search
+from board import Board
+from game_logic import check_winner, get_win_len, is_board_full
+
+CORPUS_PER_SIZE = 3000
+
+def random_rows(size, rng):
+    density = rng.random()
+    return [[rng.choice('XO') if rng.random() < density else None for _ in range(size)] for _ in range(size)]
+
+def check_agreement(rng):
+    checked = 0
+    for size in range(3, 11):
+        win_len = get_win_len(size)
+        corpus = [random_rows(size, rng) for _ in range(CORPUS_PER_SIZE)]
+        boards = [Board.from_rows(rows) for rows in corpus]
+        codes = batch_eval.from_rows(corpus)
+        assert (batch_eval.from_boards(boards) == codes).all(), f"from_boards differs at size {size}"
+        result = batch_eval.evaluate(codes)
+        for i, rows in enumerate(corpus):
+            x_win = check_winner(rows, 'X', win_len)
+            o_win = check_winner(rows, 'O', win_len)
+            assert result.x_win[i] == x_win and result.o_win[i] == o_win, (size, rows)
+            assert result.draw[i] == (is_board_full(rows) and not x_win and not o_win), (size, rows)
+            if not x_win and not o_win:
+                expected = _Search(boards[i], win_len, None, None).evaluate(0)
+                assert result.score[i] == expected, (size, rows, result.score[i], expected)
+            checked += 1
+    return checked
+
+def rate(fn, count):
+    t0 = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - t0)
+
+def main():
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(11)
+    print(f"agreement: {check_agreement(rng)} random positions match check_winner, draws and AI scores")
+    print()
+    print(f"== positions per second (batch of {batch})")
+    print(f"{'size':>5} {'batch_eval':>12} {'  (+ from_rows)':>15} {'check_winner':>13} {'Board.has_win':>14}")
+    for size in (3, 7, 10, 15):
+        win_len = get_win_len(size)
+        corpus = [random_rows(size, rng) for _ in range(batch)]
+        boards = [Board.from_rows(rows) for rows in corpus]
+        codes = batch_eval.from_rows(corpus)
+        vector = rate(lambda: batch_eval.evaluate(codes), batch)
+        with_convert = rate(lambda: batch_eval.evaluate(batch_eval.from_rows(corpus)), batch)
+        scalar = rate(lambda: [(check_winner(rows, 'X', win_len), check_winner(rows, 'O', win_len))
+                               for rows in corpus], batch)
+        bits = rate(lambda: [(b.has_win('X', win_len), b.has_win('O', win_len)) for b in boards], batch)
+        print(f"{size:>5} {vector:>12,.0f} {with_convert:>15,.0f} {scalar:>13,.0f} {bits:>14,.0f}")
+    print("(batch_eval also returns open-line counts and scores; the others only win flags)")
+
+if __name__ == '__main__':
+    main()
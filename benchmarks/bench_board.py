@@ -0,0 +1,118 @@
+"""Memory per room and per-move CPU: list-of-lists boards vs the Board bitboard.
+
+Run from the repo root:  python benchmarks/bench_board.py
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import Board
+from game_logic import new_empty_board, get_win_len, is_board_full, check_winner, find_winning_line
+
+SIZES = (3, 5, 10, 15, 30)
+ROOMS = 2000
+GAMES_PER_SIZE = 30
+
+def memory_per_room(make_board, size):
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    rooms = [make_board(size) for _ in range(ROOMS)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rooms
+    return (end - start) / ROOMS
+
+def half_filled_list(size, rng):
+    board = new_empty_board(size)
+    for i, (r, c) in enumerate(rng.sample([(r, c) for r in range(size) for c in range(size)], size * size // 2)):
+        board[r][c] = 'X' if i % 2 == 0 else 'O'
+    return board
+
+def random_game_moves(size, rng):
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    return cells
+
+def move_cpu(size, seed=99):
+    """Average us per move for place + win/draw check + reset.
+
+    Three paths: the original full-scan check_winner on lists, the
+    move-local find_winning_line on lists, and the Board bitboard.
+    """
+    rng = random.Random(seed)
+    win_len = get_win_len(size)
+    scan_time = list_time = board_time = 0.0
+    moves = 0
+    board = Board(size)
+    for _ in range(GAMES_PER_SIZE):
+        cells = random_game_moves(size, rng)
+
+        t = time.perf_counter()
+        rows = new_empty_board(size)
+        turn = 'X'
+        for x, y in cells:
+            rows[x][y] = turn
+            if check_winner(rows, turn, win_len) or is_board_full(rows):
+                break
+            turn = 'O' if turn == 'X' else 'X'
+
+        t0 = time.perf_counter()
+        rows = new_empty_board(size)
+        empty = size * size
+        turn = 'X'
+        for x, y in cells:
+            rows[x][y] = turn
+            empty -= 1
+            if find_winning_line(rows, x, y, win_len) or empty == 0:
+                break
+            turn = 'O' if turn == 'X' else 'X'
+        t1 = time.perf_counter()
+
+        board.reset()
+        turn = 'X'
+        played = 0
+        for x, y in cells:
+            board.place(x, y, turn)
+            played += 1
+            if board.winning_line(x, y, win_len) or board.is_full():
+                break
+            turn = 'O' if turn == 'X' else 'X'
+        t2 = time.perf_counter()
+
+        scan_time += t0 - t
+        list_time += t1 - t0
+        board_time += t2 - t1
+        moves += played
+    return scan_time / moves * 1e6, list_time / moves * 1e6, board_time / moves * 1e6
+
+def serialize_cost(size, rng, rounds=500):
+    rows = half_filled_list(size, rng)
+    board = Board.from_rows(rows)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        json.dumps(rows)
+    t1 = time.perf_counter()
+    for _ in range(rounds):
+        json.dumps(board.to_rows())
+    t2 = time.perf_counter()
+    return (t1 - t0) / rounds * 1e6, (t2 - t1) / rounds * 1e6
+
+def main():
+    rng = random.Random(7)
+    print(f"{'size':>6} {'list B/room':>12} {'Board B/room':>13} {'scan us/move':>13} {'list us/move':>13} "
+          f"{'Board us/move':>14} {'json list us':>13} {'json Board us':>14}")
+    for size in SIZES:
+        list_mem = memory_per_room(lambda n: half_filled_list(n, rng), size)
+        board_mem = memory_per_room(lambda n: Board.from_rows(half_filled_list(n, rng)), size)
+        scan_us, list_us, board_us = move_cpu(size)
+        json_list, json_board = serialize_cost(size, rng)
+        print(f"{size:>4}x{size:<2} {list_mem:>12.0f} {board_mem:>13.0f} {scan_us:>13.2f} {list_us:>13.2f} "
+              f"{board_us:>14.2f} {json_list:>13.1f} {json_board:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Cost of the event dispatch layer per event: validation, rate limiting, rejection.
+
+Compares the compiled schema validators with an interpreter that walks
+the same schema for every payload, on valid and malformed payloads,
+then times the whole dispatch path (rate limit + validation + handler
+call) for accepted, malformed and rate-limited events. The handler is a
+no-op, so the numbers are the overhead a client event pays before any
+game state is touched.
+
+Run from the repo root:  python benchmarks/bench_events.py [events]
+"""
+import os
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from events import Choice, EventDispatcher, Int, Str, compile_schema
+
+SCHEMAS = {
+    'use_power_up': {'room': Str(1, 64), 'username': Str(1, 64), 'power_up': Choice('block', 'clear')},
+    'chat_message': {'room': Str(1, 64), 'username': Str(1, 64), 'message': Str(1, 500)},
+    'move_like': {'room': Str(1, 64), 'username': Str(1, 64), 'x': Int(0, 99), 'y': Int(0, 99)},
+}
+
+PAYLOADS = {
+    'use_power_up': ({'room': 'ABC234', 'username': 'alice', 'power_up': 'block'},
+                     {'room': 'ABC234', 'username': 'alice', 'power_up': 'nuke'}),
+    'chat_message': ({'room': 'ABC234', 'username': 'alice', 'message': 'good game!'},
+                     {'room': 'ABC234', 'username': 'alice', 'message': 'x' * 5000}),
+    'move_like': ({'room': 'ABC234', 'username': 'alice', 'x': 3, 'y': 4},
+                  {'room': 'ABC234', 'username': 'alice', 'x': '3', 'y': 4}),
+}
+
+def interpret(schema, data):
+    """The same checks, decided by walking the schema on every call"""
+    if not isinstance(data, dict):
+        return 'payload must be an object'
+    for name, spec in schema.items():
+        value = data.get(name)
+        if isinstance(spec, Str):
+            if type(value) is not str:
+                return f'{name} must be a string'
+            if not spec.min_length <= len(value) <= spec.max_length:
+                return f'{name} must be {spec.min_length}-{spec.max_length} characters'
+        elif isinstance(spec, Int):
+            if type(value) is not int:
+                return f'{name} must be an integer'
+            if not spec.low <= value <= spec.high:
+                return f'{name} must be between {spec.low} and {spec.high}'
+        elif isinstance(spec, Choice):
+            if value not in spec.values:
+                allowed = ', '.join(sorted(map(str, spec.values)))
+                return f'{name} must be one of {allowed}'
+    return None
+
+def per_call_ns(fn, arg, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    return (time.perf_counter() - t0) / n * 1e9
+
+class FakeSocketIO:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event):
+        def register(fn):
+            self.handlers[event] = fn
+            return fn
+        return register
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print(f"== validation, ns per payload ({n} calls each)")
+    print(f"{'event':>14} {'payload':>8} {'compiled':>9} {'walk':>9}")
+    for event, schema in SCHEMAS.items():
+        compiled = compile_schema(event, schema)
+        for label, payload in zip(('valid', 'invalid'), PAYLOADS[event]):
+            assert compiled(payload) == interpret(schema, payload)
+            fast = per_call_ns(compiled, payload, n)
+            slow = per_call_ns(lambda data: interpret(schema, data), payload, n)
+            print(f"{event:>14} {label:>8} {fast:>9.0f} {slow:>9.0f}")
+
+    print()
+    print("== full dispatch, ns per event (rate limit + validation + no-op handler)")
+    sio = FakeSocketIO()
+    current = ['sid-0']
+    rejected = []
+    dispatcher = EventDispatcher(sio, lambda: current[0], on_reject=lambda *args: rejected.append(args))
+    dispatcher.on('chat_message', SCHEMAS['chat_message'], rate=1e12, burst=1e12)(lambda sid, data: None)
+    dispatcher.on('use_power_up', SCHEMAS['use_power_up'], rate=1, burst=5)(lambda sid, data: None)
+    chat = sio.handlers['chat_message']
+    power = sio.handlers['use_power_up']
+    valid, invalid = PAYLOADS['chat_message']
+
+    accepted_ns = per_call_ns(chat, valid, n)
+    malformed_ns = per_call_ns(chat, invalid, n)
+    # one socket flooding: after the burst everything is dropped by the limiter
+    limited_ns = per_call_ns(power, PAYLOADS['use_power_up'][0], n)
+    # many sockets, one event each: the limiter's first-seen path
+    sids = [f'sid-{i}' for i in range(n)]
+
+    def fresh(sid):
+        current[0] = sid
+        chat(valid)
+
+    t0 = time.perf_counter()
+    for sid in sids:
+        fresh(sid)
+    fresh_ns = (time.perf_counter() - t0) / n * 1e9
+    print(f"{'accepted':>22} {accepted_ns:>8.0f}")
+    print(f"{'malformed (rejected)':>22} {malformed_ns:>8.0f}")
+    print(f"{'flooding (rate limited)':>22} {limited_ns:>8.0f}")
+    print(f"{'first event of a sid':>22} {fresh_ns:>8.0f}")
+    print(dispatcher.stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Top-N and rank queries: SQL on every request vs the in-memory Leaderboard.
+
+The SQL path is what a naive endpoint would do: ORDER BY ... LIMIT for the
+top page and a COUNT of better rows for a user's rank. Wins are mixed in
+so the cached top page is invalidated at a realistic rate.
+
+Run from the repo root:  python benchmarks/bench_leaderboard.py [players]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard
+from persistence import Database
+
+TOP_SQL = "SELECT username, score, wins FROM leaderboard ORDER BY score DESC, wins DESC, username LIMIT 100"
+RANK_SQL = """
+    SELECT COUNT(*) + 1 FROM leaderboard
+    WHERE score > ? OR (score = ? AND (wins > ? OR (wins = ? AND username < ?)))
+"""
+
+def timed(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(7)
+    names = [f'player{i}' for i in range(players)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.init_schema()
+        for name in names:
+            db.add_score(name, rng.randrange(0, 5000), rng.randrange(0, 500))
+        db.flush()
+
+        board = Leaderboard(db)
+        t0 = time.perf_counter()
+        len(board)
+        print(f"{players} players, loaded in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        def sql_rank():
+            name = rng.choice(names)
+            score, wins = db.query_one("SELECT score, wins FROM leaderboard WHERE username = ?", (name,))
+            db.query_one(RANK_SQL, (score, score, wins, wins, name))
+
+        def win():
+            name = rng.choice(names)
+            board.record_win(name, 10)
+            db.add_score(name, 10)
+
+        print(f"{'query':>16} {'sql us':>10} {'memory us':>10}")
+        print(f"{'top 100':>16} {timed(lambda: db.query(TOP_SQL), 200):>10.1f} "
+              f"{timed(lambda: board.page(0, 100), 2000):>10.1f}")
+        print(f"{'rank':>16} {timed(sql_rank, 200):>10.1f} "
+              f"{timed(lambda: board.rank(rng.choice(names)), 2000):>10.1f}")
+        print(f"{'page at 25000':>16} {timed(lambda: db.query(TOP_SQL + ' OFFSET 25000'), 200):>10.1f} "
+              f"{timed(lambda: board.page(25000, 100), 2000):>10.1f}")
+        print(f"{'record win':>16} {'':>10} {timed(win, 2000):>10.1f}")
+        db.close()
+
+if __name__ == '__main__':
+    main()
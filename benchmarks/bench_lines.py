@@ -0,0 +1,139 @@
+"""Line index and per-board line counters: agreement, per-move cost, memory.
+
+Agreement runs first: random games on every size from 3 to 15 with
+clears mixed in (a random stone removed now and then), comparing a board
+with line counters against one without after every step: winning_line
+for the cell played, and threats for both symbols against a brute-force
+check of every win_len window. It stops on the first mismatch.
+
+Then, per board size:
+
+- place + winning_line per move, on plain bitboards (window shift-and-mask)
+  and on boards keeping line counters (a counter check)
+- a threat query ("where does X win next move") mid-game, by scanning
+  every line's mask and from the counters
+- memory: the shared index for the size, and each board's counters
+
+Run from the repo root:  python benchmarks/bench_lines.py
+"""
+import os
+import random
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import lines
+from board import Board
+from game_logic import get_win_len
+
+SIZES = (3, 5, 7, 10, 15)
+GAMES = 200
+
+def brute_threats(board, symbol, win_len):
+    cells = set()
+    for line in lines.line_index(board.size, win_len).cells:
+        values = [board.get(r, c) for r, c in line]
+        if values.count(symbol) == win_len - 1 and values.count(None) == 1:
+            cells.add(line[values.index(None)])
+    return sorted(cells)
+
+def check_agreement(rng):
+    steps = 0
+    for size in range(3, 16):
+        win_len = get_win_len(size)
+        for _ in range(30):
+            plain = Board(size)
+            tracked = Board(size)
+            tracked.track_lines()
+            cells = [(r, c) for r in range(size) for c in range(size)]
+            rng.shuffle(cells)
+            played = []
+            symbol = 'X'
+            while cells:
+                if played and rng.random() < 0.1:
+                    # the clear power-up: take a random stone off again
+                    x, y = played.pop(rng.randrange(len(played)))
+                    assert plain.remove(x, y) == tracked.remove(x, y)
+                    cells.append((x, y))
+                else:
+                    x, y = cells.pop()
+                    played.append((x, y))
+                    plain.place(x, y, symbol)
+                    tracked.place(x, y, symbol)
+                    line = tracked.winning_line(x, y, win_len)
+                    assert line == plain.winning_line(x, y, win_len), (size, x, y)
+                    if line:
+                        break
+                    symbol = 'O' if symbol == 'X' else 'X'
+                for s in 'XO':
+                    expected = brute_threats(tracked, s, win_len)
+                    assert tracked.threats(s) == expected, (size, s, tracked)
+                    assert plain.threats(s) == expected, (size, s, plain)
+                steps += 1
+            # a fresh count from the final position matches the running one
+            rebuilt = Board.from_bits(size, tracked.x_bits, tracked.o_bits).track_lines()
+            assert rebuilt.counts == tracked.lines.counts and rebuilt.threats == tracked.lines.threats
+    return steps
+
+def per_move_us(size, games, track):
+    win_len = get_win_len(size)
+    moves = 0
+    elapsed = 0.0
+    for cells in games:
+        board = Board(size)
+        if track:
+            board.track_lines()
+        symbol = 'X'
+        t0 = time.perf_counter()
+        for x, y in cells:
+            board.place(x, y, symbol)
+            moves += 1
+            if board.winning_line(x, y, win_len):
+                break
+            symbol = 'O' if symbol == 'X' else 'X'
+        elapsed += time.perf_counter() - t0
+    return elapsed / moves * 1e6
+
+def threat_query_us(size, rng, track, repeat=2000):
+    board = Board(size)
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    # about a third of the board filled, nobody has won
+    for i, (x, y) in enumerate(cells[:size * size // 3]):
+        board.place(x, y, 'XO'[i % 2])
+        if board.winning_line(x, y):
+            board.remove(x, y)
+    if track:
+        board.track_lines()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        board.threats('X')
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+def main():
+    rng = random.Random(23)
+    print(f"agreement: {check_agreement(rng)} steps with clears, tracked and plain boards agree")
+    print()
+    print(f"{'size':>5} {'lines':>6} {'index KiB':>10} {'counters B':>11} {'move plain us':>14} "
+          f"{'move counted us':>16} {'threats scan us':>16} {'threats counted us':>19}")
+    for size in SIZES:
+        win_len = get_win_len(size)
+        games = []
+        for _ in range(GAMES):
+            cells = [(r, c) for r in range(size) for c in range(size)]
+            rng.shuffle(cells)
+            games.append(cells)
+        plain = per_move_us(size, games, False)
+        counted = per_move_us(size, games, True)
+        scan = threat_query_us(size, random.Random(size), False)
+        fast = threat_query_us(size, random.Random(size), True)
+        index = lines.line_index(size, win_len)
+        counters = Board(size).track_lines().nbytes()
+        print(f"{size:>5} {len(index):>6} {index.nbytes() / 1024:>10.1f} {counters:>11} {plain:>14.2f} "
+              f"{counted:>16.2f} {scan:>16.2f} {fast:>19.2f}")
+    print("(move = place + winning_line; index memory is per process, counters per room)")
+
+if __name__ == '__main__':
+    main()
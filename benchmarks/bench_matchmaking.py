@@ -0,0 +1,121 @@
+"""Matchmaking: enqueue cost against queue depth, and match latency under load.
+
+1. depth: N players wait with ratings no two of which fit each other's
+   window, then more players are enqueued and cancelled again. The sorted
+   queue (a skip list) compares each newcomer with its two neighbours; a
+   linear scan over every waiting ticket is shown for comparison.
+2. latency: players arrive as a Poisson stream on a simulated clock with
+   normally distributed ratings across three board sizes; tick() runs
+   once a simulated second. Reports how long players waited for a match
+   (p50/p95/p99), the rating gaps accepted, and the real time spent in
+   the matchmaker per arrival.
+
+Run from the repo root:  python benchmarks/bench_matchmaking.py
+"""
+import os
+import random
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from matchmaking import Matchmaker
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def linear_enqueue(waiting, rating, window):
+    """What pairing costs without the sorted queue: look at everyone"""
+    best = None
+    for other in waiting:
+        gap = abs(other - rating)
+        if gap <= window and (best is None or gap < abs(best - rating)):
+            best = other
+    if best is None:
+        waiting.append(rating)
+    else:
+        waiting.remove(best)
+    return best
+
+def bench_depth(depths, probes=2000):
+    print(f"{'waiting':>8} {'sorted us/enqueue':>18} {'sorted us/cancel':>17} {'linear us/enqueue':>18}")
+    for depth in depths:
+        # ratings 1 point apart with a zero window: nobody is ever paired
+        mm = Matchmaker(window=0, growth=0, max_window=0)
+        for i in range(depth):
+            mm.enqueue(f'w{i}', 3, i * 1.0, now=0)
+        rng = random.Random(depth)
+        probe_ratings = [rng.random() * depth + 0.5 for _ in range(probes)]
+        t0 = time.perf_counter()
+        for i, rating in enumerate(probe_ratings):
+            mm.enqueue(f'p{i}', 3, rating, now=0)
+        sorted_us = (time.perf_counter() - t0) / probes * 1e6
+        t0 = time.perf_counter()
+        for i in range(probes):
+            mm.cancel(f'p{i}')
+        cancel_us = (time.perf_counter() - t0) / probes * 1e6
+
+        waiting = [i * 1.0 for i in range(depth)]
+        sample = probe_ratings[:max(20, probes * 1000 // max(depth, 1000))]
+        t0 = time.perf_counter()
+        for rating in sample:
+            linear_enqueue(waiting, rating, 0)
+        linear_us = (time.perf_counter() - t0) / len(sample) * 1e6
+        print(f"{depth:>8} {sorted_us:>18.2f} {cancel_us:>17.2f} {linear_us:>18.2f}")
+
+def bench_latency(rate, seconds, seed=1):
+    rng = random.Random(seed)
+    mm = Matchmaker()
+    now = 0.0
+    next_tick = 1.0
+    arrivals = {}
+    waits = []
+    gaps = []
+    spent = 0.0
+    n = 0
+
+    def record(match, at):
+        (first, _), (second, _) = match.players
+        for username in (first, second):
+            waits.append(at - arrivals.pop(username)[0])
+        gaps.append(abs(ratings[first] - ratings[second]))
+
+    ratings = {}
+    while now < seconds:
+        now += rng.expovariate(rate)
+        while next_tick <= now:
+            t0 = time.perf_counter()
+            matches = mm.tick(now=next_tick)
+            spent += time.perf_counter() - t0
+            for match in matches:
+                record(match, next_tick)
+            next_tick += 1.0
+        username = f'u{n}'
+        n += 1
+        rating = rng.gauss(1500, 250)
+        ratings[username] = rating
+        arrivals[username] = (now, rating)
+        t0 = time.perf_counter()
+        match = mm.enqueue(username, rng.choice((3, 4, 5)), rating, now=now)
+        spent += time.perf_counter() - t0
+        if match is not None:
+            record(match, now)
+
+    print(f"{rate:>8.0f} {n:>8} {len(waits):>8} {len(mm):>8} "
+          f"{percentile(waits, 50):>7.2f} {percentile(waits, 95):>7.2f} {percentile(waits, 99):>7.2f} "
+          f"{percentile(gaps, 50):>8.1f} {percentile(gaps, 95):>8.1f} {spent / n * 1e6:>10.2f}")
+
+def main():
+    print("== enqueue cost against queue depth")
+    bench_depth([1000, 10000, 100000])
+    print()
+    print("== match latency (simulated clock, ratings ~ N(1500, 250), board sizes 3/4/5)")
+    print(f"{'rate/s':>8} {'players':>8} {'matched':>8} {'waiting':>8} {'wait p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'gap p50':>8} {'gap p95':>8} {'us/player':>10}")
+    for rate in (5, 50, 500, 5000):
+        bench_latency(rate, seconds=min(120, 200000 / rate))
+
+if __name__ == '__main__':
+    main()
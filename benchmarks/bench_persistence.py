@@ -0,0 +1,84 @@
+"""Game-over write latency: connect-per-call helpers vs the batching Database.
+
+Each "game over" is one leaderboard upsert plus two history rows, as in
+record_result. The legacy path reproduces the old helpers (a fresh
+sqlite3.connect and commit per call, default rollback journal); the new
+path queues the writes on persistence.Database.
+
+Run from the repo root:  python benchmarks/bench_persistence.py [games]
+"""
+import datetime
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import Database, SCHEMA, INSERT_HISTORY
+
+LEGACY_LEADERBOARD = """
+    INSERT INTO leaderboard (username, score, wins)
+    VALUES (?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        score = score + excluded.score,
+        wins = wins + 1
+"""
+
+def legacy_game_over(path, winner, loser, ts):
+    with sqlite3.connect(path) as conn:
+        conn.execute(LEGACY_LEADERBOARD, (winner, 10, 1))
+        conn.commit()
+    for row in ((winner, loser, 'multiplayer', 'win', 3, ts), (loser, winner, 'multiplayer', 'loss', 3, ts)):
+        with sqlite3.connect(path) as conn:
+            conn.execute(INSERT_HISTORY, row)
+            conn.commit()
+
+def batched_game_over(db, winner, loser, ts):
+    db.add_score(winner, 10)
+    db.add_history((winner, loser, 'multiplayer', 'win', 3, ts))
+    db.add_history((loser, winner, 'multiplayer', 'loss', 3, ts))
+
+def run(label, games, game_over):
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(games):
+        ts = datetime.datetime.utcnow().isoformat()
+        start = time.perf_counter()
+        game_over(f'player{i % 50}', f'player{(i + 1) % 50}', ts)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies, t0
+
+def report(label, latencies, elapsed):
+    latencies.sort()
+    print(f"{label:>8} {statistics.median(latencies):>10.1f} {latencies[int(len(latencies) * 0.99)]:>10.1f} "
+          f"{len(latencies) / elapsed:>12.0f}")
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        with sqlite3.connect(legacy_path) as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+        print(f"{games} game-overs (1 leaderboard + 2 history writes each)")
+        print(f"{'path':>8} {'p50 us':>10} {'p99 us':>10} {'games/s':>12}")
+
+        latencies, t0 = run('legacy', games, lambda w, l, ts: legacy_game_over(legacy_path, w, l, ts))
+        report('legacy', latencies, time.perf_counter() - t0)
+
+        db = Database(os.path.join(tmp, 'batched.db'))
+        db.init_schema()
+        latencies, t0 = run('batched', games, lambda w, l, ts: batched_game_over(db, w, l, ts))
+        db.flush()
+        # throughput includes waiting for the writer to commit everything
+        report('batched', latencies, time.perf_counter() - t0)
+        rows = db.query_one("SELECT COUNT(*) FROM history")[0]
+        print(f"batched: {rows} history rows in {db.stats()['batches']} transactions")
+        db.close()
+
+if __name__ == '__main__':
+    main()
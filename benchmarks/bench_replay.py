@@ -0,0 +1,120 @@
+"""Replay recording: storage per game, overhead per move, bulk scan speed.
+
+Random games on 3x3, 7x7 and 10x10 boards (played to a win or a full
+board) are recorded the way the app does it: one list append per move
+while the game runs, then one varint encode and one queued insert when
+it ends. Reported:
+
+- bytes per game and per move, against the same moves stored as JSON
+  [[x, y], ...] text
+- in-handler cost per move (append, plus encode and enqueue amortised
+  over the game) and batched writer throughput into a scratch database
+- a bulk scan over N stored games (default 1,000,000) that decodes every
+  log and tallies first-move win rates per board size
+
+Run from the repo root:  python benchmarks/bench_replay.py [games to scan]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import replay
+from board import Board
+from game_logic import get_win_len
+from persistence import Database
+
+SIZES = (3, 7, 10)
+GAMES_PER_SIZE = 2000
+
+def random_game(size, rng):
+    """(events, moves as (x, y) pairs, winner symbol or None)"""
+    board = Board(size)
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    rng.shuffle(cells)
+    events, moves = [], []
+    win_len = get_win_len(size)
+    for i, (x, y) in enumerate(cells):
+        symbol = 'X' if i % 2 == 0 else 'O'
+        board.place(x, y, symbol)
+        events.append(replay.place(size, x, y))
+        moves.append((x, y))
+        if board.winning_line(x, y, win_len):
+            return events, moves, symbol
+    return events, moves, None
+
+def main():
+    scan_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(7)
+    games = {size: [random_game(size, rng) for _ in range(GAMES_PER_SIZE)] for size in SIZES}
+
+    print(f"== storage ({GAMES_PER_SIZE} random games per size)")
+    print(f"{'size':>5} {'moves/game':>11} {'varint B/game':>14} {'B/move':>7} {'JSON B/game':>12}")
+    for size in SIZES:
+        played = games[size]
+        moves = sum(len(m) for _, m, _ in played)
+        varint = sum(len(replay.encode(e)) for e, _, _ in played)
+        as_json = sum(len(json.dumps(m, separators=(',', ':'))) for _, m, _ in played)
+        print(f"{size:>5} {moves / len(played):>11.1f} {varint / len(played):>14.1f} "
+              f"{varint / moves:>7.2f} {as_json / len(played):>12.1f}")
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'replays.db')
+    db = Database(path)
+    db.init_schema()
+    all_games = [(size, g) for size in SIZES for g in games[size]]
+    total_moves = sum(len(g[0]) for _, g in all_games)
+
+    # what the handlers pay: an append per move, then encode + enqueue once per game
+    t0 = time.perf_counter()
+    for size, (events, _, winner) in all_games:
+        log = []
+        for event in events:
+            log.append(event)
+        blob = replay.encode(log)
+        winner = winner and f'{winner.lower()}-player'
+        db.add_replay((size, 'x-player', 'o-player', winner, len(log), '2026-01-01T00:00:00', blob))
+    handler = time.perf_counter() - t0
+    db.flush()
+    written = time.perf_counter() - t0
+    print()
+    print(f"== write overhead ({len(all_games)} games, {total_moves} moves)")
+    print(f"in-handler: {handler / total_moves * 1e9:.0f} ns per move; "
+          f"committed by the batching writer at {len(all_games) / written:.0f} games/s; {db.stats()}")
+    db.close()
+
+    # fill a table of scan_games rows by cycling the recorded blobs
+    conn = db.connection()
+    rows = conn.execute("SELECT board_size, player_x, player_o, winner, moves, date, log FROM replays").fetchall()
+    with conn:
+        conn.execute("DELETE FROM replays")
+        for start in range(0, scan_games, 100000):
+            conn.executemany(
+                "INSERT INTO replays (board_size, player_x, player_o, winner, moves, date, log) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (rows[i % len(rows)] for i in range(start, min(scan_games, start + 100000))))
+    print()
+    print(f"== bulk scan of {scan_games} games ({os.path.getsize(path) / 2 ** 20:.0f} MiB database)")
+    t0 = time.perf_counter()
+    tally = {}
+    events = 0
+    for _, size, winner, blob in replay.scan(path):
+        log = replay.decode(blob)
+        events += len(log)
+        # opening cell -> [games, X wins]
+        counts = tally.setdefault((size, log[0]), [0, 0])
+        counts[0] += 1
+        counts[1] += winner == 'x-player'
+    elapsed = time.perf_counter() - t0
+    print(f"{scan_games / elapsed:,.0f} games/s, {events / elapsed:,.0f} events/s ({elapsed:.2f}s)")
+    for size in SIZES:
+        best = max(((cell, c[1] / c[0]) for (s, cell), c in tally.items() if s == size), key=lambda t: t[1])
+        print(f"  {size}x{size}: best opening {divmod(best[0], size)} wins {best[1]:.0%} for X")
+
+if __name__ == '__main__':
+    main()
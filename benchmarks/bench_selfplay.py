@@ -0,0 +1,263 @@
+"""Self-play: whole games through the headless rules, on a process pool.
+
+Games are played with rules.py alone (no Flask, Socket.IO or store), the
+way the handlers play them: a side to move may first try a power-up,
+a player in clear mode empties a cell, a blocked player passes, anyone
+else places a stone. Players are either random (uniform over legal
+cells, trying a random power-up with probability --power-ups) or the
+server AI (ai_engine.search_move with --ai-budget seconds per move).
+
+Every board size in --sizes is played --games times, split into tasks
+of --chunk games spread over --workers processes. Per size the report
+has the outcome counts, plies, games per second per worker, per-move
+latency of the rules calls and of choosing the move (four buckets per
+power of two; percentiles are bucket upper bounds, within 25%), and the
+peak resident memory of the workers. Random games are seeded per task,
+so with the same --seed they replay exactly: `digest` hashes every
+game's replay log, and a rules change that alters play changes it (AI
+games depend on timing, so their digest is not comparable).
+
+The report is JSON on stdout (or --out FILE), with a short table on
+stderr, for keeping one file per commit and diffing them:
+
+    python benchmarks/bench_selfplay.py --games 1000000 --out selfplay-$(git rev-parse --short HEAD).json
+
+Run from the repo root:  python benchmarks/bench_selfplay.py [--sizes 3-15] [--players random|ai]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+import replay
+import rules
+from ai_engine import search_move
+from game_logic import get_win_len
+
+PLAYERS = ('A', 'B')
+# latency buckets: four per power of two of nanoseconds, up to 2 ** 40 ns
+BUCKETS = 41 * 4
+
+def bucket(ns):
+    """Bucket index of a duration in ns: its bit length and the two bits after the leading one"""
+    bits = ns.bit_length()
+    return bits * 4 + ((ns >> (bits - 3)) & 3 if bits > 2 else 0)
+
+def bucket_bound(index):
+    """Upper bound in ns of a bucket's durations"""
+    bits, sub = divmod(index, 4)
+    return (5 + sub) * 2 ** (bits - 3) if bits > 2 else 2 ** bits
+
+def parse_sizes(text):
+    sizes = []
+    for part in text.split(','):
+        low, _, high = part.partition('-')
+        sizes.extend(range(int(low), int(high or low) + 1))
+    return sizes
+
+def random_choice(game, free, rng, budget):
+    return free[rng.randrange(len(free))]
+
+def ai_choice(game, free, rng, budget):
+    move = search_move(game['board'], game['turn'], budget).move
+    return move[0] * game['size'] + move[1]
+
+def play_game(size, choose, power_rate, budget, rng, rules_hist, think_hist):
+    """One game to its end; returns (winner symbol or None, plies, replay log)"""
+    game = rules.new_game(list(PLAYERS), PLAYERS, size)
+    free = list(range(size * size))
+    taken = []
+    clock = time.perf_counter_ns
+    plies = 0
+    while True:
+        plies += 1
+        player = rules.player_to_move(game)
+        if power_rate and rng.random() < power_rate:
+            t0 = clock()
+            rules.use_power_up(game, player, rng.choice(rules.POWER_UPS))
+            rules_hist[bucket(clock() - t0)] += 1
+        if game['clear_mode'] == player:
+            index = taken.pop(rng.randrange(len(taken)))
+            t0 = clock()
+            rules.clear_cell(game, index // size, index % size)
+            rules_hist[bucket(clock() - t0)] += 1
+            free.append(index)
+            continue
+        t0 = clock()
+        skipped = rules.skip_blocked_turn(game, player)
+        rules_hist[bucket(clock() - t0)] += 1
+        if skipped:
+            continue
+
+        t0 = clock()
+        index = choose(game, free, rng, budget)
+        think_hist[bucket(clock() - t0)] += 1
+        free.remove(index)
+        taken.append(index)
+        t0 = clock()
+        move = rules.play(game, index // size, index % size)
+        rules_hist[bucket(clock() - t0)] += 1
+        if move.line:
+            return move.symbol, plies, game['log']
+        if move.draw:
+            return None, plies, game['log']
+
+def run_task(task):
+    """Worker entry point: play one chunk of games of one size"""
+    size, games, seed, players, power_rate, budget = task
+    rng = random.Random(seed)
+    choose = ai_choice if players == 'ai' else random_choice
+    rules_hist = [0] * BUCKETS
+    think_hist = [0] * BUCKETS
+    digest = hashlib.sha256()
+    outcomes = {'X': 0, 'O': 0, None: 0}
+    plies = 0
+    t0 = time.perf_counter()
+    for _ in range(games):
+        winner, game_plies, log = play_game(size, choose, power_rate, budget, rng, rules_hist, think_hist)
+        outcomes[winner] += 1
+        plies += game_plies
+        digest.update(replay.encode(log))
+    seconds = time.perf_counter() - t0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    return {'size': size, 'seed': seed, 'games': games, 'x_wins': outcomes['X'], 'o_wins': outcomes['O'],
+            'draws': outcomes[None], 'plies': plies, 'seconds': seconds, 'rules_hist': rules_hist,
+            'think_hist': think_hist, 'digest': digest.hexdigest(), 'rss_kib': rss}
+
+def latency_summary(hist):
+    """Approximate mean and percentiles in microseconds from bucket counts (bucket upper bounds)"""
+    total = sum(hist)
+    if not total:
+        return None
+    summary = {'count': total}
+    summary['mean_us'] = round(sum(count * bucket_bound(b) for b, count in enumerate(hist)) / total / 1000, 3)
+    for name, q in (('p50_us', 0.5), ('p90_us', 0.9), ('p99_us', 0.99), ('p999_us', 0.999)):
+        seen = 0
+        for b, count in enumerate(hist):
+            seen += count
+            if seen >= q * total:
+                summary[name] = round(bucket_bound(b) / 1000, 3)
+                break
+    summary['max_us'] = round(bucket_bound(max(b for b, count in enumerate(hist) if count)) / 1000, 3)
+    return summary
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='3-15', help='board sizes, e.g. 3-15 or 3,5,10')
+    parser.add_argument('--games', type=int, default=2000, help='games per board size')
+    parser.add_argument('--players', choices=('random', 'ai'), default='random')
+    parser.add_argument('--power-ups', type=float, default=0.05,
+                        help='chance a random player tries a power-up before each move')
+    parser.add_argument('--ai-budget', type=float, default=0.005, help='seconds per AI move')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=500, help='games per task')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    power_rate = args.power_ups if args.players == 'random' else 0.0
+    tasks = []
+    for size in sizes:
+        for start in range(0, args.games, args.chunk):
+            # seeds depend only on --seed, the size and the chunk, not on scheduling
+            seed = hash((args.seed, size, start)) & 0xffffffff
+            tasks.append((size, min(args.chunk, args.games - start), seed, args.players, power_rate, args.ai_budget))
+
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(run_task, tasks, chunksize=1)
+    wall = time.perf_counter() - t0
+
+    report_sizes = []
+    for size in sizes:
+        chunks = [r for r in results if r['size'] == size]
+        games = sum(r['games'] for r in chunks)
+        seconds = sum(r['seconds'] for r in chunks)
+        plies = sum(r['plies'] for r in chunks)
+        rules_hist = [sum(counts) for counts in zip(*(r['rules_hist'] for r in chunks))]
+        think_hist = [sum(counts) for counts in zip(*(r['think_hist'] for r in chunks))]
+        digest = hashlib.sha256(''.join(r['digest'] for r in chunks).encode()).hexdigest()
+        rss = [r['rss_kib'] for r in chunks if r['rss_kib'] is not None]
+        report_sizes.append({
+            'size': size,
+            'win_len': get_win_len(size),
+            'games': games,
+            'x_wins': sum(r['x_wins'] for r in chunks),
+            'o_wins': sum(r['o_wins'] for r in chunks),
+            'draws': sum(r['draws'] for r in chunks),
+            'plies_per_game': round(plies / games, 2),
+            'games_per_sec_per_worker': round(games / seconds, 1),
+            'plies_per_sec_per_worker': round(plies / seconds, 1),
+            'rules_latency': latency_summary(rules_hist),
+            'move_choice_latency': latency_summary(think_hist),
+            'worker_rss_peak_kib': max(rss) if rss else None,
+            'digest': digest,
+        })
+
+    total_games = sum(s['games'] for s in report_sizes)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'workers': args.workers,
+            'players': args.players,
+            'power_ups': power_rate,
+            'ai_budget': args.ai_budget if args.players == 'ai' else None,
+            'games_per_size': args.games,
+            'seed': args.seed,
+        },
+        'total': {
+            'games': total_games,
+            'wall_seconds': round(wall, 3),
+            'games_per_sec': round(total_games / wall, 1),
+            'parent_rss_peak_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        },
+        'sizes': report_sizes,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    print(f"{'size':>4} {'games':>8} {'X/O/draw %':>14} {'plies':>6} {'games/s/wkr':>12} "
+          f"{'rules p50/p99 us':>17} {'choice p50/p99 us':>18} {'rss KiB':>8}", file=sys.stderr)
+    for s in report_sizes:
+        share = '/'.join(f"{100 * s[key] / s['games']:.0f}" for key in ('x_wins', 'o_wins', 'draws'))
+        rules_lat, choice = s['rules_latency'], s['move_choice_latency']
+        print(f"{s['size']:>4} {s['games']:>8} {share:>14} {s['plies_per_game']:>6} "
+              f"{s['games_per_sec_per_worker']:>12,.0f} {rules_lat['p50_us']:>8}/{rules_lat['p99_us']:<8} "
+              f"{choice['p50_us']:>9}/{choice['p99_us']:<8} {s['worker_rss_peak_kib'] or '-':>8}", file=sys.stderr)
+    print(f"{total_games} games in {wall:.1f}s on {args.workers} workers: "
+          f"{total_games / wall:,.0f} games/s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
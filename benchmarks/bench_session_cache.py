@@ -0,0 +1,107 @@
+"""Join storm: thousands of clients reconnecting at once after a deploy.
+
+Each reconnect does what the app does: game_page reads the saved session,
+handle_join upserts it, and the client's /recover-session call reads it
+again. Compared with and without the write-behind SessionCache in front
+of user_sessions, from several threads at once.
+
+Run from the repo root:  python benchmarks/bench_session_cache.py [users] [threads]
+"""
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import Database
+from session_cache import SessionCache
+
+SELECT_SESSION = "SELECT room_code, board_size, mode FROM user_sessions WHERE username = ?"
+
+class Direct:
+    """The uncached path: every read is a query, every upsert a queued write"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, username):
+        row = self.db.query_one(SELECT_SESSION, (username,))
+        return {'room_code': row[0], 'board_size': row[1], 'mode': row[2]} if row else None
+
+    def put(self, *row):
+        self.db.save_session(*row)
+
+def reconnect(store, username):
+    store.get(username)
+    store.put(username, f'R{hash(username) % 10000:04d}', 3, 'multiplayer', datetime.datetime.utcnow().isoformat())
+    store.get(username)
+
+def storm(store, users, threads, rounds):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(names):
+        local = []
+        for _ in range(rounds):
+            for name in names:
+                start = time.perf_counter()
+                reconnect(store, name)
+                local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(users[i::threads],)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies, time.perf_counter() - t0
+
+def seed(path, users):
+    db = Database(path)
+    db.init_schema()
+    now = datetime.datetime.utcnow().isoformat()
+    for name in users:
+        db.save_session(name, 'OLD0', 3, 'multiplayer', now)
+    db.flush()
+    return db
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rounds = 3  # clients retry/reconnect a few times while the server settles
+    users = [f'user{i}' for i in range(count)]
+
+    print(f"{count} users x {rounds} reconnects, {threads} threads")
+    print(f"{'store':>8} {'p50 us':>9} {'p99 us':>9} {'reconnects/s':>13} {'db reads':>9} {'db writes':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = seed(os.path.join(tmp, 'direct.db'), users)
+        ops_before = db.stats()['ops_written']
+        latencies, elapsed = storm(Direct(db), users, threads, rounds)
+        db.flush()
+        latencies.sort()
+        print(f"{'direct':>8} {statistics.median(latencies):>9.1f} {latencies[int(len(latencies) * 0.99)]:>9.1f} "
+              f"{len(latencies) / elapsed:>13.0f} {len(latencies) * 2:>9} {db.stats()['ops_written'] - ops_before:>10}")
+        db.close()
+
+        db = seed(os.path.join(tmp, 'cached.db'), users)
+        ops_before = db.stats()['ops_written']
+        cache = SessionCache(db, max_entries=count * 2, flush_interval=0.5)
+        latencies, elapsed = storm(cache, users, threads, rounds)
+        cache.close()
+        db.flush()
+        latencies.sort()
+        stats = cache.stats()
+        print(f"{'cached':>8} {statistics.median(latencies):>9.1f} {latencies[int(len(latencies) * 0.99)]:>9.1f} "
+              f"{len(latencies) / elapsed:>13.0f} {stats['misses']:>9} {db.stats()['ops_written'] - ops_before:>10}")
+        print(f"cache: hit rate {stats['hit_rate']:.1%}, {stats['coalesced']} upserts coalesced, "
+              f"{stats['flushed']} rows flushed")
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Broadcast cost per move for audiences of 1, 100 and 10,000 spectators.
+
+A python-socketio Server is given N spectator sockets in one watch room;
+its packet writer is replaced by a sink that encodes each engine.io
+packet (what the socket's writer would do) and counts bytes, so the
+numbers are the server-side cost of fanning one move out.
+
+- per-socket snapshot: game_state emitted to each spectator on its own,
+  JSON-encoded once per recipient
+- per-socket delta: the same, with only the move's delta
+- room emit: one emit of the delta to the watch room, encoded once and
+  the packet reused for every recipient
+- coalesced: the spectator hub, with players moving ten times per
+  interval: one merged room emit covers ten moves
+
+A last run gives one spectator a permanently full socket queue and
+checks that it is skipped while everyone else keeps receiving updates.
+
+Run from the repo root:  python benchmarks/bench_spectators.py
+"""
+import os
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import socketio
+
+from board import Board
+from spectators import SpectatorHub, watch_room
+
+ROOM = 'FEATURED'
+BOARD_SIZE = 10
+MOVES_PER_INTERVAL = 10
+
+def make_server(spectators):
+    server = socketio.Server(async_mode='threading')
+    sent = {'packets': 0, 'bytes': 0}
+
+    def sink(eio_sid, eio_pkt):
+        sent['packets'] += 1
+        sent['bytes'] += len(eio_pkt.encode())
+
+    server._send_eio_packet = sink
+    sids = []
+    for i in range(spectators):
+        eio_sid = f'eio{i}'
+        sid = server.manager.connect(eio_sid, '/')
+        server.manager.enter_room(sid, '/', watch_room(ROOM), eio_sid)
+        sids.append(sid)
+    return server, sids, sent
+
+def game_state(board, version):
+    return {'board': board.to_rows(), 'players': ['ann', 'ben'], 'turn': 'X',
+            'powerups': {'ann': {'block': 1, 'clear': 1}, 'ben': {'block': 1, 'clear': 1}},
+            'size': BOARD_SIZE, 'blocked': False, 'blocked_player': None, 'clear_mode': None,
+            'new_game_requested_by': None, 'version': version}
+
+def moves(count):
+    board = Board(BOARD_SIZE)
+    for n in range(count):
+        x, y = divmod(n % (BOARD_SIZE * BOARD_SIZE), BOARD_SIZE)
+        if not board.is_empty(x, y):
+            board.reset()
+        symbol = 'X' if n % 2 == 0 else 'O'
+        board.place(x, y, symbol)
+        yield board, {'version': n + 1, 'turn': 'O' if symbol == 'X' else 'X', 'cells': [[x, y, symbol]]}
+
+def run(strategy, spectators, count):
+    server, sids, sent = make_server(spectators)
+    hub = None
+    if strategy == 'coalesced':
+        # the timer is driven by hand below: flush after every MOVES_PER_INTERVAL moves
+        hub = SpectatorHub(server.emit, lambda room: None, spawn=lambda *args: None, sleep=None,
+                           interval=3600)
+        for sid in sids:
+            hub.add(sid, ROOM)
+    t0 = time.perf_counter()
+    for board, delta in moves(count):
+        if strategy == 'per-socket snapshot':
+            state = game_state(board, delta['version'])
+            for sid in sids:
+                server.emit('game_update', state, to=sid)
+        elif strategy == 'per-socket delta':
+            for sid in sids:
+                server.emit('game_delta', delta, to=sid)
+        elif strategy == 'room emit':
+            server.emit('game_delta', delta, to=watch_room(ROOM))
+        else:
+            hub.publish(ROOM, delta)
+            if delta['version'] % MOVES_PER_INTERVAL == 0:
+                hub.flush(ROOM)
+    elapsed = time.perf_counter() - t0
+    return elapsed / count * 1e6, sent['packets'] / count, sent['bytes'] / count
+
+def slow_spectator(spectators, count):
+    server, sids, sent = make_server(spectators)
+    slow = sids[0]
+    received = {sid: 0 for sid in sids}
+    emit = server.emit
+
+    def counting_emit(event, data, to=None, skip_sid=None):
+        skipped = set(skip_sid or ())
+        for sid in (sids if to == watch_room(ROOM) else [to]):
+            if sid not in skipped:
+                received[sid] += 1
+        emit(event, data, to=to, skip_sid=skip_sid)
+
+    hub = SpectatorHub(counting_emit, lambda room: {'version': 0}, spawn=lambda *args: None, sleep=None,
+                       backlog=lambda sid: 10 ** 6 if sid == slow else 0, interval=0)
+    for sid in sids:
+        hub.add(sid, ROOM)
+    for _, delta in moves(count):
+        hub.publish(ROOM, delta)
+    others = min(received[sid] for sid in sids[1:])
+    return received[slow], others, hub.stats()
+
+def main():
+    count = 200
+    print(f"{count} moves on a {BOARD_SIZE}x{BOARD_SIZE} board; coalesced = {MOVES_PER_INTERVAL} moves per interval")
+    print(f"{'spectators':>10} {'strategy':>20} {'us/move':>10} {'packets/move':>13} {'bytes/move':>11}")
+    for spectators in (1, 100, 10000):
+        for strategy in ('per-socket snapshot', 'per-socket delta', 'room emit', 'coalesced'):
+            # the slowest strategies get fewer moves at 10,000 spectators
+            n = count if spectators < 10000 or strategy in ('room emit', 'coalesced') else 20
+            us, packets, size = run(strategy, spectators, n)
+            print(f"{spectators:>10} {strategy:>20} {us:>10.1f} {packets:>13.1f} {size:>11.0f}")
+    print()
+    slow, others, stats = slow_spectator(100, count)
+    print(f"one stalled spectator of 100: it got {slow} updates, every other one at least {others} of {count}; "
+          f"hub {stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Simulated tournaments: bot clients play whole events against the app.
+
+Every player is a Socket.IO test client connected to the real app (in
+process, threading mode, a scratch database in a temporary directory).
+Bots follow the tournament, join the room each tournament_update gives
+them, keep their board from game_update/game_delta and play a random
+empty cell whenever it is their turn. Rooms, rounds and results are
+entirely the server's: bots never report anything.
+
+- a 1,000-player single-elimination bracket (999 matches)
+- a 100-player round-robin (4,950 matches over 99 rounds)
+
+For each event: wall time, games per second (replayed draws included),
+and what reached the database: write batches and queued operations,
+against the four operations per game (two history rows, a score and a
+replay) the per-game recording path would have queued. Queued operations
+also count the saved session each room join writes (two per match),
+which tournaments leave as they are. Most of the wall time is the bots
+themselves: every test client decodes every broadcast it receives.
+
+Run from the repo root:  python benchmarks/bench_tournament.py [bracket players] [round-robin players]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+# database.db and logs/ go to a scratch directory
+os.chdir(tempfile.mkdtemp())
+
+import app as xo
+
+TIMEOUT = 600
+
+class Bot:
+    def __init__(self, username, size, rng):
+        self.username = username
+        self.size = size
+        self.rng = rng
+        self.client = xo.socketio.test_client(xo.app)
+        self.room = None
+        self.symbol = None
+        self.cells = {}
+        self.turn = None
+        self.moves = 0
+        self.games = 0
+
+    def step(self):
+        """Handle everything received since the last step; True if anything happened"""
+        received = self.client.get_received()
+        for packet in received:
+            name, data = packet['name'], packet['args'][0]
+            if name == 'tournament_update':
+                self.find_match(data)
+            elif name == 'game_update' and data.get('match') and self.room:
+                self.cells = {(x, y): cell for x, row in enumerate(data['board'])
+                              for y, cell in enumerate(row) if cell}
+                self.turn = data['turn']
+            elif name == 'game_delta' and self.room:
+                if data.get('reset'):
+                    self.cells = {}
+                for x, y, value in data['cells']:
+                    if value:
+                        self.cells[x, y] = value
+                    else:
+                        self.cells.pop((x, y), None)
+                self.turn = data['turn']
+            elif name == 'game_over' and self.symbol == 'X':
+                self.games += 1
+            elif name == 'tournament_match_over':
+                self.room = None
+        if self.room and self.turn == self.symbol:
+            free = [(x, y) for x in range(self.size) for y in range(self.size) if (x, y) not in self.cells]
+            x, y = self.rng.choice(free)
+            # nothing more to do until the server's delta says whose turn it is
+            self.turn = None
+            self.moves += 1
+            self.client.emit('make_move', {'room': self.room, 'username': self.username, 'x': x, 'y': y})
+            return True
+        return bool(received)
+
+    def find_match(self, state):
+        for match in state.get('matches', ()):
+            if self.username in (match['x'], match['o']) and match['room'] and match['room'] != self.room:
+                self.room = match['room']
+                self.symbol = 'X' if match['x'] == self.username else 'O'
+                self.cells = {}
+                self.turn = None
+                self.client.emit('join', {'room': self.room, 'username': self.username, 'board_size': self.size})
+                return
+
+def run(players, fmt, size, rng):
+    names = [f'{fmt[:2]}-{i:04d}' for i in range(players)]
+    bots = {name: Bot(name, size, rng) for name in names}
+    web = xo.app.test_client()
+    db_before = xo.db.stats()
+    t0 = time.perf_counter()
+    response = web.post('/tournaments', json={'players': names, 'format': fmt, 'board_size': size})
+    tid = response.json['id']
+    for bot in bots.values():
+        bot.client.emit('follow_tournament', {'tournament': tid, 'username': bot.username})
+    while tid in xo.tournaments:
+        busy = False
+        for bot in bots.values():
+            busy = bot.step() or busy
+        if not busy:
+            # the next round is being opened on a background task
+            time.sleep(0.001)
+        if time.perf_counter() - t0 > TIMEOUT:
+            raise RuntimeError(f"{fmt} tournament did not finish in {TIMEOUT}s")
+    elapsed = time.perf_counter() - t0
+    xo.db.flush()
+    db_after = xo.db.stats()
+    final = web.get(f'/tournaments/{tid}').json
+    for bot in bots.values():
+        bot.client.disconnect()
+    return {
+        'elapsed': elapsed,
+        'rounds': final['round'],
+        'champion': final['champion'],
+        'games': sum(bot.games for bot in bots.values()),
+        'moves': sum(bot.moves for bot in bots.values()),
+        'batches': db_after['batches'] - db_before['batches'],
+        'ops': db_after['ops_written'] - db_before['ops_written'],
+        'standings': len(final['standings']),
+    }
+
+def main():
+    bracket_players = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    robin_players = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = random.Random(21)
+    results = []
+    for players, fmt in ((bracket_players, 'bracket'), (robin_players, 'round_robin')):
+        # the app prints a line per connection and room; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append((players, fmt, run(players, fmt, 3, rng)))
+    print(f"{'event':>22} {'rounds':>7} {'games':>7} {'moves':>8} {'time':>8} {'games/s':>8} "
+          f"{'db batches':>11} {'db ops':>7} {'per-game ops':>13}")
+    for players, fmt, r in results:
+        print(f"{f'{players} players, {fmt}':>22} {r['rounds']:>7} {r['games']:>7} {r['moves']:>8} "
+              f"{r['elapsed']:>7.2f}s {r['games'] / r['elapsed']:>8.0f} {r['batches']:>11} {r['ops']:>7} "
+              f"{r['games'] * 4:>13}")
+    print("(games include replayed draws; db ops are one per round plus one at creation, and the session")
+    print(" saves of room joins; per-game ops is what recording each game as it ended would have queued)")
+
+if __name__ == '__main__':
+    main()
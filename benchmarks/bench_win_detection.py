@@ -0,0 +1,60 @@
+"""Per-move win detection latency: full-board check_winner vs find_winning_line.
+
+Run from the repo root:  python benchmarks/bench_win_detection.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_logic import new_empty_board, get_win_len, is_board_full, check_winner, find_winning_line
+
+SIZES = (3, 4, 5, 10, 15, 20, 30, 50)
+GAMES_PER_SIZE = 20
+
+def play_random_moves(size, rng):
+    """Yield (board, x, y, symbol) after each move of a random game."""
+    board = new_empty_board(size)
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    turn = 'X'
+    for x, y in cells:
+        board[x][y] = turn
+        yield board, x, y, turn
+        turn = 'O' if turn == 'X' else 'X'
+
+def bench_size(size, seed=1234):
+    rng = random.Random(seed)
+    win_len = get_win_len(size)
+    full_time = 0.0
+    local_time = 0.0
+    moves = 0
+    for _ in range(GAMES_PER_SIZE):
+        empty = size * size
+        for board, x, y, symbol in play_random_moves(size, rng):
+            empty -= 1
+
+            t0 = time.perf_counter()
+            full = check_winner(board, symbol, win_len) or is_board_full(board)
+            t1 = time.perf_counter()
+            local = find_winning_line(board, x, y, win_len) is not None or empty == 0
+            t2 = time.perf_counter()
+
+            assert full == local, (size, x, y)
+            full_time += t1 - t0
+            local_time += t2 - t1
+            moves += 1
+            if local:
+                break
+    return moves, full_time / moves * 1e6, local_time / moves * 1e6
+
+def main():
+    print(f"{'size':>6} {'win':>4} {'moves':>7} {'check_winner us':>16} {'incremental us':>15} {'speedup':>8}")
+    for size in SIZES:
+        moves, full_us, local_us = bench_size(size)
+        print(f"{size:>4}x{size:<2} {get_win_len(size):>3} {moves:>7} {full_us:>16.2f} {local_us:>15.2f} {full_us / local_us:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
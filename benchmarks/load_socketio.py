@@ -0,0 +1,258 @@
+"""Connection-scaling load test against a real server, once per ASYNC_MODE.
+
+For each mode the app is started as a subprocess (python app.py) on a
+free port, in a scratch directory, and driven by headless Socket.IO
+clients over websockets:
+
+1. round trip: pairs of players share a room and take turns; the time
+   from emitting make_move to receiving the matching game_delta gives
+   p50/p95/p99 per mode
+2. ramp: idle clients are connected in steps until a step fails (connect
+   error or timeout) or --max-clients is reached; the server's resident
+   memory after each step gives the memory cost per connection
+3. persistence: one 3x3 game is played to a win and the winner's history
+   row must show up in GET /history within a few seconds. The database
+   writer is a real OS thread next to the event loop; if a green mode
+   breaks it, nothing is saved and the mode is reported as failed
+
+Needs the client extras: pip install "python-socketio[asyncio_client]" aiohttp
+
+Run from the repo root:
+    python benchmarks/load_socketio.py [--modes threading eventlet gevent] [--max-clients 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+BOARD_SIZE = 10
+# X only plays cells where own_cells(0) and O where own_cells(1): neither colour
+# has more than two in a row in any direction, so no game ends mid-measurement
+MAX_MOVES = BOARD_SIZE * BOARD_SIZE - 2
+
+def own_cells(colour):
+    return [(x, y) for x in range(BOARD_SIZE) for y in range(BOARD_SIZE) if (x // 2 + y) % 2 == colour]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def rss_kib(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def start_server(mode, port):
+    env = dict(os.environ, ASYNC_MODE=mode, PORT=str(port), AI_POOL_WORKERS='1')
+    workdir = tempfile.mkdtemp(prefix=f'xo-load-{mode}-')
+    server = subprocess.Popen([sys.executable, os.path.join(REPO, 'app.py')], cwd=workdir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {server.returncode}")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not come up on port {port}")
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+# ---- Round trip ----
+class Player:
+    def __init__(self, username, colour, rng):
+        import socketio
+
+        self.username = username
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.cells = own_cells(colour)
+        rng.shuffle(self.cells)
+        self.version = 0
+        self.joined = asyncio.Event()
+        self.waiting = None  # (x, y, future) of the move in flight
+        self.sio.on('game_update', self.on_update)
+        self.sio.on('game_delta', self.on_delta)
+
+    async def on_update(self, state):
+        self.version = state['version']
+        self.joined.set()
+
+    async def on_delta(self, delta):
+        self.version = max(self.version, delta['version'])
+        for x, y, _ in delta['cells']:
+            if self.waiting and self.waiting[:2] == (x, y) and not self.waiting[2].done():
+                self.waiting[2].set_result(time.perf_counter())
+
+    async def move(self, room, seq):
+        x, y = self.cells.pop()
+        done = asyncio.get_running_loop().create_future()
+        self.waiting = (x, y, done)
+        started = time.perf_counter()
+        await self.sio.emit('make_move', {'room': room, 'username': self.username, 'x': x, 'y': y,
+                                          'client': self.username, 'seq': seq, 'version': self.version})
+        finished = await asyncio.wait_for(done, 10)
+        self.waiting = None
+        return finished - started
+
+async def play_pair(url, n, moves, samples):
+    room = f'load-{n}'
+    rng = random.Random(n)
+    players = [Player(f'x{n}', 0, rng), Player(f'o{n}', 1, rng)]
+    for player in players:
+        await player.sio.connect(url, transports=['websocket'])
+        await player.sio.emit('join', {'room': room, 'username': player.username, 'board_size': BOARD_SIZE})
+        await asyncio.wait_for(player.joined.wait(), 10)
+    # the second join arrives as a delta for the first player; make sure it is in before X moves
+    await asyncio.sleep(0.2)
+    try:
+        for seq in range(moves):
+            player = players[seq % 2]
+            other = players[1 - seq % 2]
+            player.version = max(player.version, other.version)
+            samples.append(await player.move(room, seq // 2 + 1))
+    finally:
+        for player in players:
+            await player.sio.disconnect()
+
+async def round_trips(url, pairs, moves):
+    samples = []
+    await asyncio.gather(*(play_pair(url, n, moves, samples) for n in range(pairs)))
+    return samples
+
+# ---- Persistence ----
+async def persisted_game(url, timeout=10):
+    """X wins along the top row; raises unless the result reaches the history table"""
+    room = 'load-persist'
+    rng = random.Random(0)
+    players = [Player('persist-x', 0, rng), Player('persist-o', 1, rng)]
+    # moves are popped from the end
+    players[0].cells = [(0, 2), (0, 1), (0, 0)]
+    players[1].cells = [(1, 1), (1, 0)]
+    for player in players:
+        await player.sio.connect(url, transports=['websocket'])
+        await player.sio.emit('join', {'room': room, 'username': player.username, 'board_size': 3})
+        await asyncio.wait_for(player.joined.wait(), 10)
+    await asyncio.sleep(0.2)
+    try:
+        for seq in range(5):
+            player = players[seq % 2]
+            player.version = max(player.version, players[1 - seq % 2].version)
+            await player.move(room, seq // 2 + 1)
+    finally:
+        for player in players:
+            await player.sio.disconnect()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with urllib.request.urlopen(f'{url}/history?username=persist-x', timeout=5) as response:
+            if json.loads(response.read()):
+                return
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"the finished game's history row was not written within {timeout}s")
+
+# ---- Connection ramp ----
+async def ramp(url, pid, max_clients, step, timeout):
+    import socketio
+
+    clients = []
+    baseline = rss_kib(pid)
+    points = []
+    ceiling = None
+    try:
+        while len(clients) < max_clients:
+            batch = [socketio.AsyncClient(reconnection=False) for _ in range(min(step, max_clients - len(clients)))]
+            results = await asyncio.gather(
+                *(asyncio.wait_for(c.connect(url, transports=['websocket']), timeout) for c in batch),
+                return_exceptions=True)
+            connected = [c for c, r in zip(batch, results) if not isinstance(r, BaseException)]
+            clients.extend(connected)
+            if len(connected) < len(batch):
+                ceiling = len(clients)
+                for c in batch:
+                    if c not in connected:
+                        await c.disconnect()
+                break
+            await asyncio.sleep(0.5)
+            points.append((len(clients), rss_kib(pid)))
+    finally:
+        await asyncio.gather(*(c.disconnect() for c in clients), return_exceptions=True)
+    return baseline, points, ceiling
+
+def per_connection_kib(baseline, points):
+    if not points:
+        return 0.0
+    connections, rss = points[-1]
+    return (rss - baseline) / connections
+
+def run_mode(mode, args):
+    port = free_port()
+    server = start_server(mode, port)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        samples = asyncio.run(round_trips(url, args.pairs, args.moves))
+        baseline, points, ceiling = asyncio.run(ramp(url, server.pid, args.max_clients, args.step, args.timeout))
+        asyncio.run(persisted_game(url))
+    finally:
+        stop_server(server)
+    return samples, baseline, points, ceiling
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', default=['threading', 'eventlet', 'gevent'])
+    parser.add_argument('--pairs', type=int, default=20, help='rooms playing concurrently for round trips')
+    parser.add_argument('--moves', type=int, default=60, help=f'moves per room (at most {MAX_MOVES})')
+    parser.add_argument('--max-clients', type=int, default=2000)
+    parser.add_argument('--step', type=int, default=250)
+    parser.add_argument('--timeout', type=float, default=15.0, help='seconds a connect may take')
+    args = parser.parse_args()
+    args.moves = min(args.moves, MAX_MOVES)
+
+    print(f"round trip: {args.pairs} rooms x {args.moves} moves; ramp: up to {args.max_clients} "
+          f"clients in steps of {args.step}")
+    print(f"{'mode':>10} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'ceiling':>9} {'KiB/conn':>9}  rss by connections")
+    failed = []
+    for mode in args.modes:
+        try:
+            samples, baseline, points, ceiling = run_mode(mode, args)
+        except Exception as e:
+            print(f"{mode:>10} failed: {e}")
+            failed.append(mode)
+            continue
+        p50, p95, p99 = (percentile(samples, p) * 1000 for p in (50, 95, 99))
+        reached = str(ceiling) if ceiling is not None else f'>={points[-1][0] if points else 0}'
+        curve = ' '.join(f'{n}:{rss // 1024}M' for n, rss in points)
+        print(f"{mode:>10} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f} {reached:>9} "
+              f"{per_connection_kib(baseline, points):>9.1f}  {curve}")
+    if failed:
+        sys.exit(f"failed: {', '.join(failed)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Soak test for the idle-room reaper: memory stays flat over many room lifetimes.
+
+Every cycle opens a batch of rooms through the real Socket.IO handlers,
+plays a few moves and then walks away from them the ways real players do:
+both sockets drop, one player leaves and the other drops, or the sockets
+stay attached but go quiet. A reaper sweep with the clock moved past the
+grace period, the idle timeout and the session max age should then evict
+every abandoned room and purge the saved sessions. Without the reaper,
+the games registry and user_sessions would grow by a batch per cycle.
+
+Run from the repo root:  python benchmarks/soak_rooms.py [cycles] [rooms per cycle]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+def rss_kib():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return 0
+
+def close(A, client):
+    """Disconnect and drop the transport, as engine.io does when a real socket closes"""
+    from flask_socketio.test_client import SocketIOTestClient
+
+    client.disconnect()
+    A.socketio.server.environ.pop(client.eio_sid, None)
+    SocketIOTestClient.clients.pop(client.eio_sid, None)
+
+def cycle(A, n, rooms):
+    quiet = []
+    for i in range(rooms):
+        room = f'soak-{n}-{i}'
+        a = A.socketio.test_client(A.app)
+        b = A.socketio.test_client(A.app)
+        a.emit('join', {'room': room, 'username': f'a{n}-{i}', 'board_size': 5})
+        b.emit('join', {'room': room, 'username': f'b{n}-{i}', 'board_size': 5})
+        for seq, (client, name, x, y) in enumerate(((a, 'a', 0, 0), (b, 'b', 1, 1), (a, 'a', 2, 2)), 1):
+            client.emit('make_move', {'room': room, 'username': f'{name}{n}-{i}', 'x': x, 'y': y,
+                                      'client': name, 'seq': seq})
+        a.get_received()
+        b.get_received()
+        kind = i % 4
+        if kind < 2:
+            # both sockets drop mid-game
+            close(A, a)
+            close(A, b)
+        elif kind == 2:
+            # one player leaves properly, the other drops
+            a.emit('leave_room', {'room': room, 'username': f'a{n}-{i}'})
+            close(A, a)
+            close(A, b)
+        else:
+            # still connected but nobody plays any more
+            quiet.append((a, b))
+    return quiet
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rooms = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    # the app writes its database and logs to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='xo-soak-'))
+    # sweeps fast-forward the clock; let cached sessions expire on a matching scale
+    os.environ.setdefault('SESSION_CACHE_TTL', '0.5')
+    import app as A
+
+    # the clock each sweep pretends it is: past every timeout
+    ahead = max(A.ROOM_GRACE_SECONDS, A.ROOM_IDLE_SECONDS, A.SESSION_MAX_AGE_HOURS * 3600) + 1
+
+    tracemalloc.start()
+    print(f"{rooms} rooms per cycle; sweeps run {ahead / 3600:.1f} h ahead of the clock")
+    print(f"{'cycle':>5} {'rooms before':>12} {'evicted':>8} {'rooms after':>11} {'sessions':>9} "
+          f"{'sids':>5} {'traced KiB':>10} {'rss KiB':>9}")
+    samples = []
+    for n in range(cycles):
+        quiet = cycle(A, n, rooms)
+        before = len(A.games)
+        A.session_cache.flush()
+        A.db.flush()
+        evicted = A.reaper.sweep(now=time.time() + ahead)
+        for a, b in quiet:
+            close(A, a)
+            close(A, b)
+        sessions = A.db.query_one("SELECT COUNT(*) FROM user_sessions")[0]
+        traced = tracemalloc.get_traced_memory()[0] // 1024
+        samples.append(traced)
+        print(f"{n:>5} {before:>12} {len(evicted):>8} {len(A.games):>11} {sessions:>9} "
+              f"{len(A.sid_rooms):>5} {traced:>10} {rss_kib():>9}")
+
+    settled = samples[len(samples) // 4:]
+    print(f"traced memory after warm-up: min {min(settled)} KiB, max {max(settled)} KiB; "
+          f"reaper stats {A.reaper.stats()}")
+    A.session_cache.close()
+    A.db.close()
+
+if __name__ == '__main__':
+    main()
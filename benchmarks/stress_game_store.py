@@ -0,0 +1,90 @@
+"""Concurrent room updates against the game stores: no lost or doubled moves.
+
+Several threads play into the same few rooms at once. Each update places
+a stone on a free cell, bumps the room version and registers an effect;
+afterwards every room must hold exactly the stones placed, its version
+must equal its move count, and every effect must have run exactly once,
+even though the Redis store retries transactions that hit a conflict.
+
+Uses fakeredis when it is installed, otherwise the server at REDIS_URL.
+
+Run from the repo root:  python benchmarks/stress_game_store.py [threads] [moves]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import Board
+from game_store import MemoryGameStore, RedisGameStore
+
+ROOMS = 4
+SIZE = 30
+
+def redis_client():
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis(), 'fakeredis'
+    except ImportError:
+        import redis
+        url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+        return redis.Redis.from_url(url), url
+
+def stress(store, threads, moves):
+    effects = {f'R{i}': 0 for i in range(ROOMS)}
+    effects_lock = threading.Lock()
+
+    def effect(room):
+        with effects_lock:
+            effects[room] += 1
+
+    def place(txn):
+        if txn.game is None:
+            txn.create({'board': Board(SIZE), 'version': 0})
+        board = txn.game['board']
+        free = ~(board.x_bits | board.o_bits)
+        # lowest free playable cell
+        for idx in range(SIZE * board.stride):
+            if idx % board.stride != SIZE and free >> idx & 1:
+                break
+        board.place(idx // board.stride, idx % board.stride, 'X' if txn.game['version'] % 2 == 0 else 'O')
+        txn.game['version'] += 1
+        txn.after(effect, txn.room)
+
+    def worker(n):
+        for i in range(moves):
+            store.update(f'R{(n + i) % ROOMS}', place)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    total = threads * moves
+    ok = True
+    for room, applied in effects.items():
+        game = store.get(room)
+        stones = SIZE * SIZE - game['board'].empty_cells
+        if not (game['version'] == stones == applied):
+            ok = False
+            print(f"  {room}: version {game['version']}, stones {stones}, effects {applied}")
+    return total, elapsed, ok
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    client, where = redis_client()
+    client.flushdb()
+    for name, store in (('memory', MemoryGameStore()), (f'redis ({where})', RedisGameStore(client))):
+        total, elapsed, ok = stress(store, threads, moves)
+        extra = f", {store.conflicts} conflicts retried" if hasattr(store, 'conflicts') else ''
+        print(f"{name}: {total} moves by {threads} threads into {ROOMS} rooms in {elapsed:.2f}s "
+              f"({total / elapsed:.0f}/s){extra} -> {'OK' if ok else 'MISMATCH'}")
+
+if __name__ == '__main__':
+    main()
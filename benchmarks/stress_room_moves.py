@@ -0,0 +1,160 @@
+"""Thousands of concurrent moves across rooms, through the real make_move handler.
+
+Every room gets two players, each firing moves from its own thread as fast
+as it can: mostly fresh moves on random cells, plus resends of an earlier
+sequence number (double-clicks) and moves tagged with an outdated version.
+Afterwards, for every room:
+
+- each client saw a gap-free run of delta versions
+- replaying those deltas reproduces the server's board exactly
+- X and O stone counts never drifted apart
+- every resend was answered with move_rejected 'duplicate'
+
+Throughput is measured for growing room counts with a single global lock
+(stripes=1) and with per-room locks. Effects such as emits run under the
+room lock, so --emit-latency-ms models the socket write time that a
+global lock would make every room wait on.
+
+Run from the repo root:
+    python benchmarks/stress_room_moves.py [--moves 400] [--emit-latency-ms 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+BOARD_SIZE = 10
+DUPLICATE_EVERY = 7
+STALE_EVERY = 11
+
+def run(A, rooms, moves_per_player, stripes, emit_latency):
+    from game_store import MemoryGameStore
+
+    A.games = MemoryGameStore(stripes)
+    players = []
+    for n in range(rooms):
+        room = f'S{stripes}-{rooms}-{n}'
+        for name in ('px', 'po'):
+            client = A.socketio.test_client(A.app)
+            client.emit('join', {'room': room, 'username': f'{name}{n}', 'board_size': BOARD_SIZE})
+            players.append((room, f'{name}{n}', client))
+    for _, _, client in players:
+        client.get_received()
+
+    resends = {}
+
+    def play(room, username, client):
+        rng = random.Random(username)
+        sent = dups = 0
+        for seq in range(1, moves_per_player + 1):
+            game = A.games.get(room)
+            move = {'room': room, 'username': username, 'client': username,
+                    'x': rng.randrange(BOARD_SIZE), 'y': rng.randrange(BOARD_SIZE),
+                    'seq': seq, 'version': game['version']}
+            if seq % STALE_EVERY == 0:
+                move['version'] = max(0, game['version'] - 3)
+            client.emit('make_move', move)
+            sent += 1
+            if seq % DUPLICATE_EVERY == 0:
+                client.emit('make_move', dict(move, x=(move['x'] + 1) % BOARD_SIZE))
+                sent += 1
+                dups += 1
+        resends[username] = dups
+        return sent
+
+    sent_total = []
+    lock = threading.Lock()
+
+    def worker(args):
+        sent = play(*args)
+        with lock:
+            sent_total.append(sent)
+
+    original_emit = A.socketio.emit
+    if emit_latency:
+        def slow_emit(*args, **kwargs):
+            time.sleep(emit_latency)
+            return original_emit(*args, **kwargs)
+        A.socketio.emit = slow_emit
+
+    threads = [threading.Thread(target=worker, args=(p,)) for p in players]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if emit_latency:
+        del A.socketio.emit
+
+    problems = check(A, players, resends)
+    for _, _, client in players:
+        client.disconnect()
+    return sum(sent_total), elapsed, problems
+
+def check(A, players, resends):
+    from board import Board
+
+    problems = []
+    for room, username, client in players:
+        game = A.games.get(room)
+        packets = client.get_received()
+        board = Board(BOARD_SIZE)
+        version = None
+        duplicates = 0
+        for packet in packets:
+            name, args = packet['name'], packet['args'][0] if packet['args'] else None
+            if name == 'move_rejected' and args['reason'] == 'duplicate':
+                duplicates += 1
+            if name != 'game_delta':
+                continue
+            if version is not None and args['version'] != version + 1:
+                problems.append(f"{username}: version {version} -> {args['version']}")
+            version = args['version']
+            if args.get('reset'):
+                board.reset()
+            for x, y, value in args['cells']:
+                if value is None:
+                    board.remove(x, y)
+                else:
+                    board.place(x, y, value)
+        if version is not None and version != game['version']:
+            problems.append(f"{username}: last delta {version}, room at {game['version']}")
+        if board != game['board']:
+            problems.append(f"{username}: replayed board differs from the server's")
+        drift = game['board'].x_bits.bit_count() - game['board'].o_bits.bit_count()
+        if drift not in (0, 1):
+            problems.append(f"{room}: X/O counts drifted by {drift}")
+        if duplicates != resends[username]:
+            problems.append(f"{username}: {resends[username]} resends, {duplicates} rejected as duplicate")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moves', type=int, default=400, help='moves fired per player')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--emit-latency-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    # the app writes its database and logs to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='xo-stress-'))
+    import app as A
+
+    print(f"{args.moves} moves per player (+ resends), {BOARD_SIZE}x{BOARD_SIZE} boards, "
+          f"emit latency {args.emit_latency_ms} ms")
+    print(f"{'rooms':>6} {'locks':>9} {'events':>8} {'secs':>7} {'events/s':>9}  result")
+    for rooms in args.rooms:
+        for stripes, label in ((1, 'global'), (1024, 'per-room')):
+            sent, elapsed, problems = run(A, rooms, args.moves, stripes, args.emit_latency_ms / 1000)
+            result = 'consistent' if not problems else f'{len(problems)} problems: {problems[:3]}'
+            print(f"{rooms:>6} {label:>9} {sent:>8} {elapsed:>7.2f} {sent / elapsed:>9.0f}  {result}")
+    A.db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Compact bitboard representation of a game board.
+
+Each symbol is stored as one Python int with a bit per cell. Rows are laid
+out with a stride of size + 1 so the spare column stays zero and horizontal
+and diagonal shifts never wrap from one row into the next.
+
+A board can also keep line counters (track_lines, see lines.py): every
+place and remove then updates the counts of the lines through the cell,
+and winning_line and threats read those instead of scanning windows.
+Counters are not serialised; a board rebuilt from its bits has none.
+"""
+from functools import lru_cache
+
+from game_logic import get_win_len
+# LINE_STEPS: (row, col) steps matching the bit shifts returned by Board._shifts
+from lines import LINE_STEPS, MAX_INDEXES, LineCounts, line_index
+
+def _runs(bits, shift, win_len):
+    """Bits that start a run of win_len set bits along shift"""
+    run = bits
+    length = 1
+    # double the covered run length each step, then top up the remainder
+    while length * 2 <= win_len:
+        run &= run >> (shift * length)
+        length *= 2
+    if length < win_len:
+        run &= run >> (shift * (win_len - length))
+    return run
+
+# per size, like the shared line index: only the most recently used sizes are kept
+@lru_cache(maxsize=MAX_INDEXES)
+def _line_windows(size, win_len):
+    """Per-direction (dr, dc, reach, window mask, run shifts) for one board size.
+
+    window has a bit every shift places for 2 * win_len - 1 cells, i.e. the
+    cells of one line that could share a winning run with the centre cell
+    once the board is shifted so that the first of them sits at bit 0.
+    run shifts are the doubling steps _runs would take for this line.
+    """
+    stride = size + 1
+    windows = []
+    for (dr, dc), shift in zip(LINE_STEPS, (1, stride, stride + 1, stride - 1)):
+        cells = 2 * win_len - 1
+        window = ((1 << (shift * cells)) - 1) // ((1 << shift) - 1)
+        run_shifts = []
+        length = 1
+        while length * 2 <= win_len:
+            run_shifts.append(shift * length)
+            length *= 2
+        if length < win_len:
+            run_shifts.append(shift * (win_len - length))
+        windows.append((dr, dc, shift * (win_len - 1), window, tuple(run_shifts)))
+    return tuple(windows)
+
+@lru_cache(maxsize=65536)
+def _row(n, x_row, o_row):
+    """One board row as a tuple; rows repeat heavily so they are memoised"""
+    row = [None] * n
+    occupied = x_row | o_row
+    while occupied:
+        low = occupied & -occupied
+        row[low.bit_length() - 1] = 'X' if x_row & low else 'O'
+        occupied ^= low
+    return tuple(row)
+
+class Board:
+    __slots__ = ('size', 'stride', 'x_bits', 'o_bits', 'empty_cells', 'lines')
+
+    def __init__(self, size):
+        self.size = size
+        self.stride = size + 1
+        self.x_bits = 0
+        self.o_bits = 0
+        self.empty_cells = size * size
+        self.lines = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a Board from the list-of-lists JSON shape"""
+        board = cls(len(rows))
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                if cell is not None:
+                    board.place(r, c, cell)
+        return board
+
+    @classmethod
+    def from_bits(cls, size, x_bits, o_bits):
+        """Rebuild a Board from its raw bitboards (e.g. in another process)"""
+        board = cls(size)
+        board.x_bits = x_bits
+        board.o_bits = o_bits
+        board.empty_cells = size * size - (x_bits | o_bits).bit_count()
+        return board
+
+    def _bit(self, r, c):
+        return 1 << (r * self.stride + c)
+
+    def bits_for(self, symbol):
+        return self.x_bits if symbol == 'X' else self.o_bits
+
+    def get(self, r, c):
+        bit = self._bit(r, c)
+        if self.x_bits & bit:
+            return 'X'
+        if self.o_bits & bit:
+            return 'O'
+        return None
+
+    def is_empty(self, r, c):
+        return not ((self.x_bits | self.o_bits) & self._bit(r, c))
+
+    def place(self, r, c, symbol):
+        bit = self._bit(r, c)
+        if symbol == 'X':
+            self.x_bits |= bit
+        else:
+            self.o_bits |= bit
+        self.empty_cells -= 1
+        if self.lines is not None:
+            self.lines.place(r * self.size + c, 0 if symbol == 'X' else 1)
+
+    def remove(self, r, c):
+        """Clear a cell, returning the symbol that was there (or None)"""
+        bit = self._bit(r, c)
+        if self.x_bits & bit:
+            self.x_bits &= ~bit
+            symbol = 'X'
+        elif self.o_bits & bit:
+            self.o_bits &= ~bit
+            symbol = 'O'
+        else:
+            return None
+        self.empty_cells += 1
+        if self.lines is not None:
+            self.lines.remove(r * self.size + c, 0 if symbol == 'X' else 1)
+        return symbol
+
+    def reset(self):
+        self.x_bits = 0
+        self.o_bits = 0
+        self.empty_cells = self.size * self.size
+        if self.lines is not None:
+            self.lines = LineCounts(self.lines.index)
+
+    def track_lines(self, win_len=None):
+        """Keep line counters for this board from now on (built from the current position)"""
+        if win_len is None:
+            win_len = get_win_len(self.size)
+        index = line_index(self.size, min(win_len, self.size))
+        self.lines = LineCounts.from_bits(index, self.x_bits, self.o_bits)
+        return self.lines
+
+    def is_full(self):
+        return self.empty_cells == 0
+
+    def _shifts(self):
+        # bit offsets for horizontal, vertical, down-right and down-left lines
+        return (1, self.stride, self.stride + 1, self.stride - 1)
+
+    def has_win(self, symbol, win_len=None):
+        """Shift-and-mask scan of the whole board for win_len in a row"""
+        if win_len is None:
+            win_len = get_win_len(self.size)
+        win_len = min(win_len, self.size)
+        bits = self.bits_for(symbol)
+        for shift in self._shifts():
+            if _runs(bits, shift, win_len):
+                return True
+        return False
+
+    def winning_line(self, x, y, win_len=None):
+        """Return the winning run through (x, y) as [row, col] pairs, or None.
+
+        With line counters this is a counter check: nothing to look at
+        unless the side has a completed line. Otherwise only the window of
+        2 * win_len - 1 cells centred on the move along each line is
+        examined: it is shifted down to bit 0, masked, and tested for a
+        run with shift-and-mask. Cell coordinates are only walked out once
+        a win is confirmed.
+        """
+        n = self.size
+        if win_len is None:
+            win_len = get_win_len(n)
+        win_len = min(win_len, n)
+
+        idx = x * self.stride + y
+        bit = 1 << idx
+        if self.x_bits & bit:
+            bits, side = self.x_bits, 0
+        elif self.o_bits & bit:
+            bits, side = self.o_bits, 1
+        else:
+            return None
+
+        tracked = self.lines
+        if tracked is not None and tracked.index.win_len == win_len:
+            line = tracked.completed_line(x * n + y, side)
+            return None if line is None else self._walk_line(bits, x, y, *tracked.index.steps[line])
+
+        for dr, dc, reach, window, run_shifts in _line_windows(n, win_len):
+            lo = idx - reach
+            run = (bits >> lo if lo >= 0 else bits << -lo) & window
+            for amount in run_shifts:
+                run &= run >> amount
+            if run:
+                return self._walk_line(bits, x, y, dr, dc)
+        return None
+
+    def _walk_line(self, bits, x, y, dr, dc):
+        n = self.size
+        stride = self.stride
+        line = [[x, y]]
+        r, c = x - dr, y - dc
+        while 0 <= r < n and 0 <= c < n and (bits >> (r * stride + c)) & 1:
+            line.insert(0, [r, c])
+            r -= dr
+            c -= dc
+        r, c = x + dr, y + dc
+        while 0 <= r < n and 0 <= c < n and (bits >> (r * stride + c)) & 1:
+            line.append([r, c])
+            r += dr
+            c += dc
+        return line
+
+    def threats(self, symbol, win_len=None):
+        """Empty cells where symbol would complete a line, as sorted (row, col) pairs"""
+        n = self.size
+        if win_len is None:
+            win_len = get_win_len(n)
+        win_len = min(win_len, n)
+        side = 0 if symbol == 'X' else 1
+        occupied = self.x_bits | self.o_bits
+        tracked = self.lines
+        if tracked is not None and tracked.index.win_len == win_len:
+            bits = tracked.threat_bits(side, occupied)
+        else:
+            # no counters: test every line's mask against the position
+            mine, theirs = (self.x_bits, self.o_bits) if side == 0 else (self.o_bits, self.x_bits)
+            bits = 0
+            for mask in line_index(n, win_len).masks:
+                if not mask & theirs and (mask & mine).bit_count() == win_len - 1:
+                    bits |= mask & ~occupied
+        cells = []
+        while bits:
+            low = bits & -bits
+            cells.append(divmod(low.bit_length() - 1, self.stride))
+            bits ^= low
+        return cells
+
+    def to_rows(self):
+        """Convert to the rows of None/'X'/'O' the client renders (tuples encode as JSON arrays)"""
+        n = self.size
+        stride = self.stride
+        row_mask = (1 << n) - 1
+        x_bits = self.x_bits
+        o_bits = self.o_bits
+        return [
+            _row(n, (x_bits >> base) & row_mask, (o_bits >> base) & row_mask)
+            for base in range(0, n * stride, stride)
+        ]
+
+    def copy(self):
+        other = Board.__new__(Board)
+        other.size = self.size
+        other.stride = self.stride
+        other.x_bits = self.x_bits
+        other.o_bits = self.o_bits
+        other.empty_cells = self.empty_cells
+        other.lines = None if self.lines is None else self.lines.copy()
+        return other
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and self.size == other.size
+                and self.x_bits == other.x_bits and self.o_bits == other.o_bits)
+
+    def __repr__(self):
+        return f"Board(size={self.size}, x_bits={self.x_bits:#x}, o_bits={self.o_bits:#x})"
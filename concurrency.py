@@ -0,0 +1,170 @@
+"""Serving mode: OS threads or cooperative green threads, chosen by ASYNC_MODE.
+
+- threading (default): one OS thread per connection, Werkzeug dev server
+- eventlet / gevent: every connection is a green thread on one event loop
+
+The green modes monkey patch sockets, select and sleep but not threads,
+so the database writer, the session flusher, the log listener and the AI
+pool's result thread stay real OS threads. The queue module and
+threading.Event are left unpatched too: those threads block on them, and
+a green queue or event waited on from a real thread has no loop to wake
+it (gevent raises LoopExit and the thread dies). Code on the event loop
+must therefore never wait on those threads directly:
+
+- run_blocking(fn, ...) runs a blocking call (SQLite, file writes, a
+  CPU-bound search) on a worker thread while the loop keeps serving;
+- to_loop(fn, ...) hands work from a real thread (e.g. a finished AI
+  search) to a green thread on the loop;
+- lock() / rlock() make locks that a green thread may hold across a
+  run_blocking call without stalling the other green threads.
+
+In threading mode all of these are plain calls and threading locks.
+serve() runs the green WSGI server for the app in eventlet/gevent mode;
+both it and nodelay_request_handler() (threading mode) turn off Nagle.
+"""
+import collections
+import os
+import socket
+import threading
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'threading')
+
+_patched = False
+_loop_thread = None
+_inbox = collections.deque()
+_wakeup = None  # (read fd, write fd) of the to_loop pipe, opened on first use
+_wakeup_lock = threading.Lock()
+
+def monkey_patch():
+    """Patch the standard library for ASYNC_MODE; call before anything else is imported"""
+    global _patched, _loop_thread
+    if ASYNC_MODE not in ASYNC_MODES:
+        raise ValueError(f"ASYNC_MODE must be one of {', '.join(ASYNC_MODES)}, not {ASYNC_MODE!r}")
+    if _patched:
+        return
+    _patched = True
+    _loop_thread = threading.get_ident()
+    if ASYNC_MODE == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch(thread=False)
+    elif ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        # patch_all patches queue and threading.Event unless told not to, even with thread=False
+        monkey.patch_all(thread=False, queue=False, Event=False)
+
+def green():
+    return ASYNC_MODE != 'threading'
+
+def _on_loop():
+    return not green() or threading.get_ident() == _loop_thread
+
+def original(module, name):
+    """module.name as the standard library defines it, before any monkey patching"""
+    if ASYNC_MODE == 'eventlet':
+        import eventlet.patcher
+        return getattr(eventlet.patcher.original(module), name)
+    if ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    import importlib
+    return getattr(importlib.import_module(module), name)
+
+# ---- Locks ----
+def lock():
+    if ASYNC_MODE == 'eventlet':
+        from eventlet.green import threading as green_threading
+        return green_threading.Lock()
+    if ASYNC_MODE == 'gevent':
+        from gevent.lock import BoundedSemaphore
+        return BoundedSemaphore()
+    return threading.Lock()
+
+def rlock():
+    if ASYNC_MODE == 'eventlet':
+        from eventlet.green import threading as green_threading
+        return green_threading.RLock()
+    if ASYNC_MODE == 'gevent':
+        from gevent.lock import RLock
+        return RLock()
+    return threading.RLock()
+
+# ---- Blocking calls ----
+def run_blocking(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on a worker thread, yielding to the loop until it returns"""
+    if not green() or not _on_loop():
+        return fn(*args, **kwargs)
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    import gevent
+    return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+
+# ---- Handing work to the loop ----
+def to_loop(fn, *args):
+    """Run fn(*args) on the event loop; safe to call from any OS thread"""
+    if _on_loop():
+        fn(*args)
+        return
+    _inbox.append((fn, args))
+    os.write(_wakeup_pipe()[1], b'.')
+
+def _wakeup_pipe():
+    global _wakeup
+    if _wakeup is None:
+        with _wakeup_lock:
+            if _wakeup is None:
+                read_fd, write_fd = os.pipe()
+                os.set_blocking(read_fd, False)
+                _wakeup = (read_fd, write_fd)
+    return _wakeup
+
+def start_loop_inbox(spawn):
+    """Start the green thread that runs to_loop() work (spawn: socketio.start_background_task)"""
+    if green():
+        _wakeup_pipe()
+        spawn(_drain_inbox, spawn)
+
+def _drain_inbox(spawn):
+    if ASYNC_MODE == 'eventlet':
+        from eventlet.hubs import trampoline as wait
+        wait_readable = lambda fd: wait(fd, read=True)
+    else:
+        from gevent.socket import wait_read as wait_readable
+    read_fd = _wakeup[0]
+    while True:
+        wait_readable(read_fd)
+        # one read is enough: leftover wakeup bytes only cause an extra pass
+        os.read(read_fd, 65536)
+        while _inbox:
+            fn, args = _inbox.popleft()
+            # each job gets its own green thread, so one slow job never holds up the rest
+            spawn(fn, *args)
+
+# ---- Serving ----
+def serve(app, host, port, log_output=False):
+    """Serve app with the eventlet or gevent WSGI server until interrupted"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # inherited by every accepted socket: a small Socket.IO frame goes out at once
+    # instead of waiting up to 40 ms for the ACK of the previous one (Nagle)
+    listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+    if ASYNC_MODE == 'eventlet':
+        import eventlet.wsgi
+        eventlet.wsgi.server(listener, app, log_output=log_output)
+    elif ASYNC_MODE == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(listener, app, log='default' if log_output else None).serve_forever()
+    else:
+        raise RuntimeError("serve() is for the eventlet and gevent modes; use socketio.run for threading")
+
+def nodelay_request_handler():
+    """Werkzeug request handler class with Nagle disabled, for threading mode"""
+    from werkzeug.serving import WSGIRequestHandler
+
+    class NoDelayRequestHandler(WSGIRequestHandler):
+        disable_nagle_algorithm = True
+
+    return NoDelayRequestHandler
@@ -0,0 +1,127 @@
+"""Game rules shared by the Socket.IO handlers and headless tools."""
+
+# The four line directions through a cell: horizontal, vertical and both diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+# Board sizes the server plays: the page offers 3 to 5, tools and benchmarks go up to 15.
+# Per-size state (the win-line index, AI tables) grows fast with the size, so a size
+# a client sends is checked against these before anything is built for it.
+MIN_BOARD_SIZE = 3
+MAX_BOARD_SIZE = 15
+
+def parse_board_size(value):
+    """A client-supplied board size as an int; ValueError unless it is in the supported range"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = None
+    if size is None or not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+        raise ValueError(f"board_size must be a whole number from {MIN_BOARD_SIZE} to {MAX_BOARD_SIZE}")
+    return size
+
+def new_empty_board(n):
+    return [[None for _ in range(n)] for _ in range(n)]
+
+def get_win_len(size):
+    if size <= 4:
+        return 3
+    if size == 5:
+        return 4
+    return 5
+
+def is_board_full(board):
+    return all(cell is not None for row in board for cell in row)
+
+def count_empty(board):
+    return sum(1 for row in board for cell in row if cell is None)
+
+def check_winner(board, symbol, win_len=None):
+    n = len(board)
+    if win_len is None:
+        win_len = get_win_len(n)
+    if win_len > n:
+        win_len = n
+
+    # horizontal
+    for r in range(n):
+        for c in range(0, n - win_len + 1):
+            ok = True
+            for k in range(win_len):
+                if board[r][c + k] != symbol:
+                    ok = False
+                    break
+            if ok:
+                return True
+
+    # vertical
+    for c in range(n):
+        for r in range(0, n - win_len + 1):
+            ok = True
+            for k in range(win_len):
+                if board[r + k][c] != symbol:
+                    ok = False
+                    break
+            if ok:
+                return True
+
+    # diagonal down-right
+    for r in range(0, n - win_len + 1):
+        for c in range(0, n - win_len + 1):
+            ok = True
+            for k in range(win_len):
+                if board[r + k][c + k] != symbol:
+                    ok = False
+                    break
+            if ok:
+                return True
+
+    # diagonal up-right
+    for r in range(win_len - 1, n):
+        for c in range(0, n - win_len + 1):
+            ok = True
+            for k in range(win_len):
+                if board[r - k][c + k] != symbol:
+                    ok = False
+                    break
+            if ok:
+                return True
+
+    return False
+
+def find_winning_line(board, x, y, win_len=None):
+    """Return the winning line through the cell just played at (x, y).
+
+    Only the four lines through (x, y) are walked, at most win_len - 1 cells
+    each way, so a move costs O(win_len) instead of a full board scan.
+    Returns the run of [row, col] pairs (at least win_len long) or None.
+    """
+    n = len(board)
+    if win_len is None:
+        win_len = get_win_len(n)
+    if win_len > n:
+        win_len = n
+
+    symbol = board[x][y]
+    if symbol is None:
+        return None
+
+    for dr, dc in DIRECTIONS:
+        before = []
+        r, c = x - dr, y - dc
+        while len(before) < win_len - 1 and 0 <= r < n and 0 <= c < n and board[r][c] == symbol:
+            before.append([r, c])
+            r -= dr
+            c -= dc
+
+        after = []
+        r, c = x + dr, y + dc
+        while len(after) < win_len - 1 and 0 <= r < n and 0 <= c < n and board[r][c] == symbol:
+            after.append([r, c])
+            r += dr
+            c += dc
+
+        if len(before) + 1 + len(after) >= win_len:
+            before.reverse()
+            return before + [[x, y]] + after
+
+    return None
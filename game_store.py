@@ -0,0 +1,256 @@
+"""Pluggable storage for live game rooms.
+
+Handlers never touch a room dict directly; they run a function inside
+store.update(room, fn). The function gets a RoomTransaction whose .game is
+the room (None if it does not exist yet), may mutate, replace or delete
+it, and registers side effects (Socket.IO emits, database writes, AI
+searches) with txn.after(). Effects run only once the change is
+committed, so a retried transaction never emits or records twice.
+
+MemoryGameStore keeps rooms in this process (a single worker) and locks
+each room separately. RedisGameStore keeps them in Redis as JSON and
+applies each update with optimistic WATCH/MULTI versioning, retrying on
+conflict, so several workers can serve the same room. Any redis-py compatible client works,
+including fakeredis.FakeRedis() for tests.
+"""
+import json
+import secrets
+import threading
+
+from board import Board
+
+class StoreConflict(Exception):
+    """A room kept changing underneath an update until retries ran out"""
+
+class RoomTransaction:
+    __slots__ = ('room', 'game', 'deleted', '_effects')
+
+    def __init__(self, room, game):
+        self.room = room
+        self.game = game
+        self.deleted = False
+        self._effects = []
+
+    def create(self, game):
+        self.game = game
+        self.deleted = False
+        return game
+
+    def delete(self):
+        self.game = None
+        self.deleted = True
+
+    def after(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once the transaction has committed"""
+        self._effects.append((fn, args, kwargs))
+
+    def run_effects(self):
+        for fn, args, kwargs in self._effects:
+            fn(*args, **kwargs)
+
+# ---- Serialisation ----
+def encode_game(game):
+    """JSON text for a room dict (the Board is stored as its two bitboards)"""
+    state = dict(game)
+    board = game['board']
+    state['board'] = {'size': board.size, 'x': board.x_bits, 'o': board.o_bits}
+    return json.dumps(state, separators=(',', ':'))
+
+def decode_game(raw):
+    state = json.loads(raw)
+    board = state['board']
+    state['board'] = Board.from_bits(board['size'], board['x'], board['o'])
+    return state
+
+# ---- In-process store ----
+class MemoryGameStore:
+    """Rooms in a dict; updates to one room are serialised by that room's lock.
+
+    Locks are striped: a room hashes to one of `stripes` locks, so rooms
+    rarely wait on each other and the lock table never grows with the
+    number of rooms ever created. stripes=1 gives a single global lock.
+    Under an event loop pass a green lock_type (see concurrency.rlock).
+    """
+
+    def __init__(self, stripes=1024, lock_type=threading.RLock):
+        self._games = {}
+        # re-entrant so an effect may start another update of the same room
+        self._locks = tuple(lock_type() for _ in range(stripes))
+
+    def _lock(self, room):
+        return self._locks[hash(room) % len(self._locks)]
+
+    def get(self, room):
+        """The live room dict, read without its lock: for a consistent view use update()"""
+        return self._games.get(room)
+
+    def __contains__(self, room):
+        return room in self._games
+
+    def __len__(self):
+        return len(self._games)
+
+    def rooms(self):
+        return list(self._games)
+
+    def update(self, room, fn):
+        with self._lock(room):
+            txn = RoomTransaction(room, self._games.get(room))
+            result = fn(txn)
+            if txn.deleted:
+                self._games.pop(room, None)
+            elif txn.game is not None:
+                self._games[room] = txn.game
+            # effects run under the lock so a room's emits leave in version order
+            txn.run_effects()
+        return result
+
+    def delete(self, room):
+        with self._lock(room):
+            return self._games.pop(room, None) is not None
+
+    def create_many(self, games):
+        """Store each {room: game} whose room does not exist yet; returns the rooms created"""
+        created = []
+        for room, game in games.items():
+            with self._lock(room):
+                if room not in self._games:
+                    self._games[room] = game
+                    created.append(room)
+        return created
+
+# ---- Redis store ----
+class RedisGameStore:
+    """Rooms as JSON strings in Redis, updated with WATCH/MULTI/EXEC"""
+
+    def __init__(self, client, prefix='xo:game:', ttl=86400, max_retries=50):
+        self.client = client
+        self.prefix = prefix
+        # idle rooms expire on their own if nothing cleans them up
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self.conflicts = 0
+
+    def _key(self, room):
+        return f'{self.prefix}{room}'
+
+    def get(self, room):
+        raw = self.client.get(self._key(room))
+        return decode_game(raw) if raw is not None else None
+
+    def __contains__(self, room):
+        return bool(self.client.exists(self._key(room)))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=f'{self.prefix}*', count=500))
+
+    def rooms(self):
+        start = len(self.prefix)
+        return [key.decode()[start:] if isinstance(key, bytes) else key[start:]
+                for key in self.client.scan_iter(match=f'{self.prefix}*', count=500)]
+
+    def update(self, room, fn):
+        from redis.exceptions import WatchError
+
+        key = self._key(room)
+        for _ in range(self.max_retries):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    txn = RoomTransaction(room, decode_game(raw) if raw is not None else None)
+                    result = fn(txn)
+                    pipe.multi()
+                    if txn.deleted:
+                        pipe.delete(key)
+                    elif txn.game is not None:
+                        encoded = encode_game(txn.game)
+                        if isinstance(raw, bytes):
+                            raw = raw.decode()
+                        # read-only updates write nothing
+                        if encoded != raw:
+                            pipe.set(key, encoded, ex=self.ttl)
+                    pipe.execute()
+                except WatchError:
+                    self.conflicts += 1
+                    continue
+            txn.run_effects()
+            return result
+        raise StoreConflict(f"room {room} changed concurrently {self.max_retries} times")
+
+    def delete(self, room):
+        return bool(self.client.delete(self._key(room)))
+
+    def create_many(self, games):
+        """Store each {room: game} whose room does not exist yet, in one round trip (SET NX each)"""
+        with self.client.pipeline(transaction=False) as pipe:
+            for room, game in games.items():
+                pipe.set(self._key(room), encode_game(game), ex=self.ttl, nx=True)
+            results = pipe.execute()
+        return [room for room, ok in zip(games, results) if ok]
+
+# ---- Room codes ----
+# no 0/O, 1/I/L: codes are read aloud and typed in by a friend
+ROOM_CODE_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+ROOM_CODE_LENGTH = 6
+
+def new_room_code(length=ROOM_CODE_LENGTH):
+    return ''.join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(length))
+
+def claim_new_room(store, game, attempts=10):
+    """Store game under a fresh random room code and return the code.
+
+    The code is claimed inside a store update that only creates the room
+    if it does not exist yet, so two claims (in any worker) can never end
+    up sharing a room; a taken code is simply redrawn.
+    """
+    def claim(txn):
+        if txn.game is not None:
+            return False
+        txn.create(game)
+        return True
+
+    for _ in range(attempts):
+        code = new_room_code()
+        if store.update(code, claim):
+            return code
+    raise StoreConflict(f"no free room code after {attempts} attempts")
+
+def create_game_store(kind='memory', redis_url=None, lock_type=threading.RLock):
+    """Store named by GAME_STORE: 'memory' (default) or 'redis'"""
+    if kind == 'memory':
+        return MemoryGameStore(lock_type=lock_type)
+    if kind == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("GAME_STORE=redis needs the redis package (pip install redis)")
+        return RedisGameStore(redis.Redis.from_url(redis_url or 'redis://localhost:6379/0'))
+    raise ValueError(f"unknown game store {kind!r}")
+
+def claim_new_rooms(store, games, attempts=10):
+    """claim_new_room for a list of games; returns their codes in the same order.
+
+    All rooms are created with one create_many per attempt (a single
+    round trip on Redis) instead of one update each; only codes that
+    turned out to be taken are redrawn.
+    """
+    codes = [None] * len(games)
+    todo = list(range(len(games)))
+    for _ in range(attempts):
+        batch = {}
+        for i in todo:
+            code = new_room_code()
+            while code in batch:
+                code = new_room_code()
+            batch[code] = i
+        created = set(store.create_many({code: games[i] for code, i in batch.items()}))
+        todo = []
+        for code, i in batch.items():
+            if code in created:
+                codes[i] = code
+            else:
+                todo.append(i)
+        if not todo:
+            return codes
+    raise StoreConflict(f"no free room code for {len(todo)} rooms after {attempts} attempts")
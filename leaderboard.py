@@ -0,0 +1,97 @@
+"""Materialised leaderboard kept in memory and updated on every win.
+
+Rows are loaded once from the leaderboard table (through its score index)
+into a list of sort keys kept ordered with bisect, so a user's rank is a
+binary search and a page of the board is a slice. Each win moves one key.
+The top-N page is cached and rebuilt only when a win actually changes it;
+version counters let the REST endpoints answer conditional GETs with 304.
+"""
+import threading
+from bisect import bisect_left, insort
+
+DEFAULT_TOP_N = 100
+
+def _sort_key(username, score, wins):
+    # highest score first, then most wins, then name for a stable order
+    return (-score, -wins, username)
+
+class Leaderboard:
+    def __init__(self, db, top_n=DEFAULT_TOP_N, lock=None):
+        self.db = db
+        self.top_n = top_n
+        # held across the first load's database read, so under an event loop pass a green lock
+        self._lock = lock if lock is not None else threading.Lock()
+        self._loaded = False
+        self._scores = {}  # username -> (score, wins)
+        self._order = []   # sorted _sort_key tuples
+        self._top = None   # cached entries for the first top_n ranks
+        self.version = 0       # bumped on every change
+        self.top_version = 0   # bumped only when the top_n ranks change
+
+    def _load(self):
+        # wins still queued for the writer must be in the table before we read it
+        self.db.flush()
+        rows = self.db.query(
+            "SELECT username, score, wins FROM leaderboard ORDER BY score DESC, wins DESC, username")
+        self._scores = {username: (score or 0, wins or 0) for username, score, wins in rows}
+        self._order = sorted(_sort_key(u, s, w) for u, (s, w) in self._scores.items())
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def record_win(self, username, points, wins=1):
+        """Apply a win; the caller queues the same increment for the database afterwards"""
+        self._ensure_loaded()
+        with self._lock:
+            old = self._scores.get(username)
+            old_rank = None
+            if old is not None:
+                old_key = _sort_key(username, *old)
+                old_rank = bisect_left(self._order, old_key)
+                del self._order[old_rank]
+                score, total_wins = old[0] + points, old[1] + wins
+            else:
+                score, total_wins = points, wins
+            self._scores[username] = (score, total_wins)
+            new_key = _sort_key(username, score, total_wins)
+            insort(self._order, new_key)
+            self.version += 1
+            # the cached top page only changes if the user was or now is in it
+            if (old_rank is not None and old_rank < self.top_n) or bisect_left(self._order, new_key) < self.top_n:
+                self._top = None
+                self.top_version += 1
+
+    def _entry(self, rank, key):
+        score, wins, username = -key[0], -key[1], key[2]
+        return {'rank': rank + 1, 'username': username, 'score': score, 'wins': wins}
+
+    def page(self, offset=0, limit=DEFAULT_TOP_N):
+        """(entries, total, etag version) for ranks offset+1 .. offset+limit"""
+        self._ensure_loaded()
+        with self._lock:
+            end = offset + limit
+            if end <= self.top_n:
+                if self._top is None:
+                    self._top = [self._entry(i, key) for i, key in enumerate(self._order[:self.top_n])]
+                # a new player below the top page changes total but not top_version
+                return self._top[offset:end], len(self._order), f't{self.top_version}-{len(self._order)}'
+            entries = [self._entry(offset + i, key) for i, key in enumerate(self._order[offset:end])]
+            return entries, len(self._order), f'v{self.version}'
+
+    def rank(self, username):
+        """The user's leaderboard entry (with 1-based rank), or None"""
+        self._ensure_loaded()
+        with self._lock:
+            scores = self._scores.get(username)
+            if scores is None:
+                return None
+            key = _sort_key(username, *scores)
+            return self._entry(bisect_left(self._order, key), key)
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._order)
@@ -0,0 +1,194 @@
+"""Win lines precompiled per board size, and per-board counters over them.
+
+A line is one run of win_len cells along a row, column or diagonal: the
+places a win can happen. line_index(size, win_len) lists every line's
+cells, direction and Board bit mask, and for each cell the ids of the
+lines through it. It is built the first time a (size, win_len) pair is
+asked for and then shared by every board of that size in the process.
+Only the MAX_INDEXES most recently used indexes are kept (a 15x15 one
+is about 350 KiB); boards still using an evicted one keep it alive.
+
+LineCounts keeps, for one board, how many stones of each side every line
+holds (one byte per line and side). Placing or removing a stone touches
+only the lines through its cell, at most 4 * win_len, and leaves:
+
+- completed[side]: lines full of that side's stones, so a win check after
+  a move is one comparison unless there is a win to find
+- threats[side]: lines one stone short of completion with no enemy stone
+  in them, so "where does X win next move" is one bit operation per threat
+
+Cells are numbered row * size + col here; masks use Board's bit layout
+(a stride of size + 1).
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+# (row, col) steps along a row, a column, the diagonal and the anti-diagonal
+LINE_STEPS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+MAX_INDEXES = 8
+
+_indexes = OrderedDict()  # (size, win_len) -> LineIndex, least recently used first
+_indexes_lock = threading.Lock()
+
+class LineIndex:
+    __slots__ = ('size', 'win_len', 'cells', 'steps', 'masks', 'through', '_nbytes')
+
+    def __init__(self, size, win_len):
+        stride = size + 1
+        cells = []
+        steps = []
+        masks = []
+        through = [[] for _ in range(size * size)]
+        for dr, dc in LINE_STEPS:
+            for r in range(size):
+                for c in range(size):
+                    if not (0 <= r + dr * (win_len - 1) < size and 0 <= c + dc * (win_len - 1) < size):
+                        continue
+                    line = tuple((r + dr * k, c + dc * k) for k in range(win_len))
+                    mask = 0
+                    for lr, lc in line:
+                        mask |= 1 << (lr * stride + lc)
+                        through[lr * size + lc].append(len(cells))
+                    cells.append(line)
+                    steps.append((dr, dc))
+                    masks.append(mask)
+        self.size = size
+        self.win_len = win_len
+        self.cells = tuple(cells)
+        self.steps = tuple(steps)
+        self.masks = tuple(masks)
+        self.through = tuple(tuple(ids) for ids in through)
+        self._nbytes = None
+
+    def __len__(self):
+        return len(self.cells)
+
+    def nbytes(self):
+        """Memory held by the index (containers and the objects in them, each counted once)"""
+        if self._nbytes is None:
+            # the index never changes, so this is measured once
+            self._nbytes = _deep_size((self.cells, self.steps, self.masks, self.through), set())
+        return self._nbytes
+
+def line_index(size, win_len):
+    """The shared LineIndex for (size, win_len), built on first use"""
+    key = (size, win_len)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+        index = _indexes[key] = LineIndex(size, win_len)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+def index_stats():
+    """The indexes built so far: size, win_len, lines and bytes for each"""
+    with _indexes_lock:
+        indexes = sorted(_indexes.values(), key=lambda index: (index.size, index.win_len))
+    return [{'size': index.size, 'win_len': index.win_len, 'lines': len(index), 'bytes': index.nbytes()}
+            for index in indexes]
+
+class LineCounts:
+    """Stones per line for both sides (0 for X, 1 for O) of one board"""
+    __slots__ = ('index', 'counts', 'threats', 'completed')
+
+    def __init__(self, index):
+        self.index = index
+        self.counts = (bytearray(len(index)), bytearray(len(index)))
+        self.threats = (set(), set())
+        self.completed = [0, 0]
+
+    @classmethod
+    def from_bits(cls, index, x_bits, o_bits):
+        """Counters for an existing position, from Board bitboards"""
+        counts = cls(index)
+        stride = index.size + 1
+        for side, bits in enumerate((x_bits, o_bits)):
+            while bits:
+                low = bits & -bits
+                r, c = divmod(low.bit_length() - 1, stride)
+                counts.place(r * index.size + c, side)
+                bits ^= low
+        return counts
+
+    def place(self, cell, side):
+        win_len = self.index.win_len
+        mine = self.counts[side]
+        theirs = self.counts[1 - side]
+        my_threats = self.threats[side]
+        for line in self.index.through[cell]:
+            count = mine[line] + 1
+            mine[line] = count
+            if theirs[line]:
+                # the first stone in an enemy threat line blocks it
+                if count == 1 and theirs[line] == win_len - 1:
+                    self.threats[1 - side].discard(line)
+            elif count == win_len - 1:
+                my_threats.add(line)
+            elif count == win_len:
+                my_threats.discard(line)
+                self.completed[side] += 1
+
+    def remove(self, cell, side):
+        """Undo place (the clear power-up)"""
+        win_len = self.index.win_len
+        mine = self.counts[side]
+        theirs = self.counts[1 - side]
+        my_threats = self.threats[side]
+        for line in self.index.through[cell]:
+            count = mine[line]
+            mine[line] = count - 1
+            if theirs[line]:
+                # the last stone blocking an enemy line is gone
+                if count == 1 and theirs[line] == win_len - 1:
+                    self.threats[1 - side].add(line)
+            elif count == win_len:
+                self.completed[side] -= 1
+                my_threats.add(line)
+            elif count == win_len - 1:
+                my_threats.discard(line)
+
+    def completed_line(self, cell, side):
+        """Id of a line through cell that side has filled, or None"""
+        if not self.completed[side]:
+            return None
+        mine = self.counts[side]
+        win_len = self.index.win_len
+        for line in self.index.through[cell]:
+            if mine[line] == win_len:
+                return line
+        return None
+
+    def threat_bits(self, side, occupied):
+        """Board bits of the empty cells that complete one of side's lines"""
+        masks = self.index.masks
+        bits = 0
+        for line in self.threats[side]:
+            bits |= masks[line] & ~occupied
+        return bits
+
+    def copy(self):
+        other = LineCounts.__new__(LineCounts)
+        other.index = self.index
+        other.counts = (bytearray(self.counts[0]), bytearray(self.counts[1]))
+        other.threats = (set(self.threats[0]), set(self.threats[1]))
+        other.completed = list(self.completed)
+        return other
+
+    def nbytes(self):
+        """Memory of this board's counters (the shared index not included)"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.counts) + sum(map(sys.getsizeof, self.counts))
+                + sum(map(sys.getsizeof, self.threats)) + sys.getsizeof(self.completed))
+
+def _deep_size(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
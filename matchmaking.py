@@ -0,0 +1,244 @@
+"""Matchmaking queue: pairs waiting players of similar rating, per board size.
+
+Each board size has its own queue of waiting tickets, kept sorted by
+rating in a skip list. A new ticket is compared only with its two
+neighbours in rating order, the closest waiting players above and below
+it. Finding them, inserting a ticket and removing a matched or cancelled
+one are each O(log n) expected, however many players are waiting (a
+sorted Python list would find the spot by bisect but shift every later
+entry on insert and delete).
+
+Two players may be paired when their ratings differ by no more than
+either one's window. A window starts at `window` rating points and widens
+by `growth` points per second of waiting, up to `max_window`, so a player
+with no close opponent gets a wider match instead of waiting forever.
+Since windows widen without anyone enqueuing, tick() re-checks adjacent
+waiting players every so often and pairs those that now fit.
+
+Matching is per process: with several workers, sticky sessions keep a
+player on the worker whose queue holds their ticket.
+"""
+import math
+import random
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_RATING = 1500.0
+
+# players: ((username, data), (username, data)), longest-waiting first;
+# waited: how long that player waited, in seconds
+Match = namedtuple('Match', 'size players waited')
+
+def rating_from_results(wins, losses, draws):
+    """Elo-style rating from a results record (1500 for a new player).
+
+    The expected score against the field, with one win and one loss added
+    so a short record cannot give an extreme rating, is converted to the
+    Elo difference that predicts it.
+    """
+    score = (wins + draws / 2 + 1) / (wins + losses + draws + 2)
+    return DEFAULT_RATING + 400 * math.log10(score / (1 - score))
+
+class _Node:
+    __slots__ = ('key', 'next')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+
+class SortedKeys:
+    """Unique sortable keys in a skip list: O(log n) expected insert, remove and neighbours"""
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._levels = 1
+        self._len = 0
+        self._random = random.Random()
+
+    def _before(self, key):
+        """Per level, the last node whose key is below key (the head if none)"""
+        path = [self._head] * self._levels
+        node = self._head
+        for level in range(self._levels - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                node = following
+                following = node.next[level]
+            path[level] = node
+        return path
+
+    def neighbours(self, key):
+        """(largest key below key, smallest key at or above it); None where there is none"""
+        node = self._before(key)[0]
+        following = node.next[0]
+        return (node.key if node is not self._head else None,
+                following.key if following is not None else None)
+
+    def insert(self, key):
+        path = self._before(key)
+        # each level holds about half the nodes of the one below
+        levels = 1
+        while levels < self.MAX_LEVELS and self._random.getrandbits(1):
+            levels += 1
+        if levels > self._levels:
+            path.extend([self._head] * (levels - self._levels))
+            self._levels = levels
+        node = _Node(key, levels)
+        for level in range(levels):
+            node.next[level] = path[level].next[level]
+            path[level].next[level] = node
+        self._len += 1
+
+    def remove(self, key):
+        path = self._before(key)
+        node = path[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            path[level].next[level] = node.next[level]
+        while self._levels > 1 and self._head.next[self._levels - 1] is None:
+            self._levels -= 1
+        self._len -= 1
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def __len__(self):
+        return self._len
+
+class Ticket:
+    __slots__ = ('username', 'size', 'rating', 'enqueued_at', 'data', 'key')
+
+    def __init__(self, username, size, rating, enqueued_at, data, seq):
+        self.username = username
+        self.size = size
+        self.rating = rating
+        self.enqueued_at = enqueued_at
+        # opaque caller data handed back in the Match (the app uses the socket id)
+        self.data = data
+        # sort key: rating, then arrival order; unique, so the queue finds this ticket exactly
+        self.key = (rating, seq, username)
+
+class Matchmaker:
+    def __init__(self, window=50.0, growth=25.0, max_window=800.0):
+        self.window = window
+        self.growth = growth
+        self.max_window = max_window
+        self._lock = threading.Lock()
+        self._queues = {}   # board size -> sorted ticket keys
+        self._tickets = {}  # username -> Ticket
+        self._by_key = {}   # ticket key -> Ticket
+        self._seq = 0
+        self.matches = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.total_gap = 0.0
+
+    def window_for(self, ticket, now):
+        return min(self.max_window, self.window + self.growth * (now - ticket.enqueued_at))
+
+    def _fits(self, a, b, now):
+        return abs(a.rating - b.rating) <= max(self.window_for(a, now), self.window_for(b, now))
+
+    # ---- queue ----
+    def enqueue(self, username, size, rating, data=None, now=None):
+        """Queue a player; returns a Match if someone suitable is already waiting, else None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            # a player waits in one queue at a time; queueing again replaces the old ticket
+            self._remove(username)
+            self._seq += 1
+            ticket = Ticket(username, size, rating, now, data, self._seq)
+            order = self._queues.get(size)
+            if order is None:
+                order = self._queues[size] = SortedKeys()
+            best = None
+            for key in order.neighbours(ticket.key):
+                if key is not None:
+                    other = self._by_key[key]
+                    if self._fits(ticket, other, now) and (
+                            best is None or abs(other.rating - rating) < abs(best.rating - rating)):
+                        best = other
+            if best is None:
+                order.insert(ticket.key)
+                self._tickets[username] = ticket
+                self._by_key[ticket.key] = ticket
+                return None
+            other = best
+            order.remove(other.key)
+            del self._tickets[other.username]
+            del self._by_key[other.key]
+            return self._pair(other, ticket, now)
+
+    def cancel(self, username, data=None):
+        """Withdraw a waiting player (only the ticket carrying data, when given)"""
+        with self._lock:
+            ticket = self._tickets.get(username)
+            if ticket is None or (data is not None and ticket.data != data):
+                return False
+            self._remove(username)
+            self.cancelled += 1
+            return True
+
+    def _remove(self, username):
+        ticket = self._tickets.pop(username, None)
+        if ticket is None:
+            return
+        del self._by_key[ticket.key]
+        self._queues[ticket.size].remove(ticket.key)
+
+    def _pair(self, first, second, now):
+        waited = now - first.enqueued_at
+        self.matches += 1
+        self.total_wait += waited + (now - second.enqueued_at)
+        self.total_gap += abs(first.rating - second.rating)
+        return Match(first.size, ((first.username, first.data), (second.username, second.data)), waited)
+
+    def tick(self, now=None):
+        """Pair waiting neighbours whose windows have widened enough; returns the new Matches"""
+        now = time.time() if now is None else now
+        matches = []
+        with self._lock:
+            for size, order in self._queues.items():
+                if len(order) < 2:
+                    continue
+                # one pass over the queue in rating order, pairing adjacent tickets that now fit
+                keys = list(order)
+                i = 0
+                while i + 1 < len(keys):
+                    ticket = self._by_key[keys[i]]
+                    other = self._by_key[keys[i + 1]]
+                    if not self._fits(ticket, other, now):
+                        i += 1
+                        continue
+                    first, second = sorted((ticket, other), key=lambda t: t.enqueued_at)
+                    for paired in (ticket, other):
+                        order.remove(paired.key)
+                        del self._tickets[paired.username]
+                        del self._by_key[paired.key]
+                    matches.append(self._pair(first, second, now))
+                    i += 2
+        return matches
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def waiting(self, size):
+        with self._lock:
+            return len(self._queues.get(size, ()))
+
+    def stats(self):
+        with self._lock:
+            waiting = {size: len(order) for size, order in self._queues.items() if order}
+        return {
+            'waiting': waiting,
+            'matches': self.matches,
+            'cancelled': self.cancelled,
+            'mean_wait_s': round(self.total_wait / (2 * self.matches), 3) if self.matches else 0.0,
+            'mean_rating_gap': round(self.total_gap / self.matches, 1) if self.matches else 0.0,
+        }
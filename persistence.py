@@ -0,0 +1,491 @@
+"""SQLite persistence: per-thread WAL connections and a batching writer.
+
+Reads run on a connection owned by the calling thread (opened once, WAL
+journaling, statement cache), so they never pay sqlite3.connect again.
+Writes are queued for a single background thread that coalesces them and
+commits each batch in one transaction: history rows and replay blobs are
+inserted with executemany and the per-user user_stats counters (and
+rated_stats, for games against another person) bumped alongside,
+leaderboard increments for the same user are summed, and only the last
+session upsert/delete per user is applied. Socket.IO handlers
+therefore never wait for a commit or fsync.
+
+The queue is bounded; when it is full a write is applied synchronously on
+the caller's connection instead of being dropped. A batch that fails is
+retried one operation per transaction, so a bad row loses only itself;
+failures go to on_error (or the module logger) and the writer carries on.
+close() (registered with atexit by the app) drains the queue before the
+process exits.
+
+Under an event loop (eventlet/gevent) pass run_blocking: every call that
+can wait on SQLite or on the writer thread (reads, purges, flush, a
+back-pressured write) goes through it instead of stalling the loop.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = (
+    # history: store user's games
+    """
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        opponent TEXT,
+        mode TEXT,
+        result TEXT,
+        board_size INTEGER,
+        date TEXT
+    )""",
+    # a user's games newest first: history reads and keyset pages
+    "CREATE INDEX IF NOT EXISTS idx_history_user ON history (username, id DESC)",
+    # leaderboard
+    """
+    CREATE TABLE IF NOT EXISTS leaderboard (
+        username TEXT PRIMARY KEY,
+        score INTEGER DEFAULT 0,
+        wins INTEGER DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard (score DESC, wins DESC)",
+    # user_sessions: store room codes for recovery
+    """
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        username TEXT PRIMARY KEY,
+        room_code TEXT,
+        board_size INTEGER,
+        mode TEXT,
+        last_activity TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_activity ON user_sessions (last_activity)",
+    # user_stats: per-user results by board size, maintained with each history insert
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        username TEXT,
+        board_size INTEGER,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        draws INTEGER DEFAULT 0,
+        PRIMARY KEY (username, board_size)
+    )""",
+    # rated_stats: the same counters for RATED_MODES games only, which matchmaking rates players by
+    """
+    CREATE TABLE IF NOT EXISTS rated_stats (
+        username TEXT,
+        board_size INTEGER,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        draws INTEGER DEFAULT 0,
+        PRIMARY KEY (username, board_size)
+    )""",
+    # replays: one row per finished game, moves as a varint blob (see replay.py)
+    """
+    CREATE TABLE IF NOT EXISTS replays (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        board_size INTEGER,
+        player_x TEXT,
+        player_o TEXT,
+        winner TEXT,
+        moves INTEGER,
+        date TEXT,
+        log BLOB
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_replays_x ON replays (player_x, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_replays_o ON replays (player_o, id DESC)",
+    # tournaments and their standings, rewritten as each round completes
+    """
+    CREATE TABLE IF NOT EXISTS tournaments (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        format TEXT,
+        board_size INTEGER,
+        players INTEGER,
+        round INTEGER,
+        champion TEXT,
+        created TEXT,
+        updated TEXT
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS tournament_standings (
+        tournament_id TEXT,
+        username TEXT,
+        rank INTEGER,
+        wins INTEGER,
+        losses INTEGER,
+        draws INTEGER,
+        points REAL,
+        PRIMARY KEY (tournament_id, username)
+    )""",
+)
+
+# Statements are module constants so each connection's statement cache
+# prepares them once and reuses them.
+INSERT_HISTORY = """
+    INSERT INTO history (username, opponent, mode, result, board_size, date)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_REPLAY = """
+    INSERT INTO replays (board_size, player_x, player_o, winner, moves, date, log)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_TOURNAMENT = """
+    INSERT OR REPLACE INTO tournaments (id, name, format, board_size, players, round, champion, created, updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_STANDING = """
+    INSERT OR REPLACE INTO tournament_standings (tournament_id, username, rank, wins, losses, draws, points)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_LEADERBOARD = """
+    INSERT INTO leaderboard (username, score, wins)
+    VALUES (?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        score = score + excluded.score,
+        wins = wins + excluded.wins
+"""
+UPSERT_SESSION = """
+    INSERT OR REPLACE INTO user_sessions
+    (username, room_code, board_size, mode, last_activity)
+    VALUES (?, ?, ?, ?, ?)
+"""
+DELETE_SESSION = "DELETE FROM user_sessions WHERE username = ?"
+UPSERT_STATS = """
+    INSERT INTO user_stats (username, board_size, wins, losses, draws)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(username, board_size) DO UPDATE SET
+        wins = wins + excluded.wins,
+        losses = losses + excluded.losses,
+        draws = draws + excluded.draws
+"""
+UPSERT_RATED_STATS = """
+    INSERT INTO rated_stats (username, board_size, wins, losses, draws)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(username, board_size) DO UPDATE SET
+        wins = wins + excluded.wins,
+        losses = losses + excluded.losses,
+        draws = draws + excluded.draws
+"""
+# one-off fill of user_stats from history written before the table existed
+BACKFILL_STATS = """
+    INSERT INTO user_stats (username, board_size, wins, losses, draws)
+    SELECT username, board_size,
+           SUM(result = 'win'), SUM(result = 'loss'), SUM(result = 'draw')
+    FROM history GROUP BY username, board_size
+"""
+# results the server recorded from games played against another person; solo
+# and server-AI results (self-reported or against the house) do not count
+RATED_MODES = ('multiplayer', 'tournament')
+BACKFILL_RATED_STATS = f"""
+    INSERT INTO rated_stats (username, board_size, wins, losses, draws)
+    SELECT username, board_size,
+           SUM(result = 'win'), SUM(result = 'loss'), SUM(result = 'draw')
+    FROM history WHERE mode IN {RATED_MODES!r} GROUP BY username, board_size
+"""
+# history result -> position in the (wins, losses, draws) counters
+STAT_COLUMNS = {'win': 0, 'loss': 1, 'draw': 2}
+
+# writer queue operations
+OP_HISTORY = 'history'
+OP_LEADERBOARD = 'leaderboard'
+OP_SESSION = 'session'
+OP_REPLAY = 'replay'
+OP_TOURNAMENT = 'tournament'
+_STOP = object()
+
+class Database:
+    def __init__(self, path, queue_size=10000, batch_size=500, batch_window=0.02, on_error=None,
+                 run_blocking=None, on_timing=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.on_error = on_error
+        # on_timing(op, seconds) after each read ('query'), purge and committed write batch
+        self.on_timing = on_timing
+        self._run_blocking = run_blocking
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.ops_written = 0
+        self.sync_writes = 0
+        self.failed_ops = 0
+
+    # ---- connections ----
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, cached_statements=64, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits are durable across app crashes, fsync only at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def connection(self):
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def init_schema(self):
+        conn = self.connection()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            if conn.execute("SELECT 1 FROM user_stats LIMIT 1").fetchone() is None:
+                conn.execute(BACKFILL_STATS)
+            if conn.execute("SELECT 1 FROM rated_stats LIMIT 1").fetchone() is None:
+                conn.execute(BACKFILL_RATED_STATS)
+
+    def _blocking(self, fn, *args):
+        if self._run_blocking is None:
+            return fn(*args)
+        return self._run_blocking(fn, *args)
+
+    def query(self, sql, params=()):
+        return self._blocking(self._query, sql, params)
+
+    def _timed(self, op, t0):
+        if self.on_timing is not None:
+            self.on_timing(op, time.perf_counter() - t0)
+
+    def _query(self, sql, params):
+        t0 = time.perf_counter()
+        rows = self.connection().execute(sql, params).fetchall()
+        self._timed('query', t0)
+        return rows
+
+    def query_one(self, sql, params=()):
+        return self._blocking(self._query_one, sql, params)
+
+    def _query_one(self, sql, params):
+        t0 = time.perf_counter()
+        row = self.connection().execute(sql, params).fetchone()
+        self._timed('query', t0)
+        return row
+
+    def purge_sessions(self, before, batch_size=500):
+        """Delete sessions last active before the ISO timestamp, batch_size rows per transaction.
+
+        Runs on the caller's connection in short transactions so the queued
+        writer is never locked out for long. Returns the number of rows removed.
+        """
+        return self._blocking(self._purge_sessions, before, batch_size)
+
+    def _purge_sessions(self, before, batch_size):
+        conn = self.connection()
+        t0 = time.perf_counter()
+        total = 0
+        while True:
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM user_sessions WHERE rowid IN "
+                    "(SELECT rowid FROM user_sessions WHERE last_activity < ? LIMIT ?)",
+                    (before, batch_size)).rowcount
+            total += deleted
+            if deleted < batch_size:
+                self._timed('purge', t0)
+                return total
+
+    # ---- queued writes ----
+    def add_history(self, row):
+        """row: (username, opponent, mode, result, board_size, date)"""
+        self._enqueue((OP_HISTORY, row))
+
+    def add_replay(self, row):
+        """row: (board_size, player_x, player_o, winner, moves, date, log blob)"""
+        self._enqueue((OP_REPLAY, row))
+
+    def add_tournament_round(self, tournament, standings, history=(), scores=(), replays=()):
+        """Everything a finished tournament round writes, as one queued operation.
+
+        One operation is always applied within one batch, so the round's
+        results, standings and leaderboard points commit in one transaction.
+        tournament: (id, name, format, board_size, players, round, champion, created, updated)
+        standings: (tournament_id, username, rank, wins, losses, draws, points) rows
+        history, replays: rows as for add_history/add_replay; scores: (username, points, wins)
+        """
+        self._enqueue((OP_TOURNAMENT, tournament, standings, history, scores, replays))
+
+    def add_score(self, username, points, wins=1):
+        self._enqueue((OP_LEADERBOARD, username, points, wins))
+
+    def save_session(self, username, room_code, board_size, mode, last_activity):
+        self._enqueue((OP_SESSION, username, (username, room_code, board_size, mode, last_activity)))
+
+    def delete_session(self, username):
+        self._enqueue((OP_SESSION, username, None))
+
+    def _enqueue(self, op):
+        if self._closed:
+            self._apply(self.connection(), [op])
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self._blocking(self._put_or_apply, op)
+
+    def _put_or_apply(self, op):
+        try:
+            self._queue.put(op, timeout=0.5)
+        except queue.Full:
+            # back-pressure: write it ourselves rather than lose it
+            self.sync_writes += 1
+            self._apply(self.connection(), [op])
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name='db-writer', daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        conn = self.connection()
+        while True:
+            op = self._queue.get()
+            if op is _STOP:
+                self._queue.task_done()
+                return
+            batch = [op]
+            stop = False
+            # gather whatever else arrives within the batch window
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    op = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stop = True
+                    break
+                batch.append(op)
+            try:
+                self._apply(conn, batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _apply(self, conn, batch):
+        """Commit a batch in one transaction; if that fails, each operation in its own"""
+        try:
+            self._commit(conn, batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self._write_failed(batch[0], e)
+                return
+        for op in batch:
+            try:
+                self._commit(conn, [op])
+            except Exception as e:
+                self._write_failed(op, e)
+
+    def _write_failed(self, op, error):
+        self.failed_ops += 1
+        message = f"Failed to write a {op[0]} operation"
+        if self.on_error is not None:
+            self.on_error("DB_WRITE_ERROR", message, str(error))
+        else:
+            logging.getLogger(__name__).error("%s: %s", message, error)
+
+    def _commit(self, conn, batch):
+        """Coalesce a batch of queued operations and commit it in one transaction (raises on failure)"""
+        history = []
+        replays = []
+        stats = {}
+        rated = {}
+        scores = {}
+        sessions = {}
+        tournaments = {}
+        standings = {}
+
+        def add_history(row):
+            history.append(row)
+            column = STAT_COLUMNS.get(row[3])
+            if column is not None:
+                stats.setdefault((row[0], row[4]), [0, 0, 0])[column] += 1
+                if row[2] in RATED_MODES:
+                    rated.setdefault((row[0], row[4]), [0, 0, 0])[column] += 1
+
+        def add_score(username, points, wins):
+            total, won = scores.get(username, (0, 0))
+            scores[username] = (total + points, won + wins)
+
+        for op in batch:
+            kind = op[0]
+            if kind == OP_HISTORY:
+                add_history(op[1])
+            elif kind == OP_REPLAY:
+                replays.append(op[1])
+            elif kind == OP_LEADERBOARD:
+                add_score(op[1], op[2], op[3])
+            elif kind == OP_TOURNAMENT:
+                _, tournament, rows, round_history, round_scores, round_replays = op
+                # a later round's row and standings replace an earlier one's
+                tournaments[tournament[0]] = tournament
+                for row in rows:
+                    standings[row[0], row[1]] = row
+                for row in round_history:
+                    add_history(row)
+                for username, points, wins in round_scores:
+                    add_score(username, points, wins)
+                replays.extend(round_replays)
+            elif kind == OP_SESSION:
+                # later upserts/deletes for a user replace earlier ones
+                sessions[op[1]] = op[2]
+        t0 = time.perf_counter()
+        with conn:
+            if history:
+                conn.executemany(INSERT_HISTORY, history)
+            if replays:
+                conn.executemany(INSERT_REPLAY, replays)
+            if stats:
+                conn.executemany(UPSERT_STATS, [key + tuple(counts) for key, counts in stats.items()])
+            if rated:
+                conn.executemany(UPSERT_RATED_STATS, [key + tuple(counts) for key, counts in rated.items()])
+            if scores:
+                conn.executemany(UPSERT_LEADERBOARD, [(u, p, w) for u, (p, w) in scores.items()])
+            upserts = [row for row in sessions.values() if row is not None]
+            deletes = [(u,) for u, row in sessions.items() if row is None]
+            if upserts:
+                conn.executemany(UPSERT_SESSION, upserts)
+            if deletes:
+                conn.executemany(DELETE_SESSION, deletes)
+            if tournaments:
+                conn.executemany(UPSERT_TOURNAMENT, list(tournaments.values()))
+            if standings:
+                conn.executemany(UPSERT_STANDING, list(standings.values()))
+        self.batches += 1
+        self.ops_written += len(batch)
+        self._timed('write_batch', t0)
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        if self._writer is not None:
+            self._blocking(self._queue.join)
+
+    def close(self):
+        """Drain the queue and stop the writer (safe to call more than once)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'ops_written': self.ops_written,
+            'sync_writes': self.sync_writes,
+            'failed_ops': self.failed_ops,
+        }
@@ -0,0 +1,118 @@
+"""Game replays: a compact binary move log per finished game.
+
+While a game is played the room keeps its events as a list of small
+integers (one list append per move). When the game ends the list is
+packed into an unsigned LEB128 varint blob and queued for the batching
+database writer alongside the history rows.
+
+An event on an n x n board is one integer:
+
+    v < n*n              the side to move plays cell v (= x * n + y); turn passes
+    n*n + BLOCK          the side to move blocks the opponent's next turn
+    n*n + CLEAR          the side to move arms a clear
+    n*n + SKIP           a blocked turn is skipped; turn passes
+    n*n + CLEARED + v    the side to move empties cell v
+
+Who acted is never stored: replaying from X's first move recovers it.
+On boards up to 11x11 every move and power-up fits in one byte (a
+cleared cell may take two), so a 3x3 game is 5-9 bytes and a long 10x10
+game a few dozen. A blob whose bytes are all
+below 0x80 is all one-byte varints, which bulk scans detect with
+bytes.isascii() and read without decoding.
+"""
+import sqlite3
+
+BLOCK = 0
+CLEAR = 1
+SKIP = 2
+CLEARED = 3
+
+def place(size, x, y):
+    return x * size + y
+
+def power(size, op):
+    return size * size + op
+
+def cleared(size, x, y):
+    return size * size + CLEARED + x * size + y
+
+def encode(events):
+    """Pack event integers as unsigned varints"""
+    out = bytearray()
+    for value in events:
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def decode(blob):
+    """Event integers from a varint blob"""
+    if blob.isascii():
+        return list(blob)
+    events = []
+    value = shift = 0
+    for byte in blob:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            events.append(value)
+            value = shift = 0
+    return events
+
+def steps(size, blob):
+    """Yield a game's events in order as game_delta-like dicts.
+
+    Each step has ply, event ('move', 'block', 'clear', 'skip' or
+    'cleared'), by (the symbol that acted), turn (the symbol to move
+    after it) and, for board changes, cells as [x, y, value] triples.
+    """
+    cells = size * size
+    turn = 'X'
+    for ply, value in enumerate(decode(blob), 1):
+        by = turn
+        step = {'ply': ply, 'by': by}
+        if value < cells:
+            x, y = divmod(value, size)
+            step.update(event='move', cells=[[x, y, by]])
+            turn = 'O' if turn == 'X' else 'X'
+        else:
+            op = value - cells
+            if op == BLOCK:
+                step['event'] = 'block'
+            elif op == CLEAR:
+                step['event'] = 'clear'
+            elif op == SKIP:
+                step['event'] = 'skip'
+                turn = 'O' if turn == 'X' else 'X'
+            else:
+                x, y = divmod(op - CLEARED, size)
+                step.update(event='cleared', cells=[[x, y, None]])
+        step['turn'] = turn
+        yield step
+
+def move_count(size, events):
+    """Placed pieces in an event list (power-ups and skips excluded)"""
+    cells = size * size
+    return sum(1 for value in events if value < cells)
+
+def scan(path, columns=('board_size', 'winner', 'log'), batch_size=5000, after=0):
+    """Yield (id, *columns) for every stored replay with id > after, in id order.
+
+    Opens its own read-only connection and reads keyset pages of
+    batch_size rows, each its own short statement, so a scan over
+    millions of games never holds a read transaction open for long or
+    competes with the app's connections.
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    try:
+        sql = f"SELECT id, {', '.join(columns)} FROM replays WHERE id > ? ORDER BY id LIMIT ?"
+        while True:
+            rows = conn.execute(sql, (after, batch_size)).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+    finally:
+        conn.close()
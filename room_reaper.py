@@ -0,0 +1,117 @@
+"""Background eviction of abandoned and idle game rooms.
+
+Each room dict carries a little bookkeeping, kept up to date by the
+handlers through the helpers below:
+
+- last_active: wall-clock time of the last event from any player
+- connected: sockets currently joined to the room (across workers)
+- abandoned_at: when the last socket left; cleared when one rejoins
+
+A sweep evicts a room once it has been abandoned for longer than the
+reconnect grace period, or has seen no player event for idle_timeout
+seconds even with sockets attached (e.g. a worker died without sending
+disconnects). Eviction re-checks the room inside a store update, so a
+player who rejoins while the sweep runs keeps the room.
+"""
+import time
+
+def touch(game, now=None):
+    game['last_active'] = time.time() if now is None else now
+
+def player_connected(game, now=None):
+    game['connected'] = game.get('connected', 0) + 1
+    game['abandoned_at'] = None
+    touch(game, now)
+
+def player_disconnected(game, now=None):
+    now = time.time() if now is None else now
+    game['connected'] = max(0, game.get('connected', 0) - 1)
+    if game['connected'] == 0:
+        game['abandoned_at'] = now
+
+class RoomReaper:
+    def __init__(self, store, grace=120.0, idle_timeout=3600.0, interval=30.0,
+                 on_evict=None, purge_sessions=None, on_error=None):
+        self.store = store
+        self.grace = grace
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        # on_evict(txn, room) registers effects (cancel AI work, notify clients)
+        self.on_evict = on_evict
+        # purge_sessions(now) deletes stale saved sessions, returns rows removed
+        self.purge_sessions = purge_sessions
+        self.on_error = on_error
+        self.live = 0
+        self.idle = 0
+        self.evicted = 0
+        self.sessions_purged = 0
+        self.sweeps = 0
+        self.last_sweep_ms = 0.0
+
+    def eviction_reason(self, game, now):
+        abandoned_at = game.get('abandoned_at')
+        if abandoned_at is not None and now - abandoned_at >= self.grace:
+            return 'abandoned'
+        if now - game.get('last_active', now) >= self.idle_timeout:
+            return 'idle'
+        return None
+
+    def sweep(self, now=None):
+        """Evict every room past its grace period or idle timeout; returns evicted rooms"""
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        evicted = []
+        live = idle = 0
+        for room in self.store.rooms():
+            game = self.store.get(room)
+            if game is None:
+                continue
+            if self.eviction_reason(game, now) is None:
+                live += 1
+                if game.get('abandoned_at') is not None:
+                    idle += 1
+                continue
+            if self.store.update(room, lambda txn: self._evict(txn, now)):
+                evicted.append(room)
+            else:
+                live += 1
+
+        if self.purge_sessions is not None:
+            self.sessions_purged += self.purge_sessions(now)
+
+        self.live = live
+        self.idle = idle
+        self.evicted += len(evicted)
+        self.sweeps += 1
+        self.last_sweep_ms = (time.perf_counter() - started) * 1000
+        return evicted
+
+    def _evict(self, txn, now):
+        # the room may have been rejoined since it was read
+        if txn.game is None or self.eviction_reason(txn.game, now) is None:
+            return False
+        if self.on_evict is not None:
+            self.on_evict(txn, txn.room)
+        txn.delete()
+        return True
+
+    def run(self, sleep):
+        """Sweep forever, pausing with sleep(seconds) (socketio.sleep in the app)"""
+        while True:
+            sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error("REAPER_ERROR", "Room sweep failed", str(e))
+
+    def stats(self):
+        return {
+            'live': self.live,
+            'idle': self.idle,
+            'evicted': self.evicted,
+            'sessions_purged': self.sessions_purged,
+            'sweeps': self.sweeps,
+            'last_sweep_ms': round(self.last_sweep_ms, 2),
+        }
@@ -0,0 +1,136 @@
+"""Headless rules for a game room: moves, blocks and clears on a game dict.
+
+A game is the plain dict the store keeps (board, players, turn, powerups,
+...), so the same functions run inside a Socket.IO handler's room
+transaction, in a self-play worker, or in a test. Nothing here emits,
+logs or touches the store; callers look at the return values and tell
+clients what changed. Every state change is also appended to the
+game's replay log (game['log'], see replay.py).
+
+players[0] plays X and players[1] O. Power-ups are spent on your own
+turn: block makes the opponent's next move a pass, clear makes your
+next click empty an occupied cell instead of playing there.
+"""
+from collections import namedtuple
+
+import replay
+from board import Board
+from game_logic import get_win_len
+
+BLOCK = 'block'
+CLEAR = 'clear'
+POWER_UPS = (BLOCK, CLEAR)
+STARTING_POWERUPS = {BLOCK: 1, CLEAR: 1}
+
+# symbol: who played; line: the winning run of [row, col] pairs, or None; draw: the board filled up
+MoveResult = namedtuple('MoveResult', 'symbol line draw')
+
+def new_game(players, powerup_users, size, **extra):
+    """Fresh room state; powerup_users get the starting power-ups"""
+    board = Board(size)
+    # win checks become counter checks on this board (see lines.py)
+    board.track_lines()
+    game = {
+        'board': board,
+        'players': players,
+        'turn': 'X',
+        'powerups': {name: dict(STARTING_POWERUPS) for name in powerup_users},
+        'size': size,
+        'blocked': False,
+        'blocked_player': None,
+        'clear_mode': None,
+        'new_game_requested_by': None,
+        'version': 0
+    }
+    game.update(extra)
+    return game
+
+def other(symbol):
+    return 'O' if symbol == 'X' else 'X'
+
+def player_to_move(game):
+    """Username whose turn it is, or None if that seat is still empty"""
+    index = 0 if game['turn'] == 'X' else 1
+    players = game['players']
+    return players[index] if index < len(players) else None
+
+def log_event(game, event):
+    """Append to the room's replay log (an int from replay.place/power/cleared)"""
+    game.setdefault('log', []).append(event)
+
+def play(game, x, y):
+    """Place the side to move at (x, y) and pass the turn.
+
+    Returns a MoveResult, or None (and changes nothing) if the cell is
+    off the board or taken. A finished game keeps its board until
+    reset_board, so the caller can report it first.
+    """
+    size = game['size']
+    board = game['board']
+    if not (0 <= x < size and 0 <= y < size) or not board.is_empty(x, y):
+        return None
+    symbol = game['turn']
+    board.place(x, y, symbol)
+    log_event(game, replay.place(size, x, y))
+    game['turn'] = other(symbol)
+    # only the lines through the cell just played can have been completed
+    line = board.winning_line(x, y, get_win_len(size))
+    return MoveResult(symbol, line, line is None and board.is_full())
+
+def skip_blocked_turn(game, player):
+    """If player is blocked, spend the block and pass their turn; True if it did"""
+    if not (game.get('blocked') and game.get('blocked_player') == player):
+        return False
+    game['blocked'] = False
+    game['blocked_player'] = None
+    game['turn'] = other(game['turn'])
+    log_event(game, replay.power(game['size'], replay.SKIP))
+    return True
+
+def clear_cell(game, x, y):
+    """Finish a clear: empty (x, y). Clear mode ends either way; True if a stone was removed"""
+    game['clear_mode'] = None
+    if game['board'].remove(x, y) is None:
+        return False
+    log_event(game, replay.cleared(game['size'], x, y))
+    return True
+
+def use_power_up(game, player, power):
+    """Spend one of player's power-ups; returns why it is not allowed, or None once applied"""
+    if len(game['players']) < 2:
+        return 'Wait for an opponent first'
+    if player_to_move(game) != player:
+        return 'Power-ups can only be used on your turn'
+    if game['powerups'].get(player, {}).get(power, 0) <= 0:
+        return f'No {power} power-ups left'
+    if power == BLOCK and game.get('blocked'):
+        return 'A block is already pending'
+    if power == CLEAR and game.get('clear_mode'):
+        return 'Clear mode is already active'
+    if power == CLEAR and not (game['board'].x_bits | game['board'].o_bits):
+        return 'There is nothing to clear yet'
+
+    game['powerups'][player][power] -= 1
+    if power == BLOCK:
+        game['blocked'] = True
+        game['blocked_player'] = next(p for p in game['players'] if p != player)
+        log_event(game, replay.power(game['size'], replay.BLOCK))
+    else:
+        game['clear_mode'] = player
+        log_event(game, replay.power(game['size'], replay.CLEAR))
+    return None
+
+def reset_board(game):
+    """Empty board with X to move; the finished game's log is dropped (record it first)"""
+    game['board'].reset()
+    game['turn'] = 'X'
+    game['log'] = []
+
+def restart(game):
+    """reset_board, plus fresh power-ups and no pending block, clear or new-game request"""
+    reset_board(game)
+    game['powerups'] = {name: dict(STARTING_POWERUPS) for name in game['powerups']}
+    game['blocked'] = False
+    game['blocked_player'] = None
+    game['clear_mode'] = None
+    game['new_game_requested_by'] = None
@@ -0,0 +1,219 @@
+"""In-memory, write-behind cache in front of the user_sessions table.
+
+Joins, reconnects and page loads read and write a user's saved room on
+every request. The cache answers reads from memory (LRU bounded, entries
+re-read from SQLite after a TTL) and keeps writes in a dirty map that a
+background thread flushes every flush_interval seconds, so a burst of
+upserts for one username becomes a single row write and refreshing
+last_activity costs a dict update. Users without a saved session are
+cached too, so repeated misses do not keep hitting the database.
+
+That cache is per process. With several workers (GAME_STORE=redis) a
+worker's copy, or its remembered miss, can be up to a TTL older than a
+session another worker just saved, so /recover-session and GET /game
+would send a player back to an old room or to none. SharedSessionCache
+is the variant for that case: the cached copy lives in Redis, where
+every worker sees a save or delete at once, and SQLite is still written
+behind in the same way.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# cached value for "no saved session"
+_MISSING = None
+
+class SessionCache:
+    def __init__(self, db, max_entries=50000, ttl=300.0, flush_interval=1.0, on_error=None):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # username -> (session dict or None, expires_at)
+        self._dirty = {}  # username -> session row tuple, or None for a delete
+        self._flusher = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.flushed = 0
+
+    # ---- reads ----
+    def get(self, username):
+        """The saved {'room_code', 'board_size', 'mode'} for username, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                if entry[1] > now or username in self._dirty:
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[username]
+                self.expirations += 1
+            elif username in self._dirty:
+                # evicted before its write was flushed: the dirty row is authoritative
+                row = self._dirty[username]
+                self.hits += 1
+                return _as_session(row) if row is not None else _MISSING
+            self.misses += 1
+
+        value = self._read(username)
+        with self._lock:
+            # a write that raced the read wins
+            if username not in self._entries:
+                self._store(username, value, now)
+            return self._entries[username][0]
+
+    def _read(self, username):
+        result = self.db.query_one(
+            "SELECT room_code, board_size, mode FROM user_sessions WHERE username = ?", (username,))
+        return _as_session(result) if result else _MISSING
+
+    def prune(self):
+        """Drop expired clean entries (they would otherwise linger until looked up)"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [username for username, (_, expires_at) in self._entries.items()
+                       if expires_at <= now and username not in self._dirty]
+            for username in expired:
+                del self._entries[username]
+            self.expirations += len(expired)
+        return len(expired)
+
+    # ---- write-behind ----
+    def put(self, username, room_code, board_size, mode, last_activity):
+        row = (username, room_code, board_size, mode, last_activity)
+        with self._lock:
+            self._store(username, _as_session(row[1:4]), time.monotonic())
+            self._mark_dirty(username, row)
+        self._ensure_flusher()
+
+    def delete(self, username):
+        with self._lock:
+            self._store(username, _MISSING, time.monotonic())
+            self._mark_dirty(username, None)
+        self._ensure_flusher()
+
+    def _mark_dirty(self, username, row):
+        if username in self._dirty:
+            self.coalesced += 1
+        self._dirty[username] = row
+
+    def _store(self, username, value, now):
+        self._entries[username] = (value, now + self.ttl)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None and not self._stop.is_set():
+                self._flusher = threading.Thread(target=self._run_flusher, name='session-flush', daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Hand every dirty session to the database writer"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        for username, row in dirty.items():
+            try:
+                if row is None:
+                    self.db.delete_session(username)
+                else:
+                    self.db.save_session(*row)
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error("SESSION_FLUSH_ERROR", f"Failed to flush session for {username}", str(e))
+        self.flushed += len(dirty)
+        return len(dirty)
+
+    def close(self):
+        """Stop the flusher and write out anything still dirty"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            size, dirty = len(self._entries), len(self._dirty)
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'dirty': dirty,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'coalesced': self.coalesced,
+            'flushed': self.flushed,
+        }
+
+class SharedSessionCache(SessionCache):
+    """SessionCache whose cached copies are kept in Redis, shared by every worker.
+
+    A save or delete is written to Redis at once (one SET; a delete stores
+    null, so "no session" is shared too) and to SQLite behind, as in the
+    base class. A read is one GET; on a miss the row is read from SQLite
+    and put in Redis only if no worker has written the key meanwhile, so
+    a slow read never overwrites a newer save. Keys expire after ttl and
+    are then read back from SQLite, long after the write-behind flushed.
+    Each worker flushes its own writes, so if two workers save the same
+    user within one flush interval SQLite may keep the earlier one; Redis
+    serves the right one until the key expires.
+    """
+
+    def __init__(self, db, client, ttl=300.0, flush_interval=1.0, on_error=None, prefix='xo:session:'):
+        super().__init__(db, max_entries=0, ttl=ttl, flush_interval=flush_interval, on_error=on_error)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, username):
+        key = self.prefix + username
+        raw = self.client.get(key)
+        if raw is None:
+            with self._lock:
+                self.misses += 1
+            value = self._read(username)
+            if self.client.set(key, json.dumps(value), ex=max(1, int(self.ttl)), nx=True):
+                return value
+            # another worker saved or deleted it while we read: theirs is newer
+            raw = self.client.get(key)
+            if raw is None:
+                return value
+        else:
+            with self._lock:
+                self.hits += 1
+        return json.loads(raw)
+
+    def put(self, username, room_code, board_size, mode, last_activity):
+        row = (username, room_code, board_size, mode, last_activity)
+        self.client.set(self.prefix + username, json.dumps(_as_session(row[1:4])), ex=max(1, int(self.ttl)))
+        with self._lock:
+            self._mark_dirty(username, row)
+        self._ensure_flusher()
+
+    def delete(self, username):
+        self.client.set(self.prefix + username, json.dumps(_MISSING), ex=max(1, int(self.ttl)))
+        with self._lock:
+            self._mark_dirty(username, None)
+        self._ensure_flusher()
+
+def _as_session(fields):
+    room_code, board_size, mode = fields
+    return {'room_code': room_code, 'board_size': board_size, 'mode': mode}
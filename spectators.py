@@ -0,0 +1,161 @@
+"""Spectators: watch-only audiences for game rooms, fed coalesced deltas.
+
+Spectators of room R are put in the separate Socket.IO room watch:R, so
+players' own traffic never fans out to the audience. Each update for the
+audience is one emit to that room: Socket.IO encodes the packet once and
+queues the same bytes for every recipient, however big the audience.
+
+Updates are coalesced per room. The first delta after a quiet period goes
+out at once; later ones within `interval` seconds are merged into a
+single delta (final value per touched cell, newest fields, reset if any)
+sent when the interval ends. An audience therefore sees at most
+1/interval updates per second, however fast the players move. A merged
+delta carries `since`, the version it applies on top of, so a client can
+apply it to any state from `since` up to the version before it.
+
+A spectator whose socket already has more than max_backlog packets
+queued is skipped until it drains, and then gets a fresh snapshot in
+place of everything it missed. One slow connection costs itself updates
+rather than growing without bound or holding up the room.
+"""
+import threading
+import time
+
+def watch_room(room):
+    return f'watch:{room}'
+
+def merge_delta(merged, delta):
+    """Fold delta into merged (both game_delta payloads); returns merged"""
+    if merged is None:
+        merged = dict(delta, since=delta['version'] - 1)
+        merged['cells'] = {(x, y): value for x, y, value in delta['cells']}
+        return merged
+    if delta.get('reset'):
+        merged['cells'] = {}
+    for x, y, value in delta['cells']:
+        merged['cells'][(x, y)] = value
+    since, cells = merged['since'], merged['cells']
+    merged.update(delta)
+    merged['since'] = since
+    merged['cells'] = cells
+    merged['reset'] = merged.get('reset') or delta.get('reset', False)
+    return merged
+
+class SpectatorHub:
+    def __init__(self, emit, snapshot, spawn, sleep, backlog=None, interval=0.1, max_backlog=32):
+        # emit(event, data, to, skip_sid): socketio.emit
+        self.emit = emit
+        # snapshot(room): full game_update payload for the room, or None
+        self.snapshot = snapshot
+        self.spawn = spawn
+        self.sleep = sleep
+        # backlog(sid): packets queued for the socket but not yet written
+        self.backlog = backlog
+        self.interval = interval
+        self.max_backlog = max_backlog
+        self._lock = threading.Lock()
+        self._rooms = {}    # room -> set of local spectator sids
+        self._watching = {}  # sid -> room
+        self._lagging = {}  # room -> sids skipped until they drain
+        self._pending = {}  # room -> merged delta waiting for the interval to end
+        self._last_flush = {}  # room -> monotonic time of the last broadcast
+        self.broadcasts = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.resynced = 0
+
+    # ---- audience ----
+    def add(self, sid, room):
+        with self._lock:
+            self._watching[sid] = room
+            self._rooms.setdefault(room, set()).add(sid)
+
+    def remove(self, sid):
+        """Forget a spectator; returns the room it was watching, or None"""
+        with self._lock:
+            room = self._watching.pop(sid, None)
+            if room is None:
+                return None
+            sids = self._rooms.get(room)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._rooms[room]
+                    self._lagging.pop(room, None)
+                    self._last_flush.pop(room, None)
+            lagging = self._lagging.get(room)
+            if lagging is not None:
+                lagging.discard(sid)
+            return room
+
+    def audience(self, room):
+        with self._lock:
+            return len(self._rooms.get(room, ()))
+
+    # ---- updates ----
+    def publish(self, room, delta):
+        """Queue a game_delta for room's audience (sent now, or merged into the next interval)"""
+        now = time.monotonic()
+        with self._lock:
+            waiting = room in self._pending
+            if waiting:
+                self.coalesced += 1
+            self._pending[room] = merge_delta(self._pending.get(room), delta)
+            if waiting:
+                return
+            due = self._last_flush.get(room, 0.0) + self.interval - now
+        if due <= 0:
+            self.flush(room)
+        else:
+            self.spawn(self._flush_later, room, due)
+
+    def _flush_later(self, room, delay):
+        self.sleep(delay)
+        self.flush(room)
+
+    def flush(self, room):
+        with self._lock:
+            merged = self._pending.pop(room, None)
+            if merged is None:
+                return
+            self._last_flush[room] = time.monotonic()
+            sids = list(self._rooms.get(room, ()))
+            lagging = set(self._lagging.get(room, ()))
+        recovered = []
+        if self.backlog is not None:
+            for sid in sids:
+                if self.backlog(sid) > self.max_backlog:
+                    if sid not in lagging:
+                        lagging.add(sid)
+                        self.skipped += 1
+                elif sid in lagging:
+                    lagging.discard(sid)
+                    recovered.append(sid)
+            with self._lock:
+                if room in self._rooms:
+                    # spectators that left meanwhile are dropped with the intersection
+                    self._lagging[room] = lagging & self._rooms[room]
+        merged['cells'] = [[x, y, value] for (x, y), value in merged['cells'].items()]
+        self.emit('game_delta', merged, to=watch_room(room), skip_sid=list(lagging) + recovered or None)
+        self.broadcasts += 1
+        if recovered:
+            state = self.snapshot(room)
+            if state is not None:
+                for sid in recovered:
+                    self.emit('game_update', state, to=sid)
+                self.resynced += len(recovered)
+
+    def stats(self):
+        with self._lock:
+            rooms = len(self._rooms)
+            spectators = len(self._watching)
+            lagging = sum(len(sids) for sids in self._lagging.values())
+        return {
+            'rooms': rooms,
+            'spectators': spectators,
+            'lagging': lagging,
+            'broadcasts': self.broadcasts,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'resynced': self.resynced,
+        }
@@ -35,6 +35,10 @@ let localGame = null;      // object when solo is active, null otherwise
 let currentRoom = null;    // room code for multiplayer
 let mySymbol = null;       // 'X' or 'O' in multiplayer; 'X' in solo
 let isSolo = false;
+let serverGame = null;     // last known multiplayer state, kept current by deltas
+let spectating = false;    // watching a full room instead of playing
+const clientId = Math.random().toString(36).slice(2, 10); // tags this page's moves
+let moveSeq = 0;           // per-page move counter so the server can drop resends
 let myPowerups = { block: 1, clear: 1 }; // default local powerups (persisted per-game)
 let gameStats = {          // game statistics
   wins: 0,
@@ -524,7 +528,7 @@ async function loadHistory() {
   if (!username || !HISTORY_LIST) return;
   HISTORY_LIST.innerHTML = 'Loading...';
   try {
-    const res = await fetch(`/history?username=${encodeURIComponent(username)}`);
+    const res = await fetch(`/history?username=${encodeURIComponent(username)}&limit=20`);
     if (!res.ok) throw new Error('Failed');
     const data = await res.json();
     if (!Array.isArray(data) || data.length === 0) {
@@ -561,13 +565,7 @@ function buildBoardDOM(boardSizeN, boardArray) {
   for (let i = 0; i < N; i++) {
     for (let j = 0; j < N; j++) {
       const cell = e('div', 'cell');
-      const value = boardArray?.[i]?.[j] ?? null;
-      if (value) {
-        cell.textContent = value;
-        cell.classList.add(value === 'X' ? 'x' : 'o');
-      } else {
-        cell.textContent = '';
-      }
+      paintCell(cell, boardArray?.[i]?.[j] ?? null);
       cell.dataset.r = i; cell.dataset.c = j;
       // attach click handler (handles solo clear-mode and multiplayer emits)
       cell.addEventListener('click', () => handleCellClick(i, j));
@@ -576,6 +574,12 @@ function buildBoardDOM(boardSizeN, boardArray) {
   }
 }
 
+function paintCell(cell, value) {
+  cell.textContent = value || '';
+  cell.classList.remove('x', 'o');
+  if (value) cell.classList.add(value === 'X' ? 'x' : 'o');
+}
+
 // ----- Win/draw checks (client-side for solo) -----
 function getWinLen(sz) {
   if (sz <= 4) return 3;
@@ -792,13 +796,43 @@ async function handleCellClick(r, c) {
   }
 
   // Multiplayer path: send move to server
-  if (!currentRoom || currentRoom === 'LOCAL') return;
-  socket.emit('make_move', { room: currentRoom, x: r, y: c, username });
+  if (!currentRoom || currentRoom === 'LOCAL' || spectating) return;
+  socket.emit('make_move', {
+    room: currentRoom, x: r, y: c, username,
+    client: clientId, seq: ++moveSeq, version: serverGame ? serverGame.version : null
+  });
+}
+
+// ----- Delta updates (multiplayer) -----
+// fold a server game_delta into the cached state; returns false on a version gap.
+// Spectators get merged deltas that apply to any version from delta.since on.
+function applyGameDelta(state, delta) {
+  const since = ('since' in delta) ? delta.since : delta.version - 1;
+  if (!state || state.version < since || state.version >= delta.version) return false;
+  state.version = delta.version;
+  state.turn = delta.turn;
+  if (delta.reset) {
+    state.board = Array.from({ length: state.size }, () => Array.from({ length: state.size }, () => null));
+  }
+  (delta.cells || []).forEach(([r, c, v]) => { state.board[r][c] = v; });
+  ['players', 'powerups', 'blocked', 'blocked_player', 'clear_mode'].forEach(k => {
+    if (k in delta) state[k] = delta[k];
+  });
+  return true;
 }
 
 // ----- Render from a given game state object (local or server) -----
-function renderFromState(state) {
-  buildBoardDOM(state.size, state.board);
+// with a delta only the changed cells are repainted instead of rebuilding the board
+function renderFromState(state, delta) {
+  const N = state.size;
+  if (delta && BOARD.children.length === N * N) {
+    if (delta.reset) {
+      for (const cell of BOARD.children) paintCell(cell, null);
+    }
+    (delta.cells || []).forEach(([r, c, v]) => paintCell(BOARD.children[r * N + c], v));
+  } else {
+    buildBoardDOM(N, state.board);
+  }
   // update power-up displays
   const p = (state.powerups && state.powerups[username]) ? state.powerups[username] : (state.powerups ? Object.values(state.powerups)[0] : myPowerups);
   if (COUNT_BLOCK) COUNT_BLOCK.textContent = p?.block ?? 0;
@@ -835,42 +869,63 @@ function usePowerUp(power) {
 // ----- Socket.IO (multiplayer) handlers -----
 if (socket) {
   socket.on('connect', () => {
-    if (mode !== 'solo') {
-      socket.emit('join', { username, board_size: boardSize, room: roomCode || null });
-    }
+    if (mode !== 'solo') joinOrQueue();
+  });
+
+  // matchmaking: the server picked an opponent and opened a room for both of us
+  socket.on('match_queued', () => showStatus('Looking for an opponent...', '#FF9800'));
+  socket.on('match_found', (data) => {
+    setRoomCode(data.room);
+    socket.emit('join', { username, board_size: data.board_size, room: data.room });
   });
+  socket.on('match_error', (data) => showStatus(data.message || 'Matchmaking failed', '#b00020'));
 
   socket.on('joined_room', (data) => {
     setRoomCode(data.room);
     
-    // Show chat section for multiplayer
-    if (data.room !== 'LOCAL') {
+    // Show chat section for multiplayer (not against the server AI)
+    if (data.room !== 'LOCAL' && mode !== 'server_ai') {
       toggleChatSection(true);
     }
   });
 
+  // full snapshot: sent on join/reconnect or in answer to request_sync
   socket.on('game_update', (game) => {
     if (mode === 'solo') return;
     
     // switch to multiplayer mode
     isSolo = false;
-    // set symbol
-    if (game.players && game.players.length >= 1) {
-      mySymbol = (game.players[0] === username) ? 'X' : 'O';
-      if (PLAYER_SYMBOL_EL) PLAYER_SYMBOL_EL.textContent = `You are: ${mySymbol}`;
-    }
-    // render
+    serverGame = game;
     renderFromState(game);
-    // turn indicator
-    if ((game.players || []).length < 2) {
-      showStatus('Waiting for another player...', '#FF9800');
-    } else {
-      const currentPlayer = game.players[game.turn === 'X' ? 0 : 1];
-      if (currentPlayer === username) showStatus("🎯 YOUR TURN!", '#2e7d32'); else showStatus(`Waiting for ${currentPlayer}...`, '#ff7043');
+    updateMultiplayerStatus(game);
+  });
+
+  // incremental update: changed cells plus any changed fields
+  socket.on('game_delta', (delta) => {
+    if (mode === 'solo') return;
+    if (!applyGameDelta(serverGame, delta)) {
+      // missed an update (or none yet): ask for a fresh snapshot
+      if (!serverGame || delta.version > serverGame.version) {
+        socket.emit('request_sync', { room: currentRoom, version: serverGame ? serverGame.version : null });
+      }
+      return;
+    }
+    renderFromState(serverGame, delta);
+    updateMultiplayerStatus(serverGame);
+  });
+
+  // a move made against a board we had not caught up with: resync
+  socket.on('move_rejected', (data) => {
+    if (data.reason === 'stale') {
+      socket.emit('request_sync', { room: currentRoom, version: serverGame ? serverGame.version : null });
     }
   });
 
   socket.on('game_over', async (data) => {
+    if (spectating) {
+      showStatus(data.status === 'win' ? `${data.winner} won!` : 'Draw!', '#6b35b7');
+      return;
+    }
     if (data.status === 'win') {
       if (data.winner === username) {
         showGameDialog('🎉 You Won!', `Congratulations! You won against ${data.loser || 'opponent'}!`, true);
@@ -892,10 +947,25 @@ if (socket) {
 
   // Error handlers
   socket.on('join_error', (data) => {
+    if (data.can_spectate && confirm('This room is full. Watch the game instead?')) {
+      spectating = true;
+      socket.emit('spectate', { room: roomCode });
+      return;
+    }
     alert('Join error: ' + (data.message || 'Room is full'));
     window.location.href = '/game';
   });
 
+  socket.on('spectating', (data) => {
+    spectating = true;
+    setRoomCode(data.room);
+    if (PLAYER_SYMBOL_EL) PLAYER_SYMBOL_EL.textContent = `Spectating (${data.audience} watching)`;
+  });
+  socket.on('spectate_error', (data) => {
+    alert(data.message || 'Cannot watch this room');
+    window.location.href = '/game';
+  });
+
   socket.on('connect_error', (error) => {
     console.error('Connection error:', error);
     showStatus("Connection failed", '#b00020');
@@ -908,9 +978,40 @@ if (socket) {
 
   socket.on('chat_update', (data) => appendChatLine(data.username, data.message));
   socket.on('power_up_error', (data) => alert(data.message));
+  socket.on('event_rejected', (data) => console.warn(`Server rejected ${data.event}: ${data.reason}`));
   socket.on('game_message', (data) => appendChatSystem(data.message || ''));
 }
 
+// join our room, or (matchmaking, not matched yet) ask the server for an opponent
+function joinOrQueue() {
+  if (spectating) return socket.emit('spectate', { room: currentRoom });
+  if (mode === 'matchmaking') {
+    if (!currentRoom) return socket.emit('find_match', { username, board_size: boardSize });
+    return socket.emit('join', { username, board_size: boardSize, room: currentRoom });
+  }
+  socket.emit('join', { username, board_size: boardSize, room: roomCode || null, vs_ai: mode === 'server_ai' });
+}
+
+function updateMultiplayerStatus(game) {
+  if (spectating) {
+    const players = game.players || [];
+    if (players.length === 2) showStatus(`${players[game.turn === 'X' ? 0 : 1]} to move`, '#555');
+    return;
+  }
+  // set symbol
+  if (game.players && game.players.length >= 1) {
+    mySymbol = (game.players[0] === username) ? 'X' : 'O';
+    if (PLAYER_SYMBOL_EL) PLAYER_SYMBOL_EL.textContent = `You are: ${mySymbol}`;
+  }
+  // turn indicator
+  if ((game.players || []).length < 2) {
+    showStatus('Waiting for another player...', '#FF9800');
+  } else {
+    const currentPlayer = game.players[game.turn === 'X' ? 0 : 1];
+    if (currentPlayer === username) showStatus("🎯 YOUR TURN!", '#2e7d32'); else showStatus(`Waiting for ${currentPlayer}...`, '#ff7043');
+  }
+}
+
 // ----- Chat helpers -----
 function appendChatLine(sender, message) {
   if (!CHAT_MESSAGES) return;
@@ -966,9 +1067,7 @@ function init() {
   } else {
     isSolo = false;
     setRoomCode(roomCode);
-    if (socket && socket.connected) {
-      socket.emit('join', { username, board_size: boardSize, room: roomCode || null });
-    }
+    if (socket && socket.connected) joinOrQueue();
   }
   loadHistory();
 }
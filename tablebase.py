@@ -0,0 +1,311 @@
+"""Solved-position tables for the small boards (3x3 and 4x4, three in a row).
+
+Every position reachable in normal play is solved offline, reduced by the
+eight symmetries of the square, and written to an open-addressed hash
+table on disk. At runtime the file is memory-mapped and a lookup is one
+canonicalisation plus (usually) one probe, so the AI and hints can answer
+these boards instantly before falling back to search.
+
+Build the tables once per deploy:
+
+    python tablebase.py build [--out tablebase] [--sizes 3 4]
+
+File layout (little-endian): a 32-byte header, then slot_count uint32
+keys, then slot_count uint16 entries. A key packs the canonical X bits
+above the O bits; an entry packs value (0 loss / 1 draw / 2 win for the
+side to move), best move cell in canonical coordinates, and plies to the
+end with perfect play.
+"""
+import argparse
+import array
+import mmap
+import os
+import struct
+import sys
+import time
+from functools import lru_cache
+
+from game_logic import get_win_len
+
+TABLEBASE_DIR = os.environ.get('TABLEBASE_DIR', 'tablebase')
+TABLE_SIZES = (3, 4)
+
+MAGIC = b'TTTB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHBBII16x')
+EMPTY_KEY = 0xFFFFFFFF
+HASH_MULTIPLIER = 2654435761
+MAX_LOAD = 0.75
+
+LOSS, DRAW, WIN = 0, 1, 2
+
+def table_path(size, directory=None):
+    return os.path.join(directory or TABLEBASE_DIR, f'ttt_{size}x{size}.tb')
+
+def _pack_entry(value, move, plies):
+    return value | (move << 2) | (plies << 7)
+
+def _unpack_entry(entry):
+    return entry & 0x3, (entry >> 2) & 0x1F, entry >> 7
+
+def _slot(key, mask):
+    return ((key * HASH_MULTIPLIER) & 0xFFFFFFFF) & mask
+
+# ---- Symmetry ----
+@lru_cache(maxsize=None)
+def symmetries(size):
+    """The eight cell permutations of the square, as tuples perm[cell] -> cell"""
+    def cell(r, c):
+        return r * size + c
+    last = size - 1
+    maps = (
+        lambda r, c: (r, c),
+        lambda r, c: (c, last - r),
+        lambda r, c: (last - r, last - c),
+        lambda r, c: (last - c, r),
+        lambda r, c: (r, last - c),
+        lambda r, c: (last - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (last - c, last - r),
+    )
+    return tuple(tuple(cell(*f(r, c)) for r in range(size) for c in range(size)) for f in maps)
+
+@lru_cache(maxsize=None)
+def _byte_tables(size):
+    """Per symmetry, per byte of the cell mask: byte value -> permuted bits"""
+    cells = size * size
+    chunks = (cells + 7) // 8
+    tables = []
+    for perm in symmetries(size):
+        per_chunk = []
+        for chunk in range(chunks):
+            table = []
+            for byte in range(256):
+                out = 0
+                for bit in range(8):
+                    src = chunk * 8 + bit
+                    if byte >> bit & 1 and src < cells:
+                        out |= 1 << perm[src]
+                table.append(out)
+            per_chunk.append(tuple(table))
+        tables.append(tuple(per_chunk))
+    return tuple(tables)
+
+def canonical(size, x_bits, o_bits):
+    """(key, symmetry index) of the smallest symmetric image of the position"""
+    best_key = None
+    best_sym = 0
+    for sym, chunks in enumerate(_byte_tables(size)):
+        px = po = 0
+        shift = 0
+        for table in chunks:
+            px |= table[(x_bits >> shift) & 0xFF]
+            po |= table[(o_bits >> shift) & 0xFF]
+            shift += 8
+        key = (px << 16) | po
+        if best_key is None or key < best_key:
+            best_key = key
+            best_sym = sym
+    return best_key, best_sym
+
+@lru_cache(maxsize=None)
+def _line_masks(size, win_len):
+    """For every cell, the win_len line masks through it (cell = r * size + c)"""
+    through = [[] for _ in range(size * size)]
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for r in range(size):
+            for c in range(size):
+                cells = [(r + dr * k, c + dc * k) for k in range(win_len)]
+                if all(0 <= a < size and 0 <= b < size for a, b in cells):
+                    mask = sum(1 << (a * size + b) for a, b in cells)
+                    for a, b in cells:
+                        through[a * size + b].append(mask)
+    return tuple(tuple(m) for m in through)
+
+# ---- Offline solver ----
+def solve(size):
+    """Solve every reachable position; returns {canonical key: entry}"""
+    win_len = get_win_len(size)
+    lines = _line_masks(size, win_len)
+    cells = size * size
+    full = (1 << cells) - 1
+    solved = {}
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), cells * 4 + 100))
+
+    def search(x_bits, o_bits, x_to_move):
+        key, _ = canonical(size, x_bits, o_bits)
+        entry = solved.get(key)
+        if entry is not None:
+            return entry
+        # work on the canonical image so the stored move is in canonical cells
+        px, po = key >> 16, key & 0xFFFF
+        occupied = px | po
+        mine = px if x_to_move else po
+        best = None
+        for cell in range(cells):
+            bit = 1 << cell
+            if occupied & bit:
+                continue
+            placed = mine | bit
+            if any(placed & m == m for m in lines[cell]):
+                value, plies = WIN, 1
+            elif occupied | bit == full:
+                value, plies = DRAW, 1
+            else:
+                if x_to_move:
+                    child = search(placed, po, False)
+                else:
+                    child = search(px, placed, True)
+                child_value, _, child_plies = _unpack_entry(child)
+                value, plies = 2 - child_value, child_plies + 1
+            # prefer wins (fastest first), then draws, then the slowest loss
+            rank = (value, -plies if value == WIN else plies)
+            if best is None or rank > best[0]:
+                best = (rank, value, cell, plies)
+        entry = _pack_entry(best[1], best[2], best[3])
+        solved[key] = entry
+        return entry
+
+    search(0, 0, True)
+    return solved
+
+def write_table(path, size, solved):
+    slot_count = 1
+    while slot_count * MAX_LOAD < len(solved):
+        slot_count *= 2
+    mask = slot_count - 1
+    keys = array.array('I', [EMPTY_KEY]) * slot_count
+    entries = array.array('H', [0]) * slot_count
+    for key, entry in solved.items():
+        slot = _slot(key, mask)
+        while keys[slot] != EMPTY_KEY:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        entries[slot] = entry
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        entries.byteswap()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, size, get_win_len(size), slot_count, len(solved)))
+        keys.tofile(f)
+        entries.tofile(f)
+    os.replace(tmp, path)
+
+# ---- Runtime loader ----
+class Tablebase:
+    """Read-only, memory-mapped view of one solved table"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, win_len, slot_count, entry_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a tablebase file (version {FORMAT_VERSION})")
+        self.path = path
+        self.size = size
+        self.win_len = win_len
+        self.slot_count = slot_count
+        self.entry_count = entry_count
+        self._mask = slot_count - 1
+        view = memoryview(self._mm)
+        keys_end = HEADER.size + 4 * slot_count
+        self._keys = view[HEADER.size:keys_end].cast('I')
+        self._entries = view[keys_end:keys_end + 2 * slot_count].cast('H')
+        self._symmetries = symmetries(size)
+
+    def _probe(self, key):
+        keys = self._keys
+        slot = _slot(key, self._mask)
+        while True:
+            found = keys[slot]
+            if found == key:
+                return self._entries[slot]
+            if found == EMPTY_KEY:
+                return None
+            slot = (slot + 1) & self._mask
+
+    def lookup(self, board, symbol):
+        """(move, value, plies) for symbol to play on a Board, or None.
+
+        value is WIN/DRAW/LOSS for symbol with perfect play. None means the
+        position is not in the table: a different size, a game already won,
+        or a position only power-ups can reach (wrong side to move).
+        """
+        if board.size != self.size:
+            return None
+        x_bits, o_bits = _compact_bits(board)
+        x_count, o_count = x_bits.bit_count(), o_bits.bit_count()
+        x_to_move = x_count == o_count
+        if not (x_to_move or x_count == o_count + 1) or (symbol == 'X') != x_to_move:
+            return None
+        key, sym = canonical(self.size, x_bits, o_bits)
+        entry = self._probe(key)
+        if entry is None:
+            return None
+        value, canonical_move, plies = _unpack_entry(entry)
+        # map the canonical cell back through the symmetry that produced the key
+        move = self._symmetries[sym].index(canonical_move)
+        return divmod(move, self.size), value, plies
+
+    def close(self):
+        self._keys.release()
+        self._entries.release()
+        self._mm.close()
+
+def _compact_bits(board):
+    """Board bitboards (stride size + 1) -> dense r * size + c masks"""
+    size = board.size
+    row_mask = (1 << size) - 1
+    x_bits = o_bits = 0
+    for r in range(size):
+        shift = r * board.stride
+        x_bits |= ((board.x_bits >> shift) & row_mask) << (r * size)
+        o_bits |= ((board.o_bits >> shift) & row_mask) << (r * size)
+    return x_bits, o_bits
+
+@lru_cache(maxsize=None)
+def get_tablebase(size):
+    """The table for size from TABLEBASE_DIR, or None if it was not built"""
+    if size not in TABLE_SIZES:
+        return None
+    path = table_path(size)
+    if not os.path.exists(path):
+        return None
+    return Tablebase(path)
+
+def lookup(board, symbol):
+    table = get_tablebase(board.size)
+    return table.lookup(board, symbol) if table is not None else None
+
+# ---- CLI ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the small-board tablebases")
+    parser.add_argument('command', choices=('build', 'info'))
+    parser.add_argument('--out', default=TABLEBASE_DIR)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(TABLE_SIZES))
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        path = table_path(size, args.out)
+        if args.command == 'build':
+            t0 = time.perf_counter()
+            solved = solve(size)
+            t1 = time.perf_counter()
+            write_table(path, size, solved)
+            print(f"{size}x{size}: solved {len(solved)} positions in {t1 - t0:.1f}s -> {path}")
+
+        t0 = time.perf_counter()
+        table = Tablebase(path)
+        load_ms = (time.perf_counter() - t0) * 1000
+        from board import Board
+        move, value, plies = table.lookup(Board(size), 'X')
+        print(f"{size}x{size}: {table.entry_count} positions, {table.slot_count} slots, "
+              f"{os.path.getsize(path) / 1024:.1f} KiB on disk, loaded in {load_ms:.2f} ms; "
+              f"empty board: {('loss', 'draw', 'win')[value]} for X in {plies} plies, best move {move}")
+        table.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Bounded process pool for CPU-heavy work (AI search, analysis).
+
+Work runs in worker processes so it never holds the GIL the Socket.IO
+handlers need. Every task is submitted under a key (the room code): a new
+task for a key supersedes the old one, cancel(key) drops it when players
+leave, and results arriving after the task's deadline are discarded.
+When max_pending tasks are in flight, submit() refuses new work instead
+of queueing it without bound; a superseded task that was already running
+still counts until it finishes, since it still holds a worker.
+
+Workers are spawned without the parent's __main__: spawn would otherwise
+re-import the script that started the server (app.py, as __mp_main__) in
+every worker before its first task. Tasks must therefore be functions
+from importable modules (ai_engine.search_worker), never from the script.
+If a worker dies the executor is broken for good, so it is dropped and a
+fresh one is started for the next task.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# how long after its deadline a result is still accepted
+LATE_GRACE = 1.0
+
+# sys.modules['__main__'] is swapped while a worker starts; one start at a time
+_spawn_lock = threading.Lock()
+
+class _Executor(ProcessPoolExecutor):
+    def _spawn_process(self):
+        # spawn's preparation data names __main__'s file (or module) for the child to import
+        with _spawn_lock:
+            main = sys.modules['__main__']
+            sys.modules['__main__'] = types.ModuleType('__main__')
+            try:
+                super()._spawn_process()
+            finally:
+                sys.modules['__main__'] = main
+
+class TaskPool:
+    def __init__(self, max_workers=None, max_pending=None, start_method='spawn'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.start_method = start_method
+        self._executor = None
+        # re-entrant: Future.cancel() runs done callbacks on the calling thread
+        self._lock = threading.RLock()
+        self._pending = {}  # key -> Future
+        self._superseded = set()  # dropped futures that were already running
+        self.submitted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        # created on first use so importing this module never forks anything
+        if self._executor is None:
+            context = multiprocessing.get_context(self.start_method)
+            self._executor = _Executor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken executor; the next submit() starts a new one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _drop(self, future):
+        # lock held; a running task cannot be cancelled and keeps its worker until it ends
+        if future.cancel():
+            self.cancelled += 1
+        elif not future.done():
+            self._superseded.add(future)
+
+    def submit(self, key, fn, args, deadline, on_result, on_error=None):
+        """Run fn(*args) in a worker and call on_result(result) when it finishes.
+
+        deadline is a time.time() timestamp. Returns False without running
+        anything when the pool is saturated or its workers have died (a new
+        executor is started for the next task); the caller decides how to
+        back off. Callbacks run on the pool's result thread.
+        """
+        with self._lock:
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                self._drop(previous)
+            if len(self._pending) + len(self._superseded) >= self.max_pending:
+                self.rejected += 1
+                return False
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                future = None
+            else:
+                self._pending[key] = future
+                self.submitted += 1
+        if future is None:
+            self._discard_executor(executor)
+            return False
+
+        def done(fut):
+            with self._lock:
+                self._superseded.discard(fut)
+                current = self._pending.get(key) is fut
+                if current:
+                    del self._pending[key]
+            if not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool):
+                self._discard_executor(executor)
+            # superseded or cancelled (player left): nobody wants the result
+            if not current or fut.cancelled():
+                return
+            try:
+                error = fut.exception()
+                if error is None and time.time() > deadline + LATE_GRACE:
+                    self.expired += 1
+                    error = TimeoutError(f"task {key} finished after its deadline")
+                if error is None:
+                    on_result(fut.result())
+                elif on_error is not None:
+                    on_error(error)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+
+        future.add_done_callback(done)
+        return True
+
+    def cancel(self, key):
+        """Forget the task for key; it is stopped if it has not started yet"""
+        with self._lock:
+            future = self._pending.pop(key, None)
+            if future is None:
+                return False
+            self._drop(future)
+        return True
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending) + len(self._superseded)
+        return {
+            'workers': self.max_workers,
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'cancelled': self.cancelled,
+            'expired': self.expired,
+            'restarts': self.restarts,
+        }
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._superseded.clear()
+        for future in pending:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
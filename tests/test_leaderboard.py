@@ -0,0 +1,38 @@
+from leaderboard import Leaderboard
+from persistence import Database
+
+def make_board(tmp_path, top_n):
+    db = Database(str(tmp_path / 'test.db'))
+    db.init_schema()
+    return db, Leaderboard(db, top_n=top_n)
+
+def test_top_page_version_changes_with_total(tmp_path):
+    db, board = make_board(tmp_path, top_n=2)
+    try:
+        board.record_win('alice', 10)
+        board.record_win('bob', 5)
+        entries, total, version = board.page(0, 2)
+        assert [e['username'] for e in entries] == ['alice', 'bob']
+        assert total == 2
+
+        # carol lands below the cached top page: entries are unchanged, total is not
+        board.record_win('carol', 1)
+        entries_after, total_after, version_after = board.page(0, 2)
+        assert entries_after == entries
+        assert total_after == 3
+        assert version_after != version
+    finally:
+        db.close()
+
+def test_top_page_version_stable_without_changes(tmp_path):
+    db, board = make_board(tmp_path, top_n=2)
+    try:
+        board.record_win('alice', 10)
+        board.record_win('bob', 5)
+        board.record_win('carol', 1)
+        _, _, version = board.page(0, 2)
+        # a win that moves nobody into the top page and adds nobody
+        board.record_win('carol', 1)
+        assert board.page(0, 2)[2] == version
+    finally:
+        db.close()
@@ -0,0 +1,52 @@
+import threading
+
+from persistence import Database
+
+DATE = '2024-01-01 12:00:00'
+
+def flush(db, timeout=5):
+    # a dead writer leaves Queue.join() waiting forever
+    t = threading.Thread(target=db.flush, daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "flush() did not return"
+
+def history(db, username):
+    return db.query("SELECT username, result FROM history WHERE username = ?", (username,))
+
+def test_writer_survives_a_bad_op(tmp_path):
+    errors = []
+    db = Database(str(tmp_path / 'test.db'), on_error=lambda *args: errors.append(args))
+    db.init_schema()
+    try:
+        db.add_history(('alice', 'AI', 'solo', 'win', 3, DATE))
+        # an unhashable username fails while the batch is coalesced
+        db.add_history((['mallory'], 'AI', 'solo', 'win', 3, DATE))
+        db.add_history(('bob', 'AI', 'solo', 'loss', 3, DATE))
+        flush(db)
+
+        assert history(db, 'alice') == [('alice', 'win')]
+        assert history(db, 'bob') == [('bob', 'loss')]
+        assert db.failed_ops == 1
+        assert [e[0] for e in errors] == ['DB_WRITE_ERROR']
+        assert db._writer.is_alive()
+
+        db.add_score('carol', 3)
+        flush(db)
+        assert db.query_one("SELECT score FROM leaderboard WHERE username = 'carol'") == (3,)
+    finally:
+        db.close()
+
+def test_failed_write_without_on_error_is_logged(tmp_path, caplog):
+    db = Database(str(tmp_path / 'test.db'))
+    db.init_schema()
+    try:
+        db.add_history(('alice', object(), 'solo', 'win', 3, DATE))
+        flush(db)
+        assert db.failed_ops == 1
+        assert 'Failed to write a history operation' in caplog.text
+        db.add_history(('alice', 'AI', 'solo', 'win', 3, DATE))
+        flush(db)
+        assert history(db, 'alice') == [('alice', 'win')]
+    finally:
+        db.close()
@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+import types
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from task_pool import TaskPool
+
+TIMEOUT = 30
+
+class Outcome:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def on_result(self, result):
+        self.result = result
+        self.event.set()
+
+    def on_error(self, error):
+        self.error = error
+        self.event.set()
+
+    def wait(self):
+        assert self.event.wait(TIMEOUT), "task never finished"
+        return self
+
+def run(pool, key, fn, args):
+    outcome = Outcome()
+    assert pool.submit(key, fn, args, time.time() + TIMEOUT, outcome.on_result, outcome.on_error)
+    return outcome.wait()
+
+@pytest.fixture
+def pool():
+    pool = TaskPool(max_workers=1, max_pending=2)
+    yield pool
+    pool.shutdown()
+
+def wait_for(condition):
+    deadline = time.time() + TIMEOUT
+    while not condition():
+        assert time.time() < deadline, "condition never became true"
+        time.sleep(0.01)
+
+def test_pool_recovers_after_a_worker_dies_in_a_task(pool):
+    assert run(pool, 'room', pow, (2, 10)).result == 1024
+    # the worker exits mid-task: that task fails and the executor is replaced
+    assert isinstance(run(pool, 'room', os._exit, (1,)).error, BrokenProcessPool)
+    assert run(pool, 'room', pow, (2, 10)).result == 1024
+    assert pool.stats()['restarts'] == 1
+
+def test_pool_recovers_after_an_idle_worker_dies(pool):
+    assert run(pool, 'room', pow, (2, 10)).result == 1024
+    executor = pool._executor
+    for process in list(executor._processes.values()):
+        process.kill()
+    wait_for(lambda: executor._broken)
+    # the broken executor refuses this one (the caller falls back) and is replaced
+    assert not pool.submit('room', pow, (2, 10), time.time() + TIMEOUT, lambda result: None)
+    assert run(pool, 'room', pow, (2, 10)).result == 1024
+    assert pool.stats()['restarts'] == 1
+
+def test_superseded_running_task_counts_until_it_finishes(pool):
+    first = Outcome()
+    assert pool.submit('a', time.sleep, (1.0,), time.time() + TIMEOUT, first.on_result, first.on_error)
+    wait_for(lambda: pool._pending['a'].running())
+    # 'a' is replaced while still running: it keeps its worker and its slot
+    assert pool.submit('a', pow, (2, 10), time.time() + TIMEOUT, lambda result: None)
+    assert pool.stats()['pending'] == 2
+    assert not pool.submit('b', pow, (2, 10), time.time() + TIMEOUT, lambda result: None)
+    wait_for(lambda: pool.stats()['pending'] == 0)
+    assert not first.event.is_set()
+    assert run(pool, 'b', pow, (2, 10)).result == 1024
+
+def test_workers_do_not_import_the_parent_main(pool, tmp_path, monkeypatch):
+    # stands in for app.py started as a script: spawn would run it again in each worker
+    marker = tmp_path / 'imported'
+    script = tmp_path / 'server.py'
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    main = types.ModuleType('__main__')
+    main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, '__main__', main)
+    assert run(pool, 'room', pow, (2, 10)).result == 1024
+    assert not marker.exists()
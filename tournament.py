@@ -0,0 +1,206 @@
+"""Tournaments: single-elimination brackets and round-robins.
+
+A Tournament only pairs players and keeps score; the app opens a room
+per pairing, reports each match's winner, and writes a finished round's
+results in one go. Everything here is in memory and O(players) per
+round, so a 1,000-player event costs nothing until its rounds are saved.
+
+Bracket: players are seeded best first. The bracket is the next power of
+two in size; seed 1 meets the lowest seed, and so on, with the top seeds
+getting byes when the field is short. Winners move on in bracket order
+until one is left. A drawn match (the app replays draws a few times
+first) goes to the higher seed, who always plays X.
+
+Round-robin: everyone plays everyone once, scheduled with the circle
+method: n - 1 rounds (n rounds with a bye when n is odd), in which nobody
+plays twice. X alternates between the two players from round to round.
+A win is 1 point and a draw 1/2.
+
+Rounds are played one at a time: report() returns the round's results
+once its last match is in, and next_round() then pairs the next one.
+"""
+import threading
+from collections import namedtuple
+
+BRACKET = 'bracket'
+ROUND_ROBIN = 'round_robin'
+FORMATS = (BRACKET, ROUND_ROBIN)
+
+# match: unique id; x moves first
+Pairing = namedtuple('Pairing', 'match round x o')
+# winner: a username, or None for a draw; data: whatever the reporter attached
+Result = namedtuple('Result', 'pairing winner data')
+
+def bracket_order(size):
+    """Seed indices in bracket order for a power-of-two field (0 meets size-1 in round 1)"""
+    order = [0]
+    while len(order) < size:
+        span = len(order) * 2
+        order = [seed for s in order for seed in (s, span - 1 - s)]
+    return order
+
+def circle_rounds(players):
+    """Round-robin rounds as lists of (a, b) pairs; None stands in for the bye"""
+    ring = list(players) + ([None] if len(players) % 2 else [])
+    n = len(ring)
+    rounds = []
+    for r in range(n - 1):
+        pairs = []
+        for i in range(n // 2):
+            a, b = ring[i], ring[n - 1 - i]
+            if a is not None and b is not None:
+                # alternate who plays X so nobody is X every round
+                pairs.append((a, b) if (r + i) % 2 == 0 else (b, a))
+        rounds.append(pairs)
+        # keep the first player fixed and rotate the rest one step
+        ring = [ring[0], ring[-1]] + ring[1:-1]
+    return rounds
+
+class Tournament:
+    def __init__(self, tid, players, size, fmt=BRACKET, name=None, created=None):
+        """players: unique usernames, best seed first; created: an ISO timestamp kept for the app"""
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        if len(players) < 2 or len(set(players)) != len(players):
+            raise ValueError("a tournament needs at least two distinct players")
+        self.id = tid
+        self.name = name or tid
+        self.size = size
+        self.format = fmt
+        self.created = created
+        self.players = list(players)
+        self.seed = {name: i for i, name in enumerate(self.players)}
+        self.round = 0
+        # the last round whose results are all in (what a saved row records)
+        self.completed = 0
+        self.finished = False
+        self.champion = None
+        # username -> [wins, losses, draws]
+        self.records = {name: [0, 0, 0] for name in self.players}
+        # bracket: the round a player went out in
+        self.eliminated = {}
+        # match id -> room code, filled in by whoever opens the rooms
+        self.rooms = {}
+        self._pending = {}  # match id -> Pairing not yet reported
+        self._results = []  # the current round's Results
+        self._lock = threading.Lock()
+        if fmt == BRACKET:
+            field = 1
+            while field < len(self.players):
+                field *= 2
+            # bracket positions still in play: a username, None for a bye, or a
+            # match id while that match is being played
+            self._slots = [self.players[s] if s < len(self.players) else None for s in bracket_order(field)]
+            self._slot_of = {}  # match id -> its position in _slots
+            self.rounds = (field - 1).bit_length()
+        else:
+            self._schedule = circle_rounds(self.players)
+            self.rounds = len(self._schedule)
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def next_round(self):
+        """Pair the next round; returns its Pairings (empty once the tournament is over)"""
+        with self._lock:
+            if self._pending or self.finished:
+                return []
+            self.round += 1
+            self._results = []
+            if self.format == BRACKET:
+                pairings = self._bracket_pairings()
+            elif self.round <= len(self._schedule):
+                pairings = [self._pairing(i, x, o) for i, (x, o) in enumerate(self._schedule[self.round - 1])]
+            else:
+                pairings = []
+            if not pairings:
+                self.round -= 1
+                self._finish()
+                return []
+            self._pending = {p.match: p for p in pairings}
+            return pairings
+
+    def _pairing(self, i, x, o):
+        return Pairing(f'{self.id}:{self.round}:{i}', self.round, x, o)
+
+    def _bracket_pairings(self):
+        if len(self._slots) == 1:
+            return []
+        pairings = []
+        advancing = []
+        for a, b in zip(self._slots[0::2], self._slots[1::2]):
+            if a is None or b is None:
+                # a bye: the present player goes through unplayed
+                advancing.append(a if b is None else b)
+                continue
+            # the higher seed plays X
+            x, o = (a, b) if self.seed[a] < self.seed[b] else (b, a)
+            pairing = self._pairing(len(pairings), x, o)
+            pairings.append(pairing)
+            self._slot_of[pairing.match] = len(advancing)
+            advancing.append(pairing.match)
+        self._slots = advancing
+        return pairings
+
+    def report(self, match, winner, data=None):
+        """Record a match result (winner None for a draw).
+
+        Returns the round's list of Results if this was its last match,
+        otherwise None. Unknown or already reported matches are ignored.
+        """
+        with self._lock:
+            pairing = self._pending.get(match)
+            if pairing is None:
+                return None
+            if winner not in (None, pairing.x, pairing.o):
+                raise ValueError(f"{winner} is not playing match {match}")
+            del self._pending[match]
+            self._results.append(Result(pairing, winner, data))
+            if winner is None:
+                self.records[pairing.x][2] += 1
+                self.records[pairing.o][2] += 1
+            else:
+                loser = pairing.o if winner == pairing.x else pairing.x
+                self.records[winner][0] += 1
+                self.records[loser][1] += 1
+            if self.format == BRACKET:
+                # a draw goes to the higher seed (X)
+                through = winner or pairing.x
+                out = pairing.o if through == pairing.x else pairing.x
+                self.eliminated[out] = self.round
+                self._slots[self._slot_of.pop(match)] = through
+            if self._pending:
+                return None
+            self.completed = self.round
+            return list(self._results)
+
+    def _finish(self):
+        self.finished = True
+        if self.format == BRACKET:
+            self.champion = self._slots[0]
+        else:
+            self.champion = self._standings()[0]['username']
+
+    def points(self, username):
+        wins, _, draws = self.records[username]
+        return wins + draws / 2
+
+    def standings(self):
+        """Players best first, as dicts with rank, wins, losses, draws and points"""
+        with self._lock:
+            return self._standings()
+
+    def _standings(self):
+        if self.format == BRACKET:
+            # still in (the champion) first, then by how far each player got
+            out = self.round + 1
+            key = lambda name: (-self.eliminated.get(name, out), -self.records[name][0], self.seed[name])
+        else:
+            key = lambda name: (-self.points(name), -self.records[name][0], self.seed[name])
+        table = []
+        for rank, name in enumerate(sorted(self.players, key=key), 1):
+            wins, losses, draws = self.records[name]
+            table.append({'rank': rank, 'username': name, 'wins': wins, 'losses': losses, 'draws': draws,
+                          'points': self.points(name)})
+        return table